@@ -1,8 +1,21 @@
 # ai_embedding_logic.py
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv, find_dotenv
 import json
+import hashlib
+import zlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from tokenization import split_words
+from gemini_client import (GEMINI_MAX_RETRIES, AsyncGeminiClient, EmbeddingInputError, backoff_delay, is_input_error,
+                           is_retryable_error)
+from metrics import EMBEDDING_LATENCY, EMBEDDING_RETRIES, EMBEDDING_TEXTS, track_latency
 
 # --- Load Environment Variables ---
 # This ensures that your API key is loaded from a .env file securely.
@@ -13,16 +26,86 @@ if dotenv_path:
 # --- Retrieve Gemini API Key ---
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# --- API Key Validation ---
-if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_ACTUAL_GEMINI_API_KEY_HERE":
-    # If API key is not set, raise a RuntimeError. Streamlit (or any calling app)
-    # should catch this and display a user-friendly error.
-    raise RuntimeError(
-        "❌ GEMINI_API_KEY not found or is the placeholder value in your .env file. "
-        "Please set it correctly to use AI features. Refer to the README for setup instructions."
-    )
+def is_api_key_configured() -> bool:
+    """Returns True if a real (non-placeholder) Gemini API key is configured."""
+    return bool(GOOGLE_API_KEY) and GOOGLE_API_KEY != "YOUR_ACTUAL_GEMINI_API_KEY_HERE"
+
+
+# --- Lazy Gemini SDK Loading ---
+# Importing google.generativeai takes most of a second, and listing models is a network call.
+# Both are deferred until an AI feature is first used, so importing this module is cheap.
+_genai_module = None
+_model_init_lock = threading.RLock()
+
+def _get_genai():
+    """
+    Imports and configures the Gemini SDK on first use.
+    Raises a RuntimeError if the API key is missing, so callers can show a user-friendly error.
+    """
+    global _genai_module
+    if _genai_module is not None:
+        return _genai_module
+    if not is_api_key_configured():
+        raise RuntimeError(
+            "❌ GEMINI_API_KEY not found or is the placeholder value in your .env file. "
+            "Please set it correctly to use AI features. Refer to the README for setup instructions."
+        )
+    with _model_init_lock:
+        if _genai_module is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GOOGLE_API_KEY)
+            _genai_module = genai
+    return _genai_module
+
 
-# --- Gemini Model Instances (initialized once globally) ---
+# --- Model Listing (fetched once, cached on disk) ---
+MODEL_LIST_CACHE_PATH = os.getenv("MODEL_LIST_CACHE_PATH", os.path.join(".cache", "gemini_models.json"))
+MODEL_LIST_CACHE_TTL_S = float(os.getenv("MODEL_LIST_CACHE_TTL_S", str(24 * 60 * 60)))
+_available_models = None  # model name -> list of supported generation methods
+
+def list_available_models() -> dict[str, list[str]]:
+    """
+    Returns the Gemini models available to this API key, mapped to their supported generation methods.
+    The listing is fetched once per process and cached on disk for MODEL_LIST_CACHE_TTL_S seconds,
+    so both the embedding and the generative model are resolved from a single list_models() call.
+    """
+    global _available_models
+    if _available_models is not None:
+        return _available_models
+
+    with _model_init_lock:
+        if _available_models is not None:
+            return _available_models
+
+        if MODEL_LIST_CACHE_PATH and os.path.exists(MODEL_LIST_CACHE_PATH):
+            try:
+                with open(MODEL_LIST_CACHE_PATH, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if time.time() - cached["fetched_at"] < MODEL_LIST_CACHE_TTL_S and cached["models"]:
+                    _available_models = cached["models"]
+                    return _available_models
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable Gemini model list cache: {e}")
+
+        genai = _get_genai()
+        started = time.perf_counter()
+        models = {m.name: list(m.supported_generation_methods) for m in genai.list_models()}
+        print(f"Fetched Gemini model list ({len(models)} models) in {time.perf_counter() - started:.2f}s")
+
+        if MODEL_LIST_CACHE_PATH and models:
+            try:
+                if os.path.dirname(MODEL_LIST_CACHE_PATH):
+                    os.makedirs(os.path.dirname(MODEL_LIST_CACHE_PATH), exist_ok=True)
+                with open(MODEL_LIST_CACHE_PATH, "w", encoding="utf-8") as f:
+                    json.dump({"fetched_at": time.time(), "models": models}, f)
+            except OSError as e:
+                print(f"Could not write Gemini model list cache: {e}")
+
+        _available_models = models
+        return _available_models
+
+
+# --- Gemini Model Instances (initialized once, on first use) ---
 _embedding_model_instance = None  # For text embeddings
 _generative_model_instance = None # For general text generation and structured responses
 
@@ -36,34 +119,38 @@ def get_embedding_model():
     if _embedding_model_instance is not None:
         return _embedding_model_instance
 
-    genai.configure(api_key=GOOGLE_API_KEY)
+    with _model_init_lock:
+        if _embedding_model_instance is not None:
+            return _embedding_model_instance
 
-    # Define the preferred embedding model
-    preferred_embedding_model = 'models/embedding-001'
-    
-    # List available models that support embedding content
-    available_embedding_models = [m.name for m in genai.list_models() if 'embedContent' in m.supported_generation_methods]
+        genai = _get_genai()
 
-    chosen_embedding_model_name = None
-    if preferred_embedding_model in available_embedding_models:
-        chosen_embedding_model_name = preferred_embedding_model
-    elif available_embedding_models:
-        chosen_embedding_model_name = available_embedding_models[0] # Fallback to any available embedding model
+        # Define the preferred embedding model
+        preferred_embedding_model = 'models/embedding-001'
 
-    if chosen_embedding_model_name:
-        try:
-            _embedding_model_instance = genai.GenerativeModel(chosen_embedding_model_name)
-            print(f"Gemini embedding model initialized: {chosen_embedding_model_name}")
-            return _embedding_model_instance
-        except Exception as e:
-            # Raise a more specific error for initialization failure
-            raise Exception(f"Failed to initialize Gemini embedding model '{chosen_embedding_model_name}'. Please check your API key and network access.") from e
-    else:
-        # If no suitable embedding model is found at all
-        raise Exception(
-            "No suitable Gemini embedding model found that supports 'embedContent'. "
-            "Please ensure your API key is correct and valid, or check Google AI Studio for available models."
-        )
+        # Available models that support embedding content
+        available_embedding_models = [name for name, methods in list_available_models().items() if 'embedContent' in methods]
+
+        chosen_embedding_model_name = None
+        if preferred_embedding_model in available_embedding_models:
+            chosen_embedding_model_name = preferred_embedding_model
+        elif available_embedding_models:
+            chosen_embedding_model_name = available_embedding_models[0] # Fallback to any available embedding model
+
+        if chosen_embedding_model_name:
+            try:
+                _embedding_model_instance = genai.GenerativeModel(chosen_embedding_model_name)
+                print(f"Gemini embedding model initialized: {chosen_embedding_model_name}")
+                return _embedding_model_instance
+            except Exception as e:
+                # Raise a more specific error for initialization failure
+                raise Exception(f"Failed to initialize Gemini embedding model '{chosen_embedding_model_name}'. Please check your API key and network access.") from e
+        else:
+            # If no suitable embedding model is found at all
+            raise Exception(
+                "No suitable Gemini embedding model found that supports 'embedContent'. "
+                "Please ensure your API key is correct and valid, or check Google AI Studio for available models."
+            )
 
 def get_generative_model():
     """
@@ -74,78 +161,444 @@ def get_generative_model():
     if _generative_model_instance is not None:
         return _generative_model_instance
 
-    genai.configure(api_key=GOOGLE_API_KEY)
-
-    # List available models that support content generation
-    available_generative_models = []
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            available_generative_models.append(m.name)
-
-    # Prioritize models: gemini-1.5-flash (cost-effective), then gemini-pro (stable), then gemini-1.5-pro
-    preferred_order = [
-        'models/gemini-1.5-flash',
-        'models/gemini-pro',
-        'models/gemini-1.5-pro'
-    ]
-
-    chosen_generative_model_name = None
-    for preferred_model in preferred_order:
-        if preferred_model in available_generative_models:
-            chosen_generative_model_name = preferred_model
-            break
-    
-    if chosen_generative_model_name is None and available_generative_models:
-        chosen_generative_model_name = available_generative_models[0] # Fallback to any available
-
-    if chosen_generative_model_name:
-        try:
-            _generative_model_instance = genai.GenerativeModel(chosen_generative_model_name)
-            print(f"Gemini generative model initialized: {chosen_generative_model_name}")
+    with _model_init_lock:
+        if _generative_model_instance is not None:
             return _generative_model_instance
-        except Exception as e:
-            raise Exception(f"Failed to initialize Gemini generative model '{chosen_generative_model_name}'. Please check your API key and network access.") from e
-    else:
-        raise Exception(
-            "No suitable Gemini generative model found that supports 'generateContent'. "
-            "Please ensure your API key is correct and valid, or check Google AI Studio for available models."
-        )
 
+        genai = _get_genai()
+
+        # Available models that support content generation
+        available_generative_models = [name for name, methods in list_available_models().items() if 'generateContent' in methods]
+
+        # Prioritize models: gemini-1.5-flash (cost-effective), then gemini-pro (stable), then gemini-1.5-pro
+        preferred_order = [
+            'models/gemini-1.5-flash',
+            'models/gemini-pro',
+            'models/gemini-1.5-pro'
+        ]
+
+        chosen_generative_model_name = None
+        for preferred_model in preferred_order:
+            if preferred_model in available_generative_models:
+                chosen_generative_model_name = preferred_model
+                break
+
+        if chosen_generative_model_name is None and available_generative_models:
+            chosen_generative_model_name = available_generative_models[0] # Fallback to any available
+
+        if chosen_generative_model_name:
+            try:
+                _generative_model_instance = genai.GenerativeModel(chosen_generative_model_name)
+                print(f"Gemini generative model initialized: {chosen_generative_model_name}")
+                return _generative_model_instance
+            except Exception as e:
+                raise Exception(f"Failed to initialize Gemini generative model '{chosen_generative_model_name}'. Please check your API key and network access.") from e
+        else:
+            raise Exception(
+                "No suitable Gemini generative model found that supports 'generateContent'. "
+                "Please ensure your API key is correct and valid, or check Google AI Studio for available models."
+            )
+
+
+# --- Embedding Backends ---
+# A backend turns texts into vectors. Gemini is the default; the local hashing backend needs no
+# network access, which keeps search latency low and makes the search path testable offline.
+# Gemini embedding models differ in output size. Unset, the model's own size is used (learned from
+# its first response); set, it is requested with output_dimensionality (for models that support it).
+GEMINI_EMBEDDING_DIMENSION = int(os.getenv("GEMINI_EMBEDDING_DIMENSION", "0")) or None
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+LOCAL_EMBEDDING_DIMENSION = int(os.getenv("LOCAL_EMBEDDING_DIMENSION", "512"))
+
+def _check_texts(texts: list[str]) -> None:
+    """Rejects inputs no provider can embed (non-strings and blank texts) before any work is done."""
+    for text in texts:
+        if not isinstance(text, str) or not text.strip():
+            raise EmbeddingInputError(f"Cannot embed {type(text).__name__} input {str(text)[:100]!r}.")
+
+
+class EmbeddingBackend:
+    """
+    Interface for embedding providers. Subclasses implement embed_texts() and expose
+    'name' (backend kind), 'model_name' (exact model identity, used for caching and recorded in
+    index files) and 'dimension'. A backend is also a valid transport for get_embeddings().
+    """
+    name = "base"
+    requires_api_key = False
+    cacheable = True  # Whether results are worth storing in the embedding cache
+
+    @property
+    def model_name(self) -> str:
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Returns one embedding per text, in order."""
+        raise NotImplementedError
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_texts(texts)
+
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeds texts with the Gemini embedding model chosen by get_embedding_model().
+    The vector size is GEMINI_EMBEDDING_DIMENSION if set, otherwise whatever the model returns:
+    it is taken from the first response, embedding one short probe text if none was made yet.
+    """
+    name = "gemini"
+    requires_api_key = True
+
+    def __init__(self, dimension: int | None = GEMINI_EMBEDDING_DIMENSION):
+        self._requested_dimension = dimension
+        self._dimension = None
+
+    @property
+    def model_name(self) -> str:
+        model_name = get_embedding_model().model_name
+        # Vectors truncated to another size are not interchangeable, so caches and indexes tell them apart
+        return f"{model_name}@{self._requested_dimension}" if self._requested_dimension else model_name
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            # Answered from the embedding cache after the first run, so it costs one API call at most once
+            self._dimension = len(get_embedding("dimension probe", backend=self))
+        return self._dimension
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        embeddings = gemini_embedding_transport(texts, output_dimensionality=self._requested_dimension)
+        if embeddings:
+            size = len(embeddings[0])
+            if self._requested_dimension and size != self._requested_dimension:
+                raise RuntimeError(f"Embedding model returned {size} dimensions, but {self._requested_dimension} were "
+                                   "requested (GEMINI_EMBEDDING_DIMENSION); the model may not support output_dimensionality.")
+            self._dimension = size
+        return embeddings
+
+
+class LocalHashingEmbeddingBackend(EmbeddingBackend):
+    """
+    A pure-local embedding backend based on signed feature hashing.
+    Texts are split into identifier-aware word tokens (snake_case and camelCase are split),
+    adjacent word pairs and character trigrams; each feature is hashed into one of 'dimension'
+    buckets with a hashed sign, which acts as a sparse random projection. Vectors are L2-normalized.
+    """
+    name = "local"
+    cacheable = False  # Hashing is cheaper than a cache lookup
+
+    WORD_WEIGHT = 1.0
+    PAIR_WEIGHT = 0.5
+    TRIGRAM_WEIGHT = 0.25
 
-# --- Ensure models are initialized when the module is imported ---
-# This allows for immediate use of embedding/generative functions after import
-try:
-    get_embedding_model()
-    get_generative_model()
-except Exception as e:
-    # Print the error for debugging purposes in the console.
-    # In a Streamlit app, this error will also typically be displayed on the UI.
-    print(f"Initial Gemini model setup failed on import: {e}")
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIMENSION):
+        if dimension <= 0:
+            raise ValueError("Local embedding dimension must be a positive integer.")
+        self._dimension = dimension
 
+    @property
+    def model_name(self) -> str:
+        return f"local-hashing-{self._dimension}"
 
-def get_embedding(text: str) -> list[float]:
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _features(self, text: str):
+        words = split_words(text)
+        for word in words:
+            yield word, self.WORD_WEIGHT
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield "3:" + padded[i:i + 3], self.TRIGRAM_WEIGHT
+        for first, second in zip(words, words[1:]):
+            yield f"2:{first} {second}", self.PAIR_WEIGHT
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        _check_texts(texts)
+        matrix = np.zeros((len(texts), self._dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                # Low bits choose the bucket, the top bit chooses the sign.
+                matrix[row, h % self._dimension] += weight if h & 0x80000000 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+EMBEDDING_BACKENDS = {
+    GeminiEmbeddingBackend.name: GeminiEmbeddingBackend,
+    LocalHashingEmbeddingBackend.name: LocalHashingEmbeddingBackend,
+}
+_embedding_backend_instances = {}
+
+def get_embedding_backend(name: str | None = None) -> EmbeddingBackend:
     """
-    Generates a vector embedding for the given text using the pre-initialized Gemini embedding model.
-    Throws a RuntimeError if the embedding model is not initialized or if the API call fails.
+    Returns the embedding backend selected by name, or by the EMBEDDING_BACKEND setting
+    ("gemini" or "local"). Backends are created once per process.
     """
-    model_instance = _embedding_model_instance
-    if model_instance is None: # Fix: Changed === to is
-        raise RuntimeError("Embedding model not initialized. Check API key and network connection.")
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Expected one of {sorted(EMBEDDING_BACKENDS)}.")
+    with _model_init_lock:
+        if name not in _embedding_backend_instances:
+            _embedding_backend_instances[name] = EMBEDDING_BACKENDS[name]()
+    return _embedding_backend_instances[name]
 
+
+def get_embedding(text: str, backend: EmbeddingBackend | None = None) -> list[float]:
+    """
+    Generates a vector embedding for the given text with the configured embedding backend
+    (Gemini unless EMBEDDING_BACKEND says otherwise), initializing it on first use.
+    Throws a RuntimeError if the backend cannot be initialized or if the embedding call fails.
+    """
     if not text.strip():
         return [] # Return empty list for empty or whitespace-only text
 
+    backend = backend or get_embedding_backend()
     try:
-        # Call the embed_content method on the GenerativeModel instance
-        # Ensure the model name (e.g., "models/embedding-001") is passed as the 'model' argument
-        result = model_instance.embed_content(model="models/embedding-001", content=text)
-        if result and 'embedding' in result:
-            return result['embedding']
-        else:
-            raise ValueError("Embedding API returned an empty or invalid embedding structure.")
+        model_name = backend.model_name
+    except Exception as e:
+        raise RuntimeError(f"Embedding model not initialized. Check API key and network connection. Details: {e}") from e
+
+    cache = get_embedding_cache() if backend.cacheable else None
+    if cache is not None:
+        cached = cache.get(model_name, text)
+        if cached is not None:
+            return cached
+
+    try:
+        with track_latency(EMBEDDING_LATENCY, "embedding", backend=backend.name):
+            embedding = backend.embed_texts([text])[0]
+        EMBEDDING_TEXTS.inc(backend=backend.name)
     except Exception as e:
         raise RuntimeError(f"Failed to get embedding for text: '{text[:100]}...': {e}")
 
+    if cache is not None:
+        cache.put(model_name, text, embedding)
+    return embedding
+
+
+# --- Embedding Cache ---
+# Set EMBEDDING_CACHE_PATH to an empty string to disable the on-disk cache.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+_embedding_cache_instance = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """
+    Returns the process-wide embedding cache, opening it on first use.
+    Returns None when caching is disabled.
+    """
+    global _embedding_cache_instance
+    if not EMBEDDING_CACHE_PATH:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache_instance is None:
+            _embedding_cache_instance = EmbeddingCache(EMBEDDING_CACHE_PATH)
+    return _embedding_cache_instance
+
+
+# --- Batched Embedding ---
+# The Gemini batchEmbedContents endpoint accepts at most 100 texts per request.
+GEMINI_MAX_BATCH_SIZE = 100
+DEFAULT_EMBEDDING_CONCURRENCY = 4
+
+
+def gemini_embedding_transport(texts: list[str], output_dimensionality: int | None = None) -> list[list[float]]:
+    """
+    Embeds a batch of texts with a single Gemini embed_content round trip.
+    This is what GeminiEmbeddingBackend uses under the hood. output_dimensionality asks for
+    vectors of that size; by default the model returns its native size.
+    """
+    _check_texts(texts)
+    if len(texts) > GEMINI_MAX_BATCH_SIZE:
+        raise EmbeddingInputError(f"Batch of {len(texts)} texts exceeds the Gemini limit of {GEMINI_MAX_BATCH_SIZE}.")
+    model_instance = get_embedding_model()
+    options = {"output_dimensionality": output_dimensionality} if output_dimensionality else {}
+    result = _get_genai().embed_content(model=model_instance.model_name, content=texts, **options)
+    if not result or 'embedding' not in result:
+        raise ValueError("Embedding API returned an empty or invalid embedding structure.")
+    embeddings = result['embedding']
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Embedding API returned {len(embeddings)} embeddings for {len(texts)} texts.")
+    return embeddings
+
+
+class FakeEmbeddingTransport:
+    """
+    An offline embedding provider for benchmarks and tests.
+    Returns deterministic pseudo-random unit vectors per text and simulates network latency
+    (a fixed cost per call plus a cost per text). Texts listed in fail_texts raise an error,
+    which makes per-item failure handling observable.
+    """
+
+    name = "fake"
+
+    def __init__(self, dimension: int = 768, latency_s: float = 0.05, per_item_latency_s: float = 0.0,
+                 max_batch_size: int = GEMINI_MAX_BATCH_SIZE, fail_texts: set[str] | None = None):
+        self.dimension = dimension
+        self.latency_s = latency_s
+        self.per_item_latency_s = per_item_latency_s
+        self.max_batch_size = max_batch_size
+        self.fail_texts = set(fail_texts or ())
+        self.model_name = f"fake-embedding-{dimension}"
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype("float32")
+        vector /= np.linalg.norm(vector) or 1.0
+        return vector.tolist()
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s + self.per_item_latency_s * len(texts))
+        if len(texts) > self.max_batch_size:
+            raise EmbeddingInputError(f"Batch of {len(texts)} texts exceeds the provider limit of {self.max_batch_size}.")
+        failing = [text for text in texts if text in self.fail_texts]
+        if failing:
+            raise EmbeddingInputError(f"Provider rejected input: '{failing[0][:100]}'")
+        with self._lock:
+            self.texts_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+
+@dataclass
+class EmbeddingBatchResult:
+    """
+    Result of get_embeddings(): one entry per input text, in input order.
+    Failed inputs have None in 'embeddings' and an error message in 'errors' (keyed by input position).
+    """
+    embeddings: list[list[float] | None]
+    errors: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _transport_name(transport) -> str:
+    """A short label for an embedding transport in metrics: the backend name, else the callable's name."""
+    return getattr(transport, "name", None) or getattr(transport, "__name__", type(transport).__name__)
+
+
+def _embed_batch_isolating_failures(transport, texts: list[str], positions: list[int],
+                                    embeddings: list, errors: dict, max_retries: int = GEMINI_MAX_RETRIES) -> None:
+    """
+    Embeds one batch. Rate-limit, overload and network errors (is_retryable_error) resend the whole
+    batch with exponential backoff. If the provider rejects the input (is_input_error), the batch is
+    split in halves and retried, so a single bad input only fails itself; other errors, including
+    malformed responses, fail the batch without further calls.
+    """
+    backend = _transport_name(transport)
+    attempt = 0
+    while True:
+        try:
+            with track_latency(EMBEDDING_LATENCY, "embedding", backend=backend):
+                vectors = transport(texts)
+            EMBEDDING_TEXTS.inc(len(texts), backend=backend)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Transport returned {len(vectors)} embeddings for {len(texts)} texts.")
+            for position, vector in zip(positions, vectors):
+                embeddings[position] = list(vector)
+            return
+        except Exception as e:
+            if attempt < max_retries and is_retryable_error(e):
+                EMBEDDING_RETRIES.inc(backend=backend, error_type=type(e).__name__)
+                delay = backoff_delay(attempt)
+                print(f"Retryable embedding error ({type(e).__name__}), retrying batch of {len(texts)} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            error = e
+            break
+
+    if len(texts) > 1 and is_input_error(error):
+        middle = len(texts) // 2
+        _embed_batch_isolating_failures(transport, texts[:middle], positions[:middle], embeddings, errors, max_retries)
+        _embed_batch_isolating_failures(transport, texts[middle:], positions[middle:], embeddings, errors, max_retries)
+        return
+    for position, text in zip(positions, texts):
+        errors[position] = f"Failed to get embedding for text: '{text[:100]}...': {error}"
+
+
+def get_embeddings(texts: list[str], batch_size: int = GEMINI_MAX_BATCH_SIZE,
+                   max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY, transport=None,
+                   cache: EmbeddingCache | None = None) -> EmbeddingBatchResult:
+    """
+    Generates embeddings for many texts, packing them into provider-sized batches and
+    running up to max_concurrency batches at once. Results keep the input order.
+    Empty or whitespace-only texts get an empty embedding without an API call, matching get_embedding().
+    transport is any callable taking a list of texts and returning one vector per text;
+    it defaults to the configured embedding backend (see get_embedding_backend()).
+    The embedding cache (get_embedding_cache() unless cache is given) is read first and filled
+    with new results; transports are cached under their 'model_name' attribute, if any.
+    """
+    if batch_size <= 0 or max_concurrency <= 0:
+        raise ValueError("batch_size and max_concurrency must be positive integers.")
+    transport = transport if transport is not None else get_embedding_backend()
+    try:
+        model_name = getattr(transport, "model_name", None)
+    except Exception as e:
+        raise RuntimeError(f"Embedding model not initialized. Check API key and network connection. Details: {e}") from e
+    cache = cache if cache is not None else get_embedding_cache()
+    if model_name is None or not getattr(transport, "cacheable", True):
+        cache = None
+
+    embeddings = [None] * len(texts)
+    errors = {}
+    pending_positions = []
+    for position, text in enumerate(texts):
+        if text.strip():
+            pending_positions.append(position)
+        else:
+            embeddings[position] = []
+
+    if cache is not None and pending_positions:
+        cached = cache.get_many(model_name, [texts[p] for p in pending_positions])
+        for position, vector in zip(pending_positions, cached):
+            embeddings[position] = vector
+        pending_positions = [p for p, vector in zip(pending_positions, cached) if vector is None]
+
+    batches = [pending_positions[i:i + batch_size] for i in range(0, len(pending_positions), batch_size)]
+    if not batches:
+        return EmbeddingBatchResult(embeddings, errors)
+
+    def run_batch(positions):
+        _embed_batch_isolating_failures(transport, [texts[p] for p in positions], positions, embeddings, errors)
+
+    # Each batch writes only to its own positions, so workers never touch the same slot.
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+        for future in [executor.submit(run_batch, positions) for positions in batches]:
+            future.result()
+
+    if cache is not None:
+        fresh = [p for p in pending_positions if embeddings[p] is not None]
+        cache.put_many(model_name, [texts[p] for p in fresh], [embeddings[p] for p in fresh])
+
+    return EmbeddingBatchResult(embeddings, errors)
+
+
+# --- Generative Client ---
+# Generative calls go through one async client per process: a shared rate limiter, retries with
+# backoff on rate-limit/overload errors, and coalescing of identical in-flight prompts.
+_gemini_client_instance = None
+
+def get_gemini_client() -> AsyncGeminiClient:
+    """Returns the process-wide async Gemini client, creating it on first use."""
+    global _gemini_client_instance
+    with _model_init_lock:
+        if _gemini_client_instance is None:
+            _gemini_client_instance = AsyncGeminiClient(get_generative_model)
+    return _gemini_client_instance
+
 
 def ask_gemini_text(prompt: str) -> str:
     """
@@ -153,15 +606,18 @@ def ask_gemini_text(prompt: str) -> str:
     Returns Markdown-formatted text from the AI.
     Handles potential API errors and safety blocks.
     """
-    model_instance = _generative_model_instance
-    if model_instance is None: # Fix: Changed === to is
+    try:
+        get_generative_model()
+        genai = _get_genai()
+    except Exception as e:
+        print(f"Gemini generative model setup failed: {e}")
         return "❌ AI Service Error: Generative model not initialized. Please ensure your API key is correctly configured and accessible."
 
     if not prompt.strip():
         return "❌ Please provide a valid prompt for the AI to process."
 
     try:
-        response = model_instance.generate_content(prompt)
+        response = get_gemini_client().generate_sync(prompt)
 
         if response and response.candidates and len(response.candidates) > 0 and \
            response.candidates[0].content and response.candidates[0].content.parts and \
@@ -183,8 +639,11 @@ def ask_gemini_structured(prompt: str, response_schema: dict) -> dict:
     Returns a dictionary parsed from the AI's JSON output.
     Handles potential API errors, safety blocks, and JSON parsing issues.
     """
-    model_instance = _generative_model_instance
-    if model_instance is None: # Fix: Changed === to is
+    try:
+        get_generative_model()
+        genai = _get_genai()
+    except Exception as e:
+        print(f"Gemini generative model setup failed: {e}")
         return {"error": "❌ AI Service Error: Generative model not initialized. Please ensure your API key is correctly configured and accessible."}
 
     if not prompt.strip():
@@ -194,13 +653,14 @@ def ask_gemini_structured(prompt: str, response_schema: dict) -> dict:
         return {"error": "❌ A valid response_schema (dictionary with 'type' field) is required for structured AI output."}
 
     try:
-        # Pass content and generation_config as separate arguments
-        response = model_instance.generate_content(
+        # Pass content and generation_config as separate arguments; identical prompt+schema calls are coalesced
+        response = get_gemini_client().generate_sync(
             prompt,
             generation_config=genai.GenerationConfig(
                 response_mime_type="application/json",
                 response_schema=response_schema
-            )
+            ),
+            coalesce_key=json.dumps(response_schema, sort_keys=True)
         )
         
         if response and response.candidates and len(response.candidates) > 0 and \
@@ -0,0 +1,158 @@
+# attribute_index.py
+from collections import defaultdict
+
+import numpy as np
+
+# --- Filterable Attributes ---
+# Entry fields that get a bitmap index, so searches can be restricted to some of their values.
+# List-valued fields (e.g. one data type per column) match if any element matches.
+FILTER_FIELDS = ("source", "schema", "owner", "column_types")
+FILTER_LABELS = {"source": "Database", "schema": "Schema", "owner": "Owner", "column_types": "Column data type"}
+
+
+def attribute_values(entry: dict, field: str) -> set[str]:
+    """Returns the distinct values an entry has for a filterable field (empty values are skipped)."""
+    value = entry.get(field)
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return {str(item) for item in values if item not in (None, "")}
+
+
+def _allowed_values(allowed) -> list[str]:
+    """A filter maps a field to one allowed value or a collection of allowed values."""
+    if isinstance(allowed, (list, tuple, set, frozenset)):
+        return [str(value) for value in allowed]
+    return [str(allowed)]
+
+
+def _encode(mask: np.ndarray) -> np.ndarray:
+    """
+    Compresses a bitmap: sparse bitmaps become sorted uint32 ids (4 bytes per set bit), dense ones
+    packed bits (1 bit per id), whichever is smaller, like the containers of a roaring bitmap.
+    """
+    count = int(np.count_nonzero(mask))
+    if count * 32 < len(mask):
+        return np.flatnonzero(mask).astype("uint32")
+    return np.packbits(mask, bitorder="little")
+
+
+def _decode(bitmap: np.ndarray, size: int) -> np.ndarray:
+    """Expands an encoded bitmap into a boolean mask of length size."""
+    if bitmap.dtype == np.uint32:
+        mask = np.zeros(size, dtype=bool)
+        mask[bitmap[bitmap < size]] = True
+        return mask
+    mask = np.unpackbits(bitmap, count=min(size, len(bitmap) * 8), bitorder="little").astype(bool)
+    if len(mask) < size:
+        mask = np.concatenate([mask, np.zeros(size - len(mask), dtype=bool)])
+    return mask
+
+
+def split_filters(filters: dict | None, fields: tuple[str, ...] = FILTER_FIELDS) -> tuple[dict, dict]:
+    """Splits filters into those answered by the bitmap indexes and the rest (checked per result)."""
+    filters = filters or {}
+    indexed = {field: allowed for field, allowed in filters.items() if field in fields}
+    return indexed, {field: allowed for field, allowed in filters.items() if field not in fields}
+
+
+class AttributeIndex:
+    """
+    Precomputed bitmap indexes over entry attributes: one compressed bitmap per (field, value),
+    with bit i set if the entry stored at position i has that value. A filter is answered by OR-ing
+    the bitmaps of its allowed values and AND-ing across fields, without touching the entries.
+    Not thread-safe for updates; searches only read it.
+    """
+
+    def __init__(self, fields: tuple[str, ...] = FILTER_FIELDS):
+        self.fields = tuple(fields)
+        self._bitmaps = {}  # (field, value) -> encoded bitmap
+        self._counts = {}   # (field, value) -> number of entries with the value
+        self._size = 0      # Positions covered by the bitmaps
+
+    def update(self, added=(), removed=(), size: int | None = None) -> None:
+        """
+        Applies one batch of changes: added and removed are (position, entry) pairs, and size is
+        the new number of positions (e.g. the index's next internal id). Each touched bitmap is
+        decoded and re-encoded once per batch.
+        """
+        added = list(added)
+        changes = defaultdict(lambda: ([], []))
+        self._size = max(self._size, size or 0, max((position for position, _ in added), default=-1) + 1)
+        for position, entry in added:
+            for field in self.fields:
+                for value in attribute_values(entry, field):
+                    changes[(field, value)][0].append(position)
+        for position, entry in removed:
+            for field in self.fields:
+                for value in attribute_values(entry, field):
+                    changes[(field, value)][1].append(position)
+
+        for key, (added_positions, removed_positions) in changes.items():
+            bitmap = self._bitmaps.get(key)
+            mask = _decode(bitmap, self._size) if bitmap is not None else np.zeros(self._size, dtype=bool)
+            mask[np.asarray(added_positions, dtype="int64")] = True
+            mask[np.asarray(removed_positions, dtype="int64")] = False
+            count = int(np.count_nonzero(mask))
+            if count:
+                self._bitmaps[key] = _encode(mask)
+                self._counts[key] = count
+            else:
+                self._bitmaps.pop(key, None)
+                self._counts.pop(key, None)
+
+    def select(self, filters: dict, size: int | None = None) -> np.ndarray:
+        """
+        Returns a boolean mask (length size, default all positions) of the entries matching every
+        filter: field -> allowed value or values. Raises ValueError for fields without a bitmap index.
+        """
+        size = self._size if size is None else size
+        selected = np.ones(size, dtype=bool)
+        for field, allowed in filters.items():
+            if field not in self.fields:
+                raise ValueError(f"No attribute index for '{field}'. Filterable fields: {self.fields}.")
+            matches = np.zeros(size, dtype=bool)
+            for value in _allowed_values(allowed):
+                bitmap = self._bitmaps.get((field, value))
+                if bitmap is not None:
+                    matches |= _decode(bitmap, size)
+            selected &= matches
+        return selected
+
+    def values(self, field: str) -> dict[str, int]:
+        """Returns the values of a field with their entry counts, most common first."""
+        counts = {value: count for (key_field, value), count in self._counts.items() if key_field == field}
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def nbytes(self) -> int:
+        """Bytes held by the encoded bitmaps."""
+        return int(sum(bitmap.nbytes for bitmap in self._bitmaps.values()))
+
+    # --- Persistence ---
+    def to_arrays(self) -> tuple[np.ndarray, dict]:
+        """
+        Packs the encoded bitmaps back to back into one uint8 array (each starting 8-byte aligned)
+        and returns it with the directory from_arrays() needs to find them again.
+        """
+        segments, rows, offset = [], [], 0
+        for (field, value), bitmap in self._bitmaps.items():
+            data = np.ascontiguousarray(bitmap).view("uint8")
+            encoding = "ids" if bitmap.dtype == np.uint32 else "bits"
+            rows.append([field, value, self._counts[(field, value)], encoding, offset, len(data)])
+            padding = -len(data) % 8
+            segments += [data, np.zeros(padding, dtype="uint8")]
+            offset += len(data) + padding
+        blob = np.concatenate(segments) if segments else np.zeros(0, dtype="uint8")
+        return blob, {"fields": list(self.fields), "size": self._size, "bitmaps": rows}
+
+    @classmethod
+    def from_arrays(cls, blob: np.ndarray, directory: dict) -> "AttributeIndex":
+        """
+        Rebuilds an index from to_arrays() output without copying: the bitmaps are views into blob,
+        so a memory-mapped blob stays shared with other processes until a bitmap is updated.
+        """
+        attributes = cls(tuple(directory["fields"]))
+        attributes._size = directory["size"]
+        for field, value, count, encoding, offset, nbytes in directory["bitmaps"]:
+            segment = blob[offset:offset + nbytes]
+            attributes._bitmaps[(field, value)] = segment.view("uint32") if encoding == "ids" else segment
+            attributes._counts[(field, value)] = count
+        return attributes
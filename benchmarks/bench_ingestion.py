@@ -0,0 +1,125 @@
+# benchmarks/bench_ingestion.py
+"""
+Compares parse time and peak memory of the Data File Analyzer's readers against the original
+pd.read_csv(BytesIO(uploaded_file.getvalue())) path, on a synthetic file.
+
+Each case runs in a fresh subprocess so its peak RSS is measured in isolation. The upload is
+held in a BytesIO (like Streamlit's UploadedFile) before measuring, so peak memory is what
+parsing adds on top of the upload itself.
+
+    python benchmarks/bench_ingestion.py --rows 1000000 --output ingestion.json
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import reset_peak_rss, status_mb
+
+CASES = {
+    # name: (file format, reader, project to one column)
+    "csv_bytesio_baseline": ("csv", "baseline", False),
+    "csv_pandas": ("csv", "pandas", False),
+    "csv_pyarrow": ("csv", "pyarrow", False),
+    "csv_pyarrow_projected": ("csv", "pyarrow", True),
+    "parquet": ("parquet", "arrow", False),
+    "parquet_projected": ("parquet", "arrow", True),
+    "feather": ("feather", "arrow", False),
+    "feather_projected": ("feather", "arrow", True),
+}
+PROJECTED_COLUMN = "amount"
+
+
+def make_dataset(rows: int, directory: str) -> dict:
+    """Writes one synthetic table as CSV, Parquet and Feather; returns format -> path."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "customer": rng.integers(0, rows // 10 + 1, rows),
+        "amount": rng.gamma(2.0, 50.0, rows).round(2),
+        "discount": np.where(rng.random(rows) < 0.2, np.nan, rng.random(rows)),
+        "country": rng.choice(["US", "DE", "IN", "BR", "JP", "FR"], rows),
+        "status": rng.choice(["new", "paid", "shipped", "returned", None], rows),
+        "created_at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s"),
+    })
+    paths = {file_format: os.path.join(directory, f"bench.{file_format}") for file_format in ("csv", "parquet", "feather")}
+    df.to_csv(paths["csv"], index=False)
+    df.to_parquet(paths["parquet"], index=False)
+    df.to_feather(paths["feather"])
+    return paths
+
+
+def run_case(case: str, path: str) -> dict:
+    """Runs one case in this process and returns its measurements."""
+    import pandas as pd
+    import file_ingestion
+
+    file_format, reader, projected = CASES[case]
+    with open(path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    upload.name = os.path.basename(path)
+    columns = [PROJECTED_COLUMN] if projected else None
+    baseline_mb = status_mb("VmRSS")
+    reset_peak_rss()
+
+    started = time.perf_counter()
+    if reader == "baseline":
+        df = pd.read_csv(io.BytesIO(upload.getvalue()))
+    else:
+        file_ingestion.ANALYZER_CSV_ENGINE = reader
+        df = file_ingestion.read_dataframe(upload, file_format, columns=columns)
+    seconds = time.perf_counter() - started
+
+    peak_mb = status_mb("VmHWM")
+    return {
+        "case": case,
+        "seconds": seconds,
+        "peak_extra_mb": max(0.0, peak_mb - baseline_mb),
+        "dataframe_mb": df.memory_usage(deep=True).sum() / (1024 * 1024),
+        "rows": len(df),
+        "columns": df.shape[1],
+        "file_mb": os.path.getsize(path) / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Data File Analyzer's ingestion paths.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the synthetic table.")
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), default=list(CASES), help="Cases to run.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--run-case", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(*args.run_case)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Generating {args.rows} rows...")
+        paths = make_dataset(args.rows, directory)
+        results = []
+        for case in args.cases:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-case", case, paths[CASES[case][0]]],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{case:<24} {result['seconds']:7.3f}s  peak +{result['peak_extra_mb']:8.1f}MB  "
+                  f"DataFrame {result['dataframe_mb']:8.1f}MB  (file {result['file_mb']:.1f}MB)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/common.py
+"""
+Helpers shared by the benchmark scripts: peak-memory measurement, latency percentiles, run
+metadata, and reading, writing and comparing JSON result files.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+# Metric name suffixes where a lower value is an improvement (throughputs, '*_per_s', excepted);
+# for all other metrics higher is better.
+LOWER_IS_BETTER = ("_s", "_ms", "_mb", "_bytes")
+
+
+# --- Measurement ---
+def status_mb(field: str) -> float:
+    """Reads a memory field (e.g. VmRSS, VmHWM) of this process from /proc/self/status, in MB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024  # kB
+    raise RuntimeError(f"{field} not found in /proc/self/status (Linux only).")
+
+
+def reset_peak_rss() -> None:
+    """Resets the process's peak RSS (VmHWM) to its current RSS, so the peak covers only what follows."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass  # Older kernels: the peak then also covers the setup above
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    """Summarizes per-operation timings as p50/p99/mean latency in milliseconds and throughput."""
+    if not seconds:
+        return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "ops_per_s": 0.0}
+    timings = np.asarray(seconds) * 1000
+    return {
+        "count": len(seconds),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(timings.mean()),
+        "ops_per_s": len(seconds) / float(np.sum(seconds)) if np.sum(seconds) else 0.0,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Calls fn and returns (result, elapsed seconds)."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+# --- Results ---
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                   capture_output=True, text=True, check=True)
+        return completed.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    """Describes the run (time, commit, machine and library versions), so result files stay comparable."""
+    import faiss
+    import pandas as pd
+    import pyarrow
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+        "faiss": getattr(faiss, "__version__", "unknown"),
+    }
+
+
+def default_results_path(prefix: str) -> str:
+    return os.path.join(RESULTS_DIR, f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+
+def write_results(path: str, payload: dict) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(old: dict, new: dict) -> list[dict]:
+    """
+    Matches the records of two result files by 'name' and returns, for every numeric metric they
+    share, the old and new values, the change in percent and whether the change is an improvement.
+    """
+    old_records = {record["name"]: record for record in old.get("results", [])}
+    rows = []
+    for record in new.get("results", []):
+        previous = old_records.get(record["name"])
+        if previous is None:
+            continue
+        for metric, value in record.items():
+            old_value = previous.get(metric)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or \
+                    isinstance(old_value, bool) or not isinstance(old_value, (int, float)):
+                continue
+            change_pct = (value - old_value) / old_value * 100 if old_value else 0.0
+            lower_is_better = metric.endswith(LOWER_IS_BETTER) and not metric.endswith("_per_s")
+            rows.append({
+                "name": record["name"], "metric": metric, "old": old_value, "new": value, "change_pct": change_pct,
+                "improved": change_pct < 0 if lower_is_better else change_pct > 0,
+            })
+    return rows
+
+
+def print_comparison(rows: list[dict], threshold_pct: float = 5.0) -> None:
+    """Prints metric changes beyond threshold_pct, flagging improvements and regressions."""
+    changed = [row for row in rows if abs(row["change_pct"]) >= threshold_pct]
+    if not changed:
+        print(f"No metric changed by {threshold_pct:g}% or more.")
+        return
+    for row in changed:
+        marker = "✅" if row["improved"] else "⚠️"
+        print(f"{marker} {row['name']:<40} {row['metric']:<22} {row['old']:>12.4g} → {row['new']:>12.4g} "
+              f"({row['change_pct']:+.1f}%)")
@@ -0,0 +1,358 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite for the search, embedding and Data File Analyzer hot paths.
+
+No network access or API key is needed: embeddings come from FakeEmbeddingTransport (deterministic
+vectors with a configurable simulated latency) or from the local hashing backend, catalogs and
+data files are synthetic (see synthetic.py). Suites:
+
+    embedding  get_embeddings() throughput: one text per call vs. batched vs. batched + concurrent vs. warm cache
+    index      index build time, load time (read vs. memory-mapped), memory footprint, query p50/p99
+               and recall@k per index type and storage
+    search     end-to-end hybrid search (BM25 + vectors) p50/p99, cold, filtered to one schema,
+               sharded by database (parallel fan-out + merge) and through the query cache,
+               and bulk throughput (batched embeddings + one blocked matrix product per block)
+    analyzer   parse time, profiling time and peak memory per file format and size (one subprocess each)
+
+Results are written as JSON (with the commit, machine and library versions), so runs can be
+compared over time:
+
+    python benchmarks/run_benchmarks.py --scale small
+    python benchmarks/run_benchmarks.py --suites index search --catalog-columns 1000 100000 --compare old.json
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# The on-disk embedding cache would turn repeated runs into cache hits; the suite manages its own caches.
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+from common import (compare_results, default_results_path, environment, latency_summary, load_results,
+                    print_comparison, reset_peak_rss, status_mb, timed, write_results)
+from synthetic import DOMAINS, FILE_FORMATS, synthetic_catalog, synthetic_file, synthetic_queries
+
+SUITES = ("embedding", "index", "search", "analyzer")
+# Catalog sizes are in columns (COLUMNS_PER_TABLE columns per table entry), file sizes in MB.
+SCALES = {
+    "small": {"catalog_columns": [1_000, 10_000], "file_sizes_mb": [1, 10]},
+    "medium": {"catalog_columns": [1_000, 100_000], "file_sizes_mb": [1, 100]},
+    "large": {"catalog_columns": [1_000, 100_000, 1_000_000], "file_sizes_mb": [1, 100, 2048]},
+}
+SEQUENTIAL_TEXTS = 100  # The one-text-per-call baseline is slow by design; it runs on a sample
+
+
+def make_provider(args):
+    """The embedding provider used for catalogs and queries: fake (simulated latency) or local hashing."""
+    from ai_embedding_logic import FakeEmbeddingTransport, LocalHashingEmbeddingBackend
+
+    if args.provider == "local":
+        return LocalHashingEmbeddingBackend(args.dimension)
+    return FakeEmbeddingTransport(dimension=args.dimension, latency_s=args.latency_ms / 1000,
+                                  per_item_latency_s=args.per_item_latency_ms / 1000)
+
+
+def embed_all(texts: list[str], provider, args) -> list[list[float]]:
+    from ai_embedding_logic import get_embeddings
+
+    result = get_embeddings(texts, batch_size=args.batch_size, max_concurrency=args.concurrency, transport=provider)
+    if not result.ok:
+        raise RuntimeError(f"{len(result.errors)} texts failed to embed: {next(iter(result.errors.values()))}")
+    return result.embeddings
+
+
+# --- Embedding ---
+def run_embedding_suite(args) -> list[dict]:
+    from ai_embedding_logic import FakeEmbeddingTransport, get_embeddings
+    from embedding_cache import EmbeddingCache
+    from vector_index import metadata_to_text
+
+    texts = [metadata_to_text(entry) for entry in synthetic_catalog(args.embedding_texts * 20)]
+    warm_cache = EmbeddingCache(":memory:")
+    cases = [
+        # name, texts, batch size, concurrency, cache
+        ("one_text_per_call", texts[:SEQUENTIAL_TEXTS], 1, 1, None),
+        ("batched", texts, args.batch_size, 1, None),
+        ("batched_concurrent", texts, args.batch_size, args.concurrency, None),
+        ("warm_cache", texts, args.batch_size, args.concurrency, warm_cache),
+    ]
+    get_embeddings(texts, args.batch_size, args.concurrency, FakeEmbeddingTransport(args.dimension, 0.0), warm_cache)
+
+    results = []
+    for name, case_texts, batch_size, concurrency, cache in cases:
+        transport = FakeEmbeddingTransport(dimension=args.dimension, latency_s=args.latency_ms / 1000,
+                                           per_item_latency_s=args.per_item_latency_ms / 1000)
+        _, seconds = timed(get_embeddings, case_texts, batch_size, concurrency, transport, cache)
+        results.append({
+            "suite": "embedding", "name": f"embedding/{name}", "texts": len(case_texts),
+            "batch_size": batch_size, "concurrency": concurrency, "provider_calls": transport.calls,
+            "total_s": seconds, "texts_per_s": len(case_texts) / seconds if seconds else 0.0,
+        })
+    return results
+
+
+# --- Index ---
+_catalog_vectors = {}  # catalog columns -> (entries, vectors, query texts, query vectors, embed seconds)
+
+
+def catalog_with_vectors(columns: int, provider, args):
+    """Generates and embeds a catalog (and its queries) once per size; the index and search suites share it."""
+    if columns not in _catalog_vectors:
+        entries = synthetic_catalog(columns)
+        queries = synthetic_queries(entries, args.queries)
+        from vector_index import metadata_to_text
+
+        vectors, embed_seconds = timed(embed_all, [metadata_to_text(entry) for entry in entries], provider, args)
+        query_vectors = embed_all(queries, provider, args)
+        _catalog_vectors[columns] = (entries, vectors, queries, query_vectors, embed_seconds)
+    return _catalog_vectors[columns]
+
+
+def run_index_suite(args, provider) -> list[dict]:
+    from vector_index import MetadataIndex, recall_at_k
+
+    results = []
+    for columns in args.catalog_columns:
+        entries, vectors, _, query_vectors, embed_seconds = catalog_with_vectors(columns, provider, args)
+        exact = None
+        for index_type in args.index_types:
+            for storage in args.storage:
+                rss_before = status_mb("VmRSS")
+                index = MetadataIndex(args.dimension, index_type=index_type, storage=storage,
+                                      rerank_factor=args.rerank_factor if storage != "float32" else 1)
+                _, build_seconds = timed(index.add, entries, vectors)
+                rss_delta = status_mb("VmRSS") - rss_before
+
+                latencies = [timed(index.search, query, args.k)[1] for query in query_vectors]
+                if exact is None:
+                    exact = index.to_exact()
+                recall = recall_at_k(index, exact, query_vectors, args.k)
+                footprint = index.memory_footprint()
+                with tempfile.TemporaryDirectory(prefix="bench_index_") as index_dir:
+                    index.save(index_dir)
+                    _, load_seconds = timed(MetadataIndex.load, index_dir, mmap=False)
+                    _, mmap_load_seconds = timed(MetadataIndex.load, index_dir, mmap=True)
+                results.append({
+                    "suite": "index", "name": f"index/{index_type}-{storage}/{columns}cols",
+                    "catalog_columns": columns, "entries": len(entries), "index_type": index_type,
+                    "storage": storage, "embed_s": embed_seconds, "build_s": build_seconds,
+                    "load_s": load_seconds, "mmap_load_s": mmap_load_seconds,
+                    "index_mb": footprint["index_bytes"] / (1024 * 1024), "rss_delta_mb": rss_delta,
+                    "recall_at_k": recall, **latency_summary(latencies),
+                })
+                print(_describe(results[-1]))
+    return results
+
+
+# --- Search ---
+def run_search_suite(args, provider) -> list[dict]:
+    from hybrid_search import BM25Index, hybrid_search, looks_like_identifier
+    from search_cache import QueryCache
+    from search_engine import SemanticSearchEngine
+    from sharded_index import ShardedIndex
+    from vector_index import MetadataIndex
+
+    results = []
+    for columns in args.catalog_columns:
+        entries, vectors, queries, _, _ = catalog_with_vectors(columns, provider, args)
+        index = MetadataIndex(args.dimension, index_type=args.search_index_type)
+        index.add(entries, vectors)
+        lexical_index, bm25_seconds = timed(BM25Index, list(index.entries()))
+
+        # The same catalog split into one shard per database
+        sharded_dir = tempfile.mkdtemp(prefix="bench_shards_")
+        sharded_index = ShardedIndex(sharded_dir, dimension=args.dimension)
+        for source in sorted({entry["source"] for entry in entries}):
+            positions = [position for position, entry in enumerate(entries) if entry["source"] == source]
+            shard = MetadataIndex(args.dimension, index_type=args.search_index_type)
+            shard.add([entries[position] for position in positions], [vectors[position] for position in positions])
+            sharded_index.add_shard(source, shard)
+        sharded_lexical_index = sharded_index.lexical_index()
+
+        def embed_query(query: str) -> list[float]:
+            return provider([query])[0]  # One provider call per query, as in the app
+
+        query_cache = QueryCache()
+
+        def cached_search(query: str) -> list[dict]:
+            return query_cache.get_results(
+                query, index.version, args.k, None,
+                lambda: hybrid_search(query, index, lexical_index,
+                                      lambda text: query_cache.get_embedding(text, provider.model_name, embed_query),
+                                      k=args.k),
+            )
+
+        cases = [
+            ("cold", lambda query: hybrid_search(query, index, lexical_index, embed_query, k=args.k)),
+            ("filtered_schema", lambda query: hybrid_search(query, index, lexical_index, embed_query, k=args.k,
+                                                            filters={"schema": DOMAINS[0]})),
+            ("sharded", lambda query: hybrid_search(query, sharded_index, sharded_lexical_index, embed_query, k=args.k)),
+            ("query_cache_warm", cached_search),
+        ]
+        for query in queries:
+            cached_search(query)  # Warm the cache before its timed pass
+        sharded_lexical_index.search(queries[0])  # Build the per-shard BM25 indexes outside the timed pass
+        for name, search_fn in cases:
+            latencies = [timed(search_fn, query)[1] for query in queries]
+            results.append({
+                "suite": "search", "name": f"search/{name}/{columns}cols", "catalog_columns": columns,
+                "entries": len(entries), "index_type": args.search_index_type, "bm25_build_s": bm25_seconds,
+                "lexical_only_share": sum(looks_like_identifier(query) for query in queries) / len(queries),
+                **latency_summary(latencies),
+            })
+            print(_describe(results[-1]))
+        shutil.rmtree(sharded_dir, ignore_errors=True)
+
+        engine = SemanticSearchEngine(index, backend=provider)
+        _, bulk_seconds = timed(engine.search_many, queries, args.k, None, args.batch_size, False)
+        results.append({
+            "suite": "search", "name": f"search/bulk/{columns}cols", "catalog_columns": columns,
+            "entries": len(entries), "index_type": args.search_index_type, "queries": len(queries),
+            "total_s": bulk_seconds, "queries_per_s": len(queries) / bulk_seconds if bulk_seconds else 0.0,
+        })
+        print(_describe(results[-1]))
+    return results
+
+
+# --- Analyzer ---
+def run_analyzer_case(path: str, file_format: str) -> dict:
+    """
+    Parses and profiles one file the way the Data File Analyzer does, in this process: files above
+    the streaming threshold get a preview plus a chunked profile, smaller ones a full parse plus an
+    in-memory profile. Returns times and the peak memory added on top of the imports.
+    """
+    import data_profiling
+    import file_ingestion
+
+    file_mb = os.path.getsize(path) / (1024 * 1024)
+    streaming = file_mb > file_ingestion.ANALYZER_STREAMING_THRESHOLD_MB
+    baseline_mb = status_mb("VmRSS")
+    reset_peak_rss()
+
+    if streaming:
+        df, parse_seconds = timed(file_ingestion.read_preview, path, file_format)
+        profiles, profile_seconds = timed(data_profiling.profile_file_streaming, path, file_format)
+    else:
+        df, parse_seconds = timed(file_ingestion.read_dataframe, path, file_format)
+        profiles, profile_seconds = timed(data_profiling.profile_dataframe, df)
+
+    return {
+        "mode": "streaming" if streaming else "in_memory",
+        "parse_s": parse_seconds,
+        "profile_s": profile_seconds,
+        "peak_extra_mb": max(0.0, status_mb("VmHWM") - baseline_mb),
+        "dataframe_mb": float(df.memory_usage(deep=True).sum()) / (1024 * 1024),
+        "rows": profiles[0]["total_rows"] if profiles else 0,
+        "columns": len(profiles),
+        "file_mb": file_mb,
+    }
+
+
+def run_analyzer_suite(args) -> list[dict]:
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="analyzer-bench-")
+    results = []
+    for size_mb in args.file_sizes_mb:
+        for file_format in args.formats:
+            info = synthetic_file(data_dir, size_mb, file_format)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run-analyzer", info["path"], file_format],
+                capture_output=True, text=True, check=True,
+            )
+            case = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append({"suite": "analyzer", "name": f"analyzer/{file_format}/{size_mb:g}mb",
+                            "format": file_format, **case})
+            print(_describe(results[-1]))
+    if not args.data_dir:
+        for name in os.listdir(data_dir):
+            os.remove(os.path.join(data_dir, name))
+        os.rmdir(data_dir)
+    return results
+
+
+# --- Reporting ---
+def _describe(record: dict) -> str:
+    if record["suite"] == "embedding":
+        return (f"{record['name']:<42} {record['texts_per_s']:10.0f} texts/s  "
+                f"({record['texts']} texts, {record['provider_calls']} calls, {record['total_s']:.2f}s)")
+    if record["suite"] == "index":
+        return (f"{record['name']:<42} build {record['build_s']:7.2f}s  "
+                f"load {record['load_s'] * 1000:7.1f}ms (mmap {record['mmap_load_s'] * 1000:5.1f}ms)  p50 {record['p50_ms']:7.2f}ms  "
+                f"p99 {record['p99_ms']:7.2f}ms  recall@k {record['recall_at_k']:.3f}  {record['index_mb']:.1f}MB")
+    if record["suite"] == "search" and "queries_per_s" in record:
+        return (f"{record['name']:<42} {record['queries_per_s']:10.0f} queries/s  "
+                f"({record['queries']} queries, {record['total_s']:.2f}s)")
+    if record["suite"] == "search":
+        return f"{record['name']:<42} p50 {record['p50_ms']:7.2f}ms  p99 {record['p99_ms']:7.2f}ms"
+    return (f"{record['name']:<42} parse {record['parse_s']:7.2f}s  profile {record['profile_s']:7.2f}s  "
+            f"peak +{record['peak_extra_mb']:8.1f}MB  ({record['mode']}, {record['file_mb']:.1f}MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--suites", nargs="*", choices=SUITES, default=list(SUITES), help="Suites to run.")
+    parser.add_argument("--scale", choices=list(SCALES), default="small",
+                        help="Preset catalog and file sizes (overridden by --catalog-columns / --file-sizes-mb).")
+    parser.add_argument("--catalog-columns", nargs="*", type=int, help="Synthetic catalog sizes, in columns.")
+    parser.add_argument("--file-sizes-mb", nargs="*", type=float, help="Synthetic data file sizes, in MB.")
+    parser.add_argument("--formats", nargs="*", choices=FILE_FORMATS, default=list(FILE_FORMATS),
+                        help="Data file formats for the analyzer suite.")
+    parser.add_argument("--data-dir", help="Keep generated data files here and reuse them in later runs.")
+    parser.add_argument("--provider", choices=("fake", "local"), default="fake",
+                        help="Embedding provider for catalogs and queries.")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated latency per fake provider call.")
+    parser.add_argument("--per-item-latency-ms", type=float, default=0.0, help="Simulated latency per embedded text.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Texts per embedding call.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent embedding calls.")
+    parser.add_argument("--embedding-texts", type=int, default=1_000, help="Texts embedded by the embedding suite.")
+    parser.add_argument("--index-types", nargs="*", default=["flat", "ivf", "hnsw"], help="Index types to build.")
+    parser.add_argument("--storage", nargs="*", default=["float32"], help="Vector storage types to build.")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="Re-ranking factor for quantized storage.")
+    parser.add_argument("--search-index-type", default="flat", help="Index type used by the search suite.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per catalog.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query.")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/bench-<timestamp>.json).")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="Compare with a previous result file; with two files, only compare them.")
+    parser.add_argument("--run-analyzer", nargs=2, metavar=("PATH", "FORMAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_analyzer:
+        print(json.dumps(run_analyzer_case(*args.run_analyzer)))
+        return
+    if args.compare and len(args.compare) == 2:
+        print_comparison(compare_results(load_results(args.compare[0]), load_results(args.compare[1])))
+        return
+
+    args.catalog_columns = args.catalog_columns or SCALES[args.scale]["catalog_columns"]
+    args.file_sizes_mb = args.file_sizes_mb or SCALES[args.scale]["file_sizes_mb"]
+    provider = make_provider(args)
+
+    results = []
+    for suite in args.suites:
+        print(f"--- {suite} ---")
+        if suite == "embedding":
+            suite_results = run_embedding_suite(args)
+            for record in suite_results:
+                print(_describe(record))
+        elif suite == "index":
+            suite_results = run_index_suite(args, provider)
+        elif suite == "search":
+            suite_results = run_search_suite(args, provider)
+        else:
+            suite_results = run_analyzer_suite(args)
+        results.extend(suite_results)
+
+    payload = {"meta": {**environment(), "args": vars(args)}, "results": results}
+    write_results(args.output or default_results_path("bench"), payload)
+    if args.compare:
+        print(f"--- Compared with {args.compare[0]} ---")
+        print_comparison(compare_results(load_results(args.compare[0]), payload))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/synthetic.py
+"""
+Synthetic, deterministic inputs for the benchmarks: metadata catalogs shaped like crawled
+entries ({source, schema, owner, table, columns, column_types, description}), search queries against them, and CSV/JSON data files
+of a target size for the Data File Analyzer.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS_PER_TABLE = 20
+FILE_FORMATS = ("csv", "json", "ndjson")
+FILE_BLOCK_ROWS = 50_000
+
+# --- Vocabulary ---
+DOMAINS = ["sales", "billing", "crm", "inventory", "shipping", "marketing", "support", "hr", "finance", "analytics"]
+ENTITIES = ["customer", "order", "invoice", "payment", "product", "shipment", "campaign", "ticket",
+            "employee", "account", "supplier", "warehouse", "session", "subscription", "refund", "lead"]
+ATTRIBUTES = ["id", "name", "email", "phone", "status", "amount", "currency", "country", "city", "created_at",
+              "updated_at", "deleted_at", "quantity", "price", "discount", "score", "type", "category",
+              "code", "notes", "owner", "region", "channel", "source", "total", "balance", "date", "count"]
+NUMERIC_ATTRIBUTES = {"amount", "quantity", "price", "discount", "score", "total", "balance", "count"}
+TIMESTAMP_ATTRIBUTES = {"created_at", "updated_at", "deleted_at", "date"}
+SOURCES = ["warehouse", "operational", "lake"]
+OWNERS = ["data_platform", "analytics_eng", "finance_ops", "growth", "support_ops", "hr_systems", "sales_ops"]
+PURPOSES = ["tracks", "stores", "records", "lists", "aggregates", "links"]
+QUERY_TEMPLATES = [
+    "which table stores {entity} {attribute}",
+    "where do we keep the {attribute} of each {entity}",
+    "{domain} data about {entity} {attribute}",
+    "find {entity} records with their {attribute} and {other}",
+    "{entity} {attribute} history",
+]
+
+
+def _column_type(column: str) -> str:
+    """Derives a plausible SQL type from a synthetic column's attribute suffix."""
+    if column.endswith("_id"):
+        return "bigint"
+    if any(column.endswith(attribute) for attribute in TIMESTAMP_ATTRIBUTES):
+        return "timestamp"
+    if any(column.endswith(attribute) for attribute in NUMERIC_ATTRIBUTES):
+        return "numeric"
+    return "text"
+
+
+def _table_entry(rng: np.random.Generator, position: int, columns_per_table: int) -> dict:
+    domain = DOMAINS[position % len(DOMAINS)]
+    entity = ENTITIES[rng.integers(len(ENTITIES))]
+    table = f"{domain}_{entity}_{position}"
+    columns = [f"{entity}_id"]
+    while len(columns) < columns_per_table:
+        owner = entity if rng.random() < 0.5 else ENTITIES[rng.integers(len(ENTITIES))]
+        column = f"{owner}_{ATTRIBUTES[rng.integers(len(ATTRIBUTES))]}"
+        columns.append(column if column not in columns else f"{column}_{len(columns)}")
+    related = ENTITIES[rng.integers(len(ENTITIES))]
+    description = (f"{PURPOSES[rng.integers(len(PURPOSES))].capitalize()} {entity} data for the {domain} team, "
+                   f"including {columns[1].replace('_', ' ')} and {columns[2].replace('_', ' ')}, "
+                   f"linked to {related} records.")
+    source = SOURCES[position % len(SOURCES)]
+    return {"id": f"{source}.{domain}.{table}", "source": source, "schema": domain,
+            "owner": OWNERS[position % len(OWNERS)], "table": table, "columns": columns,
+            "column_types": [_column_type(column) for column in columns], "description": description}
+
+
+def synthetic_catalog(total_columns: int, columns_per_table: int = COLUMNS_PER_TABLE, seed: int = 0) -> list[dict]:
+    """Returns metadata entries with about total_columns columns in all, columns_per_table per table."""
+    rng = np.random.default_rng(seed)
+    tables = max(1, total_columns // columns_per_table)
+    return [_table_entry(rng, position, columns_per_table) for position in range(tables)]
+
+
+def synthetic_queries(catalog: list[dict], count: int, identifier_share: float = 0.2, seed: int = 1) -> list[str]:
+    """
+    Returns search queries: mostly natural-language questions, plus a share of bare column names
+    taken from the catalog (the identifier-like queries that hybrid search answers lexically).
+    """
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        if rng.random() < identifier_share:
+            entry = catalog[rng.integers(len(catalog))]
+            queries.append(entry["columns"][rng.integers(len(entry["columns"]))])
+            continue
+        template = QUERY_TEMPLATES[rng.integers(len(QUERY_TEMPLATES))]
+        queries.append(template.format(
+            domain=DOMAINS[rng.integers(len(DOMAINS))],
+            entity=ENTITIES[rng.integers(len(ENTITIES))],
+            attribute=ATTRIBUTES[rng.integers(len(ATTRIBUTES))].replace("_", " "),
+            other=ATTRIBUTES[rng.integers(len(ATTRIBUTES))].replace("_", " "),
+        ))
+    return queries
+
+
+# --- Data Files ---
+def _data_block(rng: np.random.Generator, start: int, rows: int, nested: bool) -> pd.DataFrame:
+    """One block of rows: ids, numerics with nulls, low-cardinality strings, ISO timestamps and free text."""
+    df = pd.DataFrame({
+        "id": np.arange(start, start + rows),
+        "customer_id": rng.integers(0, 100_000, rows),
+        "email": [f"user{n}@example.com" for n in rng.integers(0, 100_000, rows)],
+        "amount": rng.gamma(2.0, 50.0, rows).round(2),
+        "discount": np.where(rng.random(rows) < 0.2, np.nan, rng.random(rows).round(4)),
+        "country": rng.choice(["US", "DE", "IN", "BR", "JP", "FR"], rows),
+        "status": rng.choice(np.array(["new", "paid", "shipped", "returned", None], dtype=object), rows),
+        "created_at": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s"))
+        .strftime("%Y-%m-%dT%H:%M:%S"),
+        "notes": rng.choice(["", "gift wrap", "leave at the door", "call before delivery", "fragile"], rows),
+    })
+    if nested:
+        # JSON records carry a nested object, which the analyzer flattens into 'address.city' / 'address.zip'
+        cities = rng.choice(["Berlin", "Chennai", "Austin", "Osaka"], rows)
+        zips = rng.integers(10_000, 99_999, rows)
+        df["address"] = [{"city": city, "zip": int(zip_code)} for city, zip_code in zip(cities, zips)]
+    return df
+
+
+def write_synthetic_file(path: str, size_mb: float, file_format: str, seed: int = 0) -> dict:
+    """
+    Writes a synthetic data file of about size_mb megabytes, block by block, so generating a
+    multi-gigabyte file needs only one block in memory. file_format is 'csv', 'json' (one
+    top-level array of records) or 'ndjson'. Returns the path, format, rows and actual size.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown synthetic file format '{file_format}'. Expected one of {FILE_FORMATS}.")
+    rng = np.random.default_rng(seed)
+    target_bytes = int(size_mb * 1024 * 1024)
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if file_format == "json":
+            f.write("[\n")
+        while f.tell() < target_bytes:
+            # A small first block measures the row size; later blocks shrink near the target,
+            # so small files are not overshot by a whole block
+            if rows == 0:
+                block_rows = 1_000
+            else:
+                remaining_rows = (target_bytes - f.tell()) // max(1, f.tell() // rows) + 1
+                block_rows = int(min(FILE_BLOCK_ROWS, max(100, remaining_rows)))
+            block = _data_block(rng, rows, block_rows, nested=file_format != "csv")
+            if file_format == "csv":
+                block.to_csv(f, index=False, header=rows == 0)
+            else:
+                lines = block.to_json(orient="records", lines=True).strip()
+                if file_format == "json":
+                    lines = (",\n" if rows else "") + lines.replace("\n", ",\n")
+                f.write(lines + "\n" if file_format == "ndjson" else lines)
+            rows += block_rows
+        if file_format == "json":
+            f.write("\n]\n")
+    return {"path": path, "format": file_format, "rows": rows, "size_mb": os.path.getsize(path) / (1024 * 1024)}
+
+
+def synthetic_file(directory: str, size_mb: float, file_format: str) -> dict:
+    """
+    Returns a synthetic file of this size and format in directory, generating it only if it is not
+    there yet, so large files can be reused across benchmark runs (see --data-dir).
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic_{size_mb:g}mb.{file_format}")
+    info_path = path + ".info.json"
+    if os.path.exists(path) and os.path.exists(info_path):
+        with open(info_path) as f:
+            return json.load(f)
+    info = write_synthetic_file(path, size_mb, file_format)
+    with open(info_path, "w") as f:
+        json.dump(info, f)
+    return info
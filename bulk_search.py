@@ -0,0 +1,122 @@
+# bulk_search.py
+import csv
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pa_parquet
+
+from search_engine import SEARCH_TOP_K
+
+# --- Bulk Search Settings ---
+# Queries are embedded and scored this many at a time; results are written out after each block.
+BULK_SEARCH_BLOCK_SIZE = int(os.getenv("BULK_SEARCH_BLOCK_SIZE", "1000"))
+QUERY_FILE_FORMATS = ("txt", "csv", "parquet")
+OUTPUT_FORMATS = ("csv", "parquet")
+# Column holding the queries in CSV/Parquet query files; otherwise the first column is used.
+QUERY_COLUMN_NAMES = ("query", "term", "question")
+
+# One row per (query, result). A query without results gets one row with an empty rank and table.
+RESULT_SCHEMA = pa.schema([
+    ("query", pa.string()),
+    ("rank", pa.int32()),
+    ("table", pa.string()),
+    ("id", pa.string()),
+    ("columns", pa.string()),
+    ("description", pa.string()),
+    ("score", pa.float64()),
+    ("match", pa.string()),
+])
+
+
+def read_queries(source, file_name: str | None = None) -> list[str]:
+    """
+    Reads bulk queries from a .txt file (one per line) or a .csv/.parquet file (the 'query', 'term'
+    or 'question' column, else the first column; CSV files need a header row). source is a path or
+    a file-like object such as a Streamlit upload, whose name is used when file_name is not given.
+    Blank queries are dropped.
+    """
+    file_name = file_name or getattr(source, "name", None) or str(source)
+    extension = os.path.splitext(file_name)[1].lower().lstrip(".")
+    if extension == "txt":
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        else:
+            data = source.read()
+            lines = (data.decode("utf-8") if isinstance(data, bytes) else data).splitlines()
+    elif extension in ("csv", "parquet"):
+        df = pd.read_csv(source, dtype=str, keep_default_na=False) if extension == "csv" else pd.read_parquet(source)
+        if len(df.columns) == 0:
+            return []
+        column = next((c for c in df.columns if str(c).strip().lower() in QUERY_COLUMN_NAMES), df.columns[0])
+        lines = df[column].dropna().astype(str).tolist()
+    else:
+        raise ValueError(f"Unsupported query file '{file_name}'. Expected one of {QUERY_FILE_FORMATS}.")
+    return [line.strip() for line in lines if line.strip()]
+
+
+def result_rows(queries: list[str], all_results: list[list[dict]]) -> list[dict]:
+    """Flattens one result list per query into result rows (see RESULT_SCHEMA)."""
+    rows = []
+    for query, results in zip(queries, all_results):
+        if not results:
+            rows.append({"query": query, "rank": None, "table": None, "id": None, "columns": None,
+                         "description": None, "score": None, "match": None})
+        for rank, result in enumerate(results, start=1):
+            rows.append({
+                "query": query,
+                "rank": rank,
+                "table": result["table"],
+                "id": result.get("id"),
+                "columns": ", ".join(result.get("columns", [])),
+                "description": result.get("description", ""),
+                "score": result.get("score"),
+                "match": result.get("match"),
+            })
+    return rows
+
+
+def iter_bulk_search(engine, queries: list[str], k: int = SEARCH_TOP_K, filters: dict | None = None,
+                     block_size: int = BULK_SEARCH_BLOCK_SIZE):
+    """
+    Searches queries block by block with engine.search_many(), yielding each block's result rows.
+    The query cache is bypassed so a large bulk run does not evict interactive queries.
+    """
+    for start in range(0, len(queries), block_size):
+        block = queries[start:start + block_size]
+        yield result_rows(block, engine.search_many(block, k, filters, use_cache=False))
+
+
+def write_bulk_results(row_blocks, output, output_format: str = "csv") -> int:
+    """
+    Writes result rows to output (a path or a binary file-like object) as each block arrives:
+    CSV rows are appended per block and each block becomes one Parquet row group, so the results
+    are never held in memory as a whole. Returns the number of rows written.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Expected one of {OUTPUT_FORMATS}.")
+    written = 0
+    if output_format == "parquet":
+        with pa_parquet.ParquetWriter(output, RESULT_SCHEMA) as writer:
+            for rows in row_blocks:
+                writer.write_table(pa.Table.from_pylist(rows, schema=RESULT_SCHEMA))
+                written += len(rows)
+        return written
+
+    binary = open(output, "wb") if isinstance(output, (str, os.PathLike)) else output
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    try:
+        writer = csv.DictWriter(text, fieldnames=RESULT_SCHEMA.names)
+        writer.writeheader()
+        for rows in row_blocks:
+            writer.writerows(rows)
+            text.flush()
+            written += len(rows)
+    finally:
+        text.flush()
+        text.detach()  # Leave a caller's file object open
+        if binary is not output:
+            binary.close()
+    return written
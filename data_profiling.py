@@ -0,0 +1,408 @@
+# data_profiling.py
+import numpy as np
+import pandas as pd
+
+from file_ingestion import DEFAULT_CHUNK_ROWS, iter_dataframe_chunks
+from metrics import COLUMN_PROFILE_LATENCY, DATASET_PROFILE_LATENCY, track_latency
+from sketches import DEFAULT_HLL_PRECISION, DEFAULT_TOPK_CAPACITY, HyperLogLog, SpaceSaving
+
+TOP_K = 10
+# "exact" counts every distinct value (memory grows with cardinality); "sketch" estimates distinct
+# counts and top values with fixed-size HyperLogLog and Space-Saving sketches.
+PROFILE_MODES = ("exact", "sketch")
+MAX_PENDING_COUNT_PARTS = 8  # Partial value counts merged once this many chunks have accumulated
+
+
+# --- Single-Pass Column Profiling ---
+# Every statistic is derived from one factorization of the column: pd.factorize hashes each value
+# once and returns integer codes (-1 for nulls) plus the distinct values. Null, distinct and
+# duplicate counts, top-k, min/max and numeric moments then come from the codes' bincount and the
+# (much smaller) array of distinct values, instead of separate isnull/dropna/duplicated/nunique/
+# value_counts passes that each re-hash the column.
+
+def _factorize(series: pd.Series):
+    """Returns (codes, uniques) for a column; unhashable values (e.g. nested JSON) are compared as text."""
+    try:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    except TypeError:
+        return pd.factorize(series.where(series.isna(), series.astype(str)), use_na_sentinel=True)
+    if isinstance(uniques.dtype, pd.CategoricalDtype):
+        # Categoricals are profiled by their values (unordered categories have no min/max)
+        uniques = uniques.categories.take(uniques.codes)
+    return codes, uniques
+
+
+def _value_counts(series: pd.Series) -> pd.Series:
+    """Counts non-null values with a single factorization: index = distinct values, values = counts."""
+    codes, uniques = _factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return pd.Series(counts, index=pd.Index(uniques, tupleize_cols=False), dtype="int64")
+
+
+def _to_builtin(value):
+    """Converts NumPy/pandas scalars to plain Python values so profiles serialize to JSON."""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def _profile_from_counts(column_name: str, dtype: str, total_rows: int, null_count: int,
+                         counts: pd.Series, top_k: int = TOP_K) -> dict:
+    """Builds a column profile from its distinct values and their counts."""
+    non_null_count = total_rows - null_count
+    distinct_count = len(counts)
+    duplicate_count = non_null_count - distinct_count
+    count_values = counts.to_numpy()
+
+    if distinct_count > top_k:
+        top_positions = np.argpartition(-count_values, top_k - 1)[:top_k]
+        top_positions = top_positions[np.argsort(-count_values[top_positions], kind="stable")]
+    else:
+        top_positions = np.argsort(-count_values, kind="stable")
+    top_values = [_to_builtin(value) for value in counts.index[top_positions]]
+
+    profile = {
+        "column": column_name,
+        "dtype": dtype,
+        "total_rows": total_rows,
+        "null_count": null_count,
+        "null_pct": (null_count / total_rows * 100) if total_rows > 0 else 0.0,
+        "distinct_count": distinct_count,
+        "duplicate_count": duplicate_count,
+        "duplicate_pct": (duplicate_count / non_null_count * 100) if non_null_count > 0 else 0.0,
+        "top_values": top_values,
+        "min": None,
+        "max": None,
+        "mean": None,
+        "std": None,
+    }
+    if distinct_count == 0:
+        return profile
+
+    uniques = counts.index
+    try:
+        profile["min"] = _to_builtin(uniques.min())
+        profile["max"] = _to_builtin(uniques.max())
+    except TypeError:
+        pass  # Mixed types without an ordering
+
+    if pd.api.types.is_numeric_dtype(uniques.dtype):
+        # Moments over distinct values weighted by their counts equal the moments over all rows.
+        values = uniques.to_numpy(dtype="float64")
+        weights = count_values.astype("float64")
+        mean = float(np.dot(values, weights) / non_null_count)
+        profile["mean"] = mean
+        if non_null_count > 1:
+            profile["std"] = float(np.sqrt(np.dot(weights, (values - mean) ** 2) / (non_null_count - 1)))
+    return profile
+
+
+def profile_series(series: pd.Series, top_k: int = TOP_K) -> dict:
+    """Profiles one in-memory column with a single factorization."""
+    with track_latency(COLUMN_PROFILE_LATENCY, "column_profile", mode="exact"):
+        codes, uniques = _factorize(series)
+        null_count = int((codes < 0).sum())
+        counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(uniques)),
+                           index=pd.Index(uniques, tupleize_cols=False), dtype="int64")
+        return _profile_from_counts(str(series.name), str(series.dtype), len(series), null_count, counts, top_k)
+
+
+def profile_series_sketch(series: pd.Series, top_k: int = TOP_K) -> dict:
+    """Profiles one in-memory column with fixed-size sketches instead of exact counts."""
+    with track_latency(COLUMN_PROFILE_LATENCY, "column_profile", mode="sketch"):
+        accumulator = SketchColumnAccumulator(str(series.name))
+        # Fed in slices so the per-slice counts folded into Space-Saving stay bounded too.
+        for start in range(0, max(len(series), 1), DEFAULT_CHUNK_ROWS):
+            accumulator.update(series.iloc[start:start + DEFAULT_CHUNK_ROWS])
+        return accumulator.profile(top_k)
+
+
+def profile_dataframe(df: pd.DataFrame, top_k: int = TOP_K, mode: str = "exact") -> list[dict]:
+    """Profiles every column of a DataFrame; in exact mode each column is factorized exactly once."""
+    profile_fn = profile_series_sketch if mode == "sketch" else profile_series
+    with track_latency(DATASET_PROFILE_LATENCY, "dataset_profile", mode=mode, executor="inline"):
+        return [profile_fn(df[column], top_k) for column in df.columns]
+
+
+def _combined_dtype(dtypes: list[str], missing: bool = False) -> str:
+    """
+    The column's data type across all chunks (chunks can disagree, e.g. int vs float with nulls).
+    missing: some rows lacked the column entirely, which pandas reads as nulls, so integer and
+    boolean columns widen as they would in a single read of the file.
+    """
+    if len(dtypes) == 1:
+        dtype = dtypes[0]
+    elif dtypes and all(pd.api.types.is_numeric_dtype(dtype) for dtype in dtypes):
+        dtype = "float64"
+    else:
+        return "object"
+    if missing and pd.api.types.is_bool_dtype(dtype):
+        return "object"
+    if missing and pd.api.types.is_integer_dtype(dtype):
+        return "float64"
+    return dtype
+
+
+# --- Streaming Profiling ---
+class ColumnStatsAccumulator:
+    """
+    Folds a column profile over a stream of chunks. Per-chunk value counts are merged
+    incrementally, so memory is bounded by the column's cardinality rather than by the file size.
+    """
+
+    def __init__(self, column_name: str):
+        self.column_name = column_name
+        self.total_rows = 0
+        self.null_count = 0
+        self._dtypes = []
+        self._missing = False  # Some rows lacked the column (see add_nulls)
+        self._counts = pd.Series(dtype="int64")
+        self._pending_counts = []
+
+    def update(self, column_data: pd.Series) -> None:
+        """Folds one chunk of the column into the statistics."""
+        counts = _value_counts(column_data)
+        self.total_rows += len(column_data)
+        self.null_count += len(column_data) - int(counts.sum())
+        if str(column_data.dtype) not in self._dtypes:
+            self._dtypes.append(str(column_data.dtype))
+        self._pending_counts.append(counts)
+        if len(self._pending_counts) >= MAX_PENDING_COUNT_PARTS:
+            self._merge_counts()
+
+    def add_nulls(self, row_count: int) -> None:
+        """Counts row_count rows that lacked the column (e.g. JSON records without the key) as nulls."""
+        self.total_rows += row_count
+        self.null_count += row_count
+        self._missing = self._missing or row_count > 0
+
+    def _merge_counts(self) -> None:
+        if self._pending_counts:
+            parts = [self._counts, *self._pending_counts] if len(self._counts) else self._pending_counts
+            self._counts = pd.concat(parts).groupby(level=0, sort=False).sum()
+            self._pending_counts = []
+
+    @property
+    def dtype(self) -> str:
+        return _combined_dtype(self._dtypes, self._missing)
+
+    def profile(self, top_k: int = TOP_K) -> dict:
+        """Returns the column profile over every chunk seen so far."""
+        self._merge_counts()
+        return _profile_from_counts(self.column_name, self.dtype, self.total_rows, self.null_count,
+                                    self._counts, top_k)
+
+    def report(self) -> dict:
+        """Returns the column report in the shape rendered by the Data File Analyzer."""
+        return column_report(self.profile())
+
+
+class SketchColumnAccumulator:
+    """
+    Folds an approximate column profile over a stream of chunks in fixed memory: HyperLogLog for
+    the distinct (and so duplicate) count, Space-Saving for the top values, and exact running
+    null count, min/max and numeric moments. Accumulators for the same column merge, so chunks
+    can be profiled independently (e.g. by worker processes) and combined.
+    """
+
+    def __init__(self, column_name: str, hll_precision: int = DEFAULT_HLL_PRECISION,
+                 topk_capacity: int = DEFAULT_TOPK_CAPACITY):
+        self.column_name = column_name
+        self.total_rows = 0
+        self.null_count = 0
+        self.distinct = HyperLogLog(hll_precision)
+        self.top_values = SpaceSaving(topk_capacity)
+        self._dtypes = []
+        self._missing = False  # Some rows lacked the column (see add_nulls)
+        self._min = None
+        self._max = None
+        self._orderable = True
+        self._numeric = True
+        self._moments = (0, 0.0, 0.0)  # (count, mean, sum of squared deviations)
+
+    def update(self, column_data: pd.Series) -> None:
+        """Folds one chunk of the column into the sketches."""
+        values = column_data.dropna()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)  # Unordered categories have no min/max
+        self.total_rows += len(column_data)
+        self.null_count += len(column_data) - len(values)
+        if str(column_data.dtype) not in self._dtypes:
+            self._dtypes.append(str(column_data.dtype))
+        self.distinct.add(values)
+        self.top_values.add(values)
+        if len(values) == 0:
+            return
+        if self._orderable:
+            try:
+                self._fold_range(values.min(), values.max())
+            except TypeError:
+                self._orderable = False  # Mixed types without an ordering
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            numbers = values.to_numpy(dtype="float64")
+            mean = float(numbers.mean())
+            self._fold_moments((len(numbers), mean, float(np.square(numbers - mean).sum())))
+        else:
+            self._numeric = False
+
+    def add_nulls(self, row_count: int) -> None:
+        """Counts row_count rows that lacked the column (e.g. JSON records without the key) as nulls."""
+        self.total_rows += row_count
+        self.null_count += row_count
+        self._missing = self._missing or row_count > 0
+
+    def _fold_range(self, low, high) -> None:
+        self._min = low if self._min is None else min(self._min, low)
+        self._max = high if self._max is None else max(self._max, high)
+
+    def _fold_moments(self, other: tuple) -> None:
+        # Chan et al.'s parallel update of count, mean and M2.
+        count_a, mean_a, m2_a = self._moments
+        count_b, mean_b, m2_b = other
+        count = count_a + count_b
+        if count:
+            delta = mean_b - mean_a
+            self._moments = (count, mean_a + delta * count_b / count,
+                             m2_a + m2_b + delta * delta * count_a * count_b / count)
+
+    def merge(self, other: "SketchColumnAccumulator") -> "SketchColumnAccumulator":
+        """Folds another accumulator of the same column into this one and returns self."""
+        self.total_rows += other.total_rows
+        self.null_count += other.null_count
+        self._dtypes += [dtype for dtype in other._dtypes if dtype not in self._dtypes]
+        self._missing = self._missing or other._missing
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+        self._orderable = self._orderable and other._orderable
+        if self._orderable and other._min is not None:
+            try:
+                self._fold_range(other._min, other._max)
+            except TypeError:
+                self._orderable = False
+        self._numeric = self._numeric and other._numeric
+        self._fold_moments(other._moments)
+        return self
+
+    @property
+    def dtype(self) -> str:
+        return _combined_dtype(self._dtypes, self._missing)
+
+    def profile(self, top_k: int = TOP_K) -> dict:
+        """Returns the approximate column profile, with its error bounds, over every chunk seen so far."""
+        non_null_count = self.total_rows - self.null_count
+        # The estimate can never exceed the number of values seen (or be zero when values were seen).
+        distinct_count = min(non_null_count, max(int(round(self.distinct.estimate())), 1 if non_null_count else 0))
+        duplicate_count = non_null_count - distinct_count
+        count, mean, m2 = self._moments
+        numeric = self._numeric and count > 0
+        return {
+            "column": self.column_name,
+            "dtype": self.dtype,
+            "total_rows": self.total_rows,
+            "null_count": self.null_count,
+            "null_pct": (self.null_count / self.total_rows * 100) if self.total_rows > 0 else 0.0,
+            "distinct_count": distinct_count,
+            "duplicate_count": duplicate_count,
+            "duplicate_pct": (duplicate_count / non_null_count * 100) if non_null_count > 0 else 0.0,
+            "top_values": [_to_builtin(value) for value, _, _ in self.top_values.top(top_k)],
+            "min": _to_builtin(self._min) if self._orderable else None,
+            "max": _to_builtin(self._max) if self._orderable else None,
+            "mean": mean if numeric else None,
+            "std": float(np.sqrt(m2 / (count - 1))) if numeric and count > 1 else None,
+            "approximate": True,
+            "distinct_error_pct": self.distinct.relative_error * 100,
+            "top_count_error": self.top_values.max_error,
+        }
+
+    def report(self) -> dict:
+        """Returns the column report in the shape rendered by the Data File Analyzer."""
+        return column_report(self.profile())
+
+
+def _new_accumulator(column_name: str, mode: str):
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}'. Expected one of {PROFILE_MODES}.")
+    return SketchColumnAccumulator(column_name) if mode == "sketch" else ColumnStatsAccumulator(column_name)
+
+
+def profile_file_streaming(source, file_format: str | None = None, chunk_rows: int | None = None,
+                           top_k: int = TOP_K, mode: str = "exact") -> list[dict]:
+    """
+    Profiles every column of a file (upload or local path) in one chunked pass over it.
+    Chunks of JSON records can disagree on their columns: a column absent from a chunk counts that
+    chunk's rows as nulls, and a column first seen in a later chunk counts every earlier row as nulls.
+    """
+    accumulators = {}
+    rows_seen = 0
+    kwargs = {"chunk_rows": chunk_rows} if chunk_rows else {}
+    with track_latency(DATASET_PROFILE_LATENCY, "dataset_profile", mode=mode, executor="streaming"):
+        for chunk in iter_dataframe_chunks(source, file_format, **kwargs):
+            for column in chunk.columns:
+                if column not in accumulators:
+                    accumulators[column] = _new_accumulator(str(column), mode)
+                    accumulators[column].add_nulls(rows_seen)
+            for column, accumulator in accumulators.items():
+                if column in chunk.columns:
+                    accumulator.update(chunk[column])
+                else:
+                    accumulator.add_nulls(len(chunk))
+            rows_seen += len(chunk)
+        return [accumulator.profile(top_k) for accumulator in accumulators.values()]
+
+
+def compare_profiles(exact: dict, approximate: dict) -> dict:
+    """Measures a sketch profile against the exact profile of the same column."""
+    exact_distinct = exact["distinct_count"]
+    exact_top = exact["top_values"]
+    return {
+        "column": exact["column"],
+        "exact_distinct": exact_distinct,
+        "estimated_distinct": approximate["distinct_count"],
+        "distinct_error_pct": (abs(approximate["distinct_count"] - exact_distinct) / exact_distinct * 100
+                               if exact_distinct else 0.0),
+        "distinct_error_bound_pct": approximate.get("distinct_error_pct", 0.0),
+        "top_values_overlap": (len(set(map(str, exact_top)) & set(map(str, approximate["top_values"])))
+                               / len(exact_top) if exact_top else 1.0),
+    }
+
+
+# --- Analyzer Reports ---
+def column_report(profile: dict) -> dict:
+    """
+    Formats a column profile as the report rendered (and downloaded) by the Data File Analyzer.
+    Sketch estimates are marked with '~' and their standard error.
+    """
+    if profile.get("approximate"):
+        error = f" (±{profile['distinct_error_pct']:.1f}%)"
+        duplicates = f"~{profile['duplicate_count']} ({profile['duplicate_pct']:.2f}%)"
+        unique_values = f"~{profile['distinct_count']}{error}"
+    else:
+        duplicates = f"{profile['duplicate_count']} ({profile['duplicate_pct']:.2f}%)"
+        unique_values = profile["distinct_count"]
+    return {
+        "Column Name": profile["column"],
+        "Total Rows": profile["total_rows"],
+        "Null Values": f"{profile['null_count']} ({profile['null_pct']:.2f}%)",
+        "Duplicate Values": duplicates,
+        "Unique Values": unique_values,
+        "Data Type": profile["dtype"],
+        "Top 10 Unique Values": profile["top_values"][:10],
+    }
+
+
+def compute_column_report(column_data: pd.Series, mode: str = "exact") -> dict:
+    """Builds the data quality report for an in-memory column."""
+    return column_report(profile_series_sketch(column_data) if mode == "sketch" else profile_series(column_data))
+
+
+def compute_column_report_streaming(source, column_name: str, file_format: str | None = None,
+                                    chunk_rows: int | None = None, mode: str = "exact") -> dict:
+    """
+    Builds the data quality report for one column of a file (upload or local path) by streaming
+    it in chunks, so files far larger than memory can be profiled.
+    """
+    accumulator = _new_accumulator(column_name, mode)
+    kwargs = {"chunk_rows": chunk_rows} if chunk_rows else {}
+    for chunk in iter_dataframe_chunks(source, file_format, columns=[column_name], **kwargs):
+        accumulator.update(chunk[column_name])
+    return accumulator.report()
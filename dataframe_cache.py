@@ -0,0 +1,86 @@
+# dataframe_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from file_ingestion import iter_byte_chunks
+from metrics import record_cache_lookups
+
+# Memory budget for parsed DataFrames shared by all analyzer sessions of this process.
+ANALYZER_PARSE_CACHE_MB = float(os.getenv("ANALYZER_PARSE_CACHE_MB", "1024"))
+
+
+def content_hash(source) -> str:
+    """Hashes the content of an upload or local path chunk by chunk (never holding the whole file)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter_byte_chunks(source):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DataFrameCache:
+    """
+    An LRU cache of parsed DataFrames keyed by (content hash, parse options), bounded by the
+    DataFrames' total memory. Cached frames are shared between sessions and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int = int(ANALYZER_PARSE_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()  # key -> (DataFrame, size in bytes, parse seconds)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_parse(self, key: tuple, parse_fn) -> tuple[pd.DataFrame, bool, float]:
+        """
+        Returns (DataFrame, cache hit, parse seconds). On a miss, parse_fn() is called and its
+        result cached; parse seconds is how long the original parse took either way.
+        """
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                record_cache_lookups("dataframe", hits=1)
+                df, _, parse_seconds = self._frames[key]
+                return df, True, parse_seconds
+            self.misses += 1
+        record_cache_lookups("dataframe", misses=1)
+
+        started = time.perf_counter()
+        df = parse_fn()
+        parse_seconds = time.perf_counter() - started
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            if size <= self.max_bytes and key not in self._frames:
+                self._frames[key] = (df, size, parse_seconds)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted_size, _) = self._frames.popitem(last=False)
+                    self._bytes -= evicted_size
+                    self.evictions += 1
+        return df, False, parse_seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._frames),
+                "memory_mb": self._bytes / (1024 * 1024),
+                "budget_mb": self.max_bytes / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,108 @@
+# dtype_optimization.py
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Optimize DataFrames on load by default ("1") or only when the analyst opts in ("0").
+ANALYZER_OPTIMIZE_DTYPES = os.getenv("ANALYZER_OPTIMIZE_DTYPES", "0") == "1"
+# Strings with at most this share of distinct values become categoricals
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+DATE_SAMPLE_SIZE = 1_000
+ISO_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+ORIGINAL_DTYPES_ATTR = "original_dtypes"
+OPTIMIZATION_REPORT_ATTR = "dtype_optimization"
+
+
+def _memory_bytes(series: pd.Series) -> int:
+    return int(series.memory_usage(deep=True, index=False))
+
+
+def _is_string_column(series: pd.Series) -> bool:
+    if pd.api.types.is_string_dtype(series.dtype):
+        # object columns count only when every value is a string (mixed columns are left alone)
+        return series.dtype != object or series.dropna().map(type).eq(str).all()
+    return False
+
+
+def _downcast_numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype):
+        unsigned = len(series) > 0 and series.min() >= 0
+        return pd.to_numeric(series, downcast="unsigned" if unsigned else "integer")
+    if pd.api.types.is_float_dtype(series.dtype):
+        # float32 only when no value changes, so reported values and statistics stay the same
+        narrowed = series.astype("float32")
+        values, narrowed_values = series.to_numpy(), narrowed.to_numpy(dtype="float64")
+        if np.array_equal(values, narrowed_values, equal_nan=True):
+            return narrowed
+    return series
+
+
+def _parse_dates(series: pd.Series) -> pd.Series | None:
+    """Returns the column parsed as datetimes if every value is an ISO date/timestamp, else None."""
+    sample = series.dropna().head(DATE_SAMPLE_SIZE)
+    if sample.empty or not sample.map(lambda value: bool(ISO_DATE_PATTERN.match(value))).all():
+        return None
+    parsed = pd.to_datetime(series, format="ISO8601", errors="coerce")
+    return parsed if parsed.isna().sum() == series.isna().sum() else None
+
+
+def _optimize_strings(series: pd.Series) -> pd.Series:
+    dates = _parse_dates(series)
+    if dates is not None:
+        return dates
+    non_null = series.notna().sum()
+    if non_null and series.nunique(dropna=True) <= CATEGORICAL_MAX_UNIQUE_RATIO * non_null:
+        return series.astype("category")
+    return series.astype(pd.StringDtype("pyarrow"))  # Arrow-backed strings instead of Python objects
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a copy of df with smaller dtypes: integers (and losslessly representable floats)
+    downcast, low-cardinality strings as categoricals, other strings Arrow-backed, and ISO
+    date-like strings parsed as datetimes. A conversion is kept only if it saves memory.
+
+    The original dtypes are recorded in df.attrs["original_dtypes"] so reports can keep showing
+    each column's logical type, and a summary in df.attrs["dtype_optimization"].
+    """
+    optimized = []
+    changes = []
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            candidate = _downcast_numeric(series)
+        elif _is_string_column(series):
+            candidate = _optimize_strings(series)
+        else:
+            candidate = series
+
+        before, after = _memory_bytes(series), _memory_bytes(candidate)
+        if candidate is not series and after < before:
+            optimized.append(candidate)
+            changes.append({"column": str(column), "from": str(series.dtype), "to": str(candidate.dtype),
+                            "before_mb": before / (1024 * 1024), "after_mb": after / (1024 * 1024)})
+        else:
+            optimized.append(series)
+
+    result = pd.concat(optimized, axis=1) if optimized else df.copy()
+    result.columns = df.columns
+    memory_before = int(df.memory_usage(deep=True).sum())
+    memory_after = int(result.memory_usage(deep=True).sum())
+    result.attrs[ORIGINAL_DTYPES_ATTR] = {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+    result.attrs[OPTIMIZATION_REPORT_ATTR] = {
+        "memory_before_mb": memory_before / (1024 * 1024),
+        "memory_after_mb": memory_after / (1024 * 1024),
+        "saved_pct": (1 - memory_after / memory_before) * 100 if memory_before else 0.0,
+        "changes": changes,
+    }
+    return result
+
+
+def original_dtype(df: pd.DataFrame, column, default: str) -> str:
+    """The column's logical type as loaded, before any dtype optimization (default if df was not optimized)."""
+    return df.attrs.get(ORIGINAL_DTYPES_ATTR, {}).get(str(column), default)
@@ -0,0 +1,203 @@
+# embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import record_cache_lookups
+
+# --- Cache Defaults ---
+DEFAULT_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024   # On-disk budget for stored vectors
+DEFAULT_MEMORY_ENTRIES = 10_000         # Size of the in-memory LRU in front of SQLite
+EVICTION_TARGET_RATIO = 0.9             # Evict down to 90% of the budget to avoid evicting on every write
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so formatting-only changes in metadata do not miss the cache."""
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    """Returns the content hash of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed embedding cache.
+    Vectors are stored in SQLite keyed by (model name, normalized text hash), with a bounded
+    in-memory LRU in front. When the stored vectors exceed max_bytes, the least recently used
+    rows are evicted. The stored size is read from the table before each eviction decision, so
+    processes sharing the SQLite file all see each other's writes. Hit/miss counters are exposed
+    through stats().
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        # Lets the stored size be summed from a small index instead of scanning every vector
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_size ON embeddings (size)")
+        self._conn.commit()
+
+        self._memory = OrderedDict()  # (model, text_hash) -> vector, most recently used last
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _table_bytes(self) -> int:
+        """Total size of the stored vectors, including rows written by other processes."""
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    # --- In-memory LRU ---
+    def _remember(self, key: tuple, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- Lookups ---
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """Returns the cached vector for each text, or None where the cache has no entry."""
+        keys = [(model, text_hash(text)) for text in texts]
+        results = [None] * len(texts)
+        with self._lock:
+            misses_before = self.misses
+            disk_lookups = {}
+            for position, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[position] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_lookups.setdefault(key[1], []).append(position)
+
+            if disk_lookups:
+                hashes = list(disk_lookups)
+                found = {}
+                # SQLite limits the number of bound parameters, so look hashes up in chunks.
+                for start in range(0, len(hashes), 500):
+                    chunk = hashes[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *chunk],
+                    ).fetchall()
+                    found.update(rows)
+
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h in found],
+                    )
+                    self._conn.commit()
+
+                for h, positions in disk_lookups.items():
+                    if h in found:
+                        vector = np.frombuffer(found[h], dtype="float32").tolist()
+                        self._remember((model, h), vector)
+                        for position in positions:
+                            results[position] = vector
+                        self.disk_hits += len(positions)
+                    else:
+                        self.misses += len(positions)
+            misses = self.misses - misses_before
+        record_cache_lookups("embedding", hits=len(texts) - misses, misses=misses)
+        return results
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        """Returns the cached vector for a single text, or None on a miss."""
+        return self.get_many(model, [text])[0]
+
+    # --- Writes ---
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """Stores vectors for texts, evicting least recently used rows if the size budget is exceeded."""
+        now = time.time()
+        rows = {}  # text hash -> row; texts that normalize to the same text are stored once
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, text_hash(text))
+                blob = np.asarray(vector, dtype="float32").tobytes()
+                rows[key[1]] = (model, key[1], blob, len(blob), now)
+                self._remember(key, list(vector))
+            if not rows:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values()),
+            )
+            self._conn.commit()
+            stored_bytes = self._table_bytes()
+            if stored_bytes > self.max_bytes:
+                self._evict(stored_bytes, int(self.max_bytes * EVICTION_TARGET_RATIO))
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        """Stores the vector for a single text."""
+        self.put_many(model, [text], [vector])
+
+    def _evict(self, stored_bytes: int, target_bytes: int) -> None:
+        """Deletes least recently used rows until the stored size, stored_bytes before eviction, is at or below target_bytes."""
+        cursor = self._conn.execute("SELECT model, text_hash, size FROM embeddings ORDER BY last_access ASC")
+        doomed = []
+        for model, h, size in cursor:
+            if stored_bytes <= target_bytes:
+                break
+            doomed.append((model, h))
+            stored_bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", doomed)
+        self._conn.commit()
+        for key in doomed:
+            self._memory.pop(key, None)
+        self.evictions += len(doomed)
+
+    # --- Maintenance ---
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current cache sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "stored_bytes": self._table_bytes(),
+            }
+
+    def clear(self) -> None:
+        """Removes every cached vector."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._memory.clear()
+
+    def close(self) -> None:
+        """Closes the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
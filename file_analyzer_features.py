@@ -1,59 +1,147 @@
 # file_analyzer_features.py
 import streamlit as st
 import pandas as pd
-import io
 import json # For handling JSON file uploads
-from io import StringIO, BytesIO
+import time
+
+from file_ingestion import (
+    ANALYZER_MAX_UPLOAD_MB, ANALYZER_STREAMING_THRESHOLD_MB, CHUNKED_FORMATS, SUPPORTED_FORMATS,
+    read_dataframe, read_preview, source_format, source_size
+)
+from data_profiling import (
+    compare_profiles, compute_column_report, compute_column_report_streaming, profile_dataframe,
+    profile_file_streaming
+)
+
+from dataframe_cache import DataFrameCache, content_hash
+from dtype_optimization import ANALYZER_OPTIMIZE_DTYPES, OPTIMIZATION_REPORT_ATTR, optimize_dtypes, original_dtype
+from parallel_profiling import ProfileJob
+
+# Profiling modes offered by the analyzer (label -> mode)
+PROFILE_MODE_LABELS = {
+    "Exact": "exact",
+    "Approximate (sketches)": "sketch",
+    "Compare sketches vs exact": "compare",
+}
+
+@st.cache_resource
+def get_dataframe_cache() -> DataFrameCache:
+    """Parsed DataFrames shared by all analyzer sessions of this process, keyed by file content."""
+    return DataFrameCache()
+
+def get_upload_hash(uploaded_file) -> str:
+    """
+    Returns the content hash of an upload, computed once per upload: Streamlit gives every
+    upload a new file_id, so reruns on the same upload skip re-hashing the file.
+    """
+    hashes = st.session_state.setdefault('analyzer_file_hashes', {})
+    file_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if file_id not in hashes:
+        hashes.clear()  # Only the current upload's hash is worth keeping
+        hashes[file_id] = content_hash(uploaded_file)
+    return hashes[file_id]
+
+def cancel_profile_job():
+    """Cancels the session's running dataset profile job, if any (e.g. when a different file is uploaded)."""
+    job = st.session_state.pop('analyzer_profile_job', None)
+    if job is not None:
+        job.cancel()
 
 def render_file_analyzer_section():
     """
     Renders the UI for file upload and column data quality analysis.
     """
     st.markdown("<h2>📁 Data File Analyzer</h2>", unsafe_allow_html=True)
-    st.write("Upload a CSV or JSON file (up to 200MB) to analyze the data quality of a selected column. Get insights on nulls, duplicates, and unique values.")
+    st.write(f"Upload a CSV, JSON/NDJSON, Parquet or Arrow/Feather file (up to {ANALYZER_MAX_UPLOAD_MB:g}MB) to analyze the data quality of a selected column. Get insights on nulls, duplicates, and unique values.")
 
     uploaded_file = st.file_uploader(
-        "Choose a CSV or JSON file (Max 200MB)",
-        type=["csv", "json"],
+        f"Choose a CSV, JSON/NDJSON, Parquet or Arrow/Feather file (Max {ANALYZER_MAX_UPLOAD_MB:g}MB)",
+        type=list(SUPPORTED_FORMATS),
         accept_multiple_files=False,
         key="data_file_uploader"
     )
+    optimize_memory = st.checkbox(
+        "🗜️ Optimize memory on load",
+        value=ANALYZER_OPTIMIZE_DTYPES,
+        key="analyzer_optimize_dtypes",
+        help="Downcasts numbers, stores repeated strings as categoricals and other strings as Arrow strings, "
+             "and parses ISO dates. Reports still show each column's original type."
+    )
 
     # Session state for the DataFrame and analysis results
     if 'analyzer_df' not in st.session_state:
         st.session_state['analyzer_df'] = None
     if 'analyzer_column_report' not in st.session_state:
         st.session_state['analyzer_column_report'] = {}
+    if 'analyzer_streaming' not in st.session_state:
+        st.session_state['analyzer_streaming'] = False
+    if 'analyzer_loaded_key' not in st.session_state:
+        st.session_state['analyzer_loaded_key'] = None
+    if 'analyzer_dataset_profile' not in st.session_state:
+        st.session_state['analyzer_dataset_profile'] = None
+    if 'analyzer_profile_comparison' not in st.session_state:
+        st.session_state['analyzer_profile_comparison'] = None
 
     if uploaded_file is not None:
-        file_extension = uploaded_file.name.split(".")[-1].lower()
-        file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+        file_extension = source_format(uploaded_file)
+        # The upload's size is known without reading (or copying) its content
+        file_size_mb = source_size(uploaded_file) / (1024 * 1024)
 
-        if file_size_mb > 200:
-            st.error("❌ File size exceeds 200MB. Please upload a smaller file.")
+        if file_size_mb > ANALYZER_MAX_UPLOAD_MB:
+            st.error(f"❌ File size exceeds {ANALYZER_MAX_UPLOAD_MB:g}MB. Please upload a smaller file.")
             st.session_state['analyzer_df'] = None
             st.session_state['analyzer_column_report'] = {}
             return
 
         try:
-            # Read file content into memory. For pandas, pass the BytesIO object directly.
-            # Using BytesIO to handle both text-based (CSV) and binary (potential future) files more universally.
-            bytes_data = uploaded_file.getvalue()
-
-            if file_extension == "csv":
-                df = pd.read_csv(BytesIO(bytes_data))
-            elif file_extension == "json":
-                # For JSON, pandas read_json can take BytesIO directly
-                df = pd.read_json(BytesIO(bytes_data))
-            
+            # Large files are streamed in chunks for every report; only a preview is kept in memory.
+            # Column reports then read only the selected column (CSV parses just that column; Parquet and
+            # Arrow files never read the others).
+            streaming = file_extension in CHUNKED_FORMATS and file_size_mb > ANALYZER_STREAMING_THRESHOLD_MB
+            # Reruns (selectbox changes, button clicks) reuse the parsed DataFrame instead of re-parsing
+            parse_mode = "preview" if streaming else ("optimized" if optimize_memory else "full")
+            parse_key = (get_upload_hash(uploaded_file), file_extension, parse_mode)
+
+            def parse_upload() -> pd.DataFrame:
+                if streaming:
+                    return read_preview(uploaded_file, file_extension)
+                df = read_dataframe(uploaded_file, file_extension)
+                # Only the optimized frame is cached, so the savings apply to every session sharing it
+                return optimize_dtypes(df) if optimize_memory else df
+
+            df, cache_hit, parse_seconds = get_dataframe_cache().get_or_parse(parse_key, parse_upload)
+
             st.session_state['analyzer_df'] = df
-            st.success(f"Successfully loaded `{uploaded_file.name}` with {df.shape[0]} rows and {df.shape[1]} columns.")
+            st.session_state['analyzer_streaming'] = streaming
+            if streaming:
+                st.success(f"Opened `{uploaded_file.name}` ({file_size_mb:.1f}MB, {df.shape[1]} columns) in streaming mode. "
+                           "Column reports are computed chunk by chunk over the whole file.")
+            else:
+                st.success(f"Successfully loaded `{uploaded_file.name}` with {df.shape[0]} rows and {df.shape[1]} columns.")
+            cache_stats = get_dataframe_cache().stats()
+            st.caption(
+                f"{'⚡ Served from parse cache' if cache_hit else '🐢 Parsed'} (original parse took {parse_seconds:.2f}s) · "
+                f"parse cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                f"{cache_stats['memory_mb']:.1f} of {cache_stats['budget_mb']:.0f}MB used"
+            )
+            optimization = df.attrs.get(OPTIMIZATION_REPORT_ATTR)
+            if optimization:
+                st.caption(f"🗜️ Memory optimized: {optimization['memory_before_mb']:.1f}MB → "
+                           f"{optimization['memory_after_mb']:.1f}MB ({optimization['saved_pct']:.0f}% saved)")
+                if optimization["changes"]:
+                    with st.expander("🗜️ Dtype changes"):
+                        st.dataframe(pd.DataFrame(optimization["changes"]), use_container_width=True, hide_index=True)
             
             st.subheader("Dataset Preview:")
             st.dataframe(df.head(), use_container_width=True, hide_index=True)
             
-            # Reset analysis report when a new file is uploaded
-            st.session_state['analyzer_column_report'] = {}
+            # Reset analysis report when a new file is uploaded (but not on reruns for the same file)
+            if st.session_state['analyzer_loaded_key'] != parse_key:
+                cancel_profile_job()
+                st.session_state['analyzer_column_report'] = {}
+                st.session_state['analyzer_dataset_profile'] = None
+                st.session_state['analyzer_profile_comparison'] = None
+                st.session_state['analyzer_loaded_key'] = parse_key
 
         except UnicodeDecodeError:
             st.error("❌ Could not decode the file. Please ensure it's UTF-8 encoded.")
@@ -71,6 +159,14 @@ def render_file_analyzer_section():
             st.error(f"❌ An error occurred during file processing: {str(e)}")
             st.session_state['analyzer_df'] = None
             st.session_state['analyzer_column_report'] = {}
+    elif st.session_state['analyzer_streaming']:
+        # A streamed file is only held by the uploader, so its preview is dropped once the file is removed
+        st.session_state['analyzer_df'] = None
+        st.session_state['analyzer_column_report'] = {}
+        st.session_state['analyzer_dataset_profile'] = None
+        st.session_state['analyzer_profile_comparison'] = None
+        st.session_state['analyzer_streaming'] = False
+        cancel_profile_job()
 
     
     # Column selection and analysis
@@ -78,6 +174,48 @@ def render_file_analyzer_section():
     if current_df is not None and not current_df.empty:
         st.markdown("---")
         st.subheader("📈 Column Data Quality Report")
+
+        profile_mode = PROFILE_MODE_LABELS[st.radio(
+            "Profiling mode:",
+            options=list(PROFILE_MODE_LABELS),
+            horizontal=True,
+            key="analyzer_profile_mode",
+            help="Approximate mode estimates distinct counts (HyperLogLog) and top values (Space-Saving) in fixed memory, "
+                 "for huge or ID-like columns. Compare runs both and reports the sketches' error."
+        )]
+        streaming_source = uploaded_file if st.session_state['analyzer_streaming'] and uploaded_file is not None else None
+
+        def column_report_for(mode: str) -> dict:
+            if streaming_source is not None:
+                # Nulls, duplicates and unique values are folded chunk by chunk over the whole file
+                return compute_column_report_streaming(streaming_source, selected_column, mode=mode)
+            return compute_column_report(current_df[selected_column], mode=mode)
+
+        def dataset_profile_for(mode: str) -> list[dict]:
+            if streaming_source is not None:
+                return profile_file_streaming(streaming_source, mode=mode)
+            # Columns are profiled on the worker pool; each one is shown as soon as it finishes.
+            cancel_profile_job()
+            job = ProfileJob(current_df, mode=mode)
+            st.session_state['analyzer_profile_job'] = job
+            progress = st.progress(0.0, text=f"Profiling {len(job)} columns...")
+            live_table = st.empty()
+            finished = []
+
+            def show_result(position: int, profile: dict):
+                finished.append(profile)
+                progress.progress(len(finished) / len(job), text=f"Profiled {len(finished)} of {len(job)} columns")
+                live_table.dataframe(pd.DataFrame(finished)[["column", "dtype", "null_count", "distinct_count", "duplicate_count"]],
+                                     use_container_width=True, hide_index=True)
+
+            try:
+                return job.run(show_result)
+            finally:
+                # Reached on completion and when Streamlit stops this run for a new upload or interaction
+                job.cancel()
+                st.session_state.pop('analyzer_profile_job', None)
+                progress.empty()
+                live_table.empty()
         
         column_options = current_df.columns.tolist()
         selected_column = st.selectbox(
@@ -90,30 +228,14 @@ def render_file_analyzer_section():
         if selected_column:
             if st.button("📊 Generate Column Report", type="primary", use_container_width=True, key="generate_column_report_button"):
                 with st.spinner(f"Analyzing column '{selected_column}'..."):
-                    column_data = current_df[selected_column]
-                    total_rows = len(column_data)
-
-                    # Null values
-                    null_count = column_data.isnull().sum()
-                    null_percentage = (null_count / total_rows * 100) if total_rows > 0 else 0
-
-                    # Duplicates (considering only non-null values for duplicates)
-                    non_null_data = column_data.dropna()
-                    duplicate_count = non_null_data.duplicated().sum()
-                    duplicate_percentage = (duplicate_count / len(non_null_data) * 100) if len(non_null_data) > 0 else 0
-
-                    # Unique values
-                    unique_count = non_null_data.nunique()
-
-                    report_content = {
-                        "Column Name": selected_column,
-                        "Total Rows": total_rows,
-                        "Null Values": f"{null_count} ({null_percentage:.2f}%)",
-                        "Duplicate Values": f"{duplicate_count} ({duplicate_percentage:.2f}%)",
-                        "Unique Values": unique_count,
-                        "Data Type": str(column_data.dtype),
-                        "Top 10 Unique Values": non_null_data.value_counts().head(10).index.tolist() if unique_count > 0 else []
-                    }
+                    report_content = column_report_for("sketch" if profile_mode == "sketch" else "exact")
+                    if profile_mode == "compare":
+                        sketch_report = column_report_for("sketch")
+                        report_content["Sketch Estimate"] = (
+                            f"Unique Values {sketch_report['Unique Values']}, Duplicate Values {sketch_report['Duplicate Values']}"
+                        )
+                    # Reports show the type the column was loaded as, not its optimized storage type
+                    report_content["Data Type"] = original_dtype(current_df, selected_column, report_content["Data Type"])
                     st.session_state['analyzer_column_report'] = report_content
                     st.success(f"Report for '{selected_column}' generated! ✅")
         
@@ -135,6 +257,8 @@ def render_file_analyzer_section():
                 st.metric("Duplicate Values", report["Duplicate Values"])
             with col_r5:
                 st.metric("Data Type", report["Data Type"])
+            if "Sketch Estimate" in report:
+                st.caption(f"🧪 Sketch estimate: {report['Sketch Estimate']}")
 
             st.markdown("---")
             st.markdown("<h4>Top 10 Unique Values:</h4>", unsafe_allow_html=True)
@@ -164,6 +288,54 @@ def render_file_analyzer_section():
                 use_container_width=True,
                 key="download_column_report_md"
             )
+
+        # Whole-dataset profile: every column in one pass, each column factorized once
+        st.markdown("---")
+        st.subheader("🧮 Dataset Profile")
+        st.write("Profile every column at once: nulls, duplicates, distinct values, top values, min/max and numeric statistics.")
+        if st.button("🧮 Profile All Columns", use_container_width=True, key="profile_all_columns_button"):
+            with st.spinner(f"Profiling {current_df.shape[1]} columns..."):
+                started = time.perf_counter()
+                profiles = dataset_profile_for("sketch" if profile_mode == "sketch" else "exact")
+                elapsed = time.perf_counter() - started
+                comparison = None
+                if profile_mode == "compare":
+                    started = time.perf_counter()
+                    sketch_profiles = dataset_profile_for("sketch")
+                    sketch_elapsed = time.perf_counter() - started
+                    comparison = {
+                        "rows": [compare_profiles(exact, approximate) for exact, approximate in zip(profiles, sketch_profiles)],
+                        "exact_seconds": elapsed,
+                        "sketch_seconds": sketch_elapsed,
+                    }
+                for profile in profiles:
+                    profile["dtype"] = original_dtype(current_df, profile["column"], profile["dtype"])
+                st.session_state['analyzer_dataset_profile'] = profiles
+                st.session_state['analyzer_profile_comparison'] = comparison
+                st.success(f"Profiled {len(profiles)} columns in {elapsed:.2f}s ✅")
+
+        if st.session_state['analyzer_dataset_profile']:
+            profile_df = pd.DataFrame(st.session_state['analyzer_dataset_profile'])
+            profile_df["top_values"] = profile_df["top_values"].apply(lambda values: json.dumps(values, default=str))
+            # min/max hold numbers, strings or dates depending on the column; shown as text so the table renders
+            for bound in ("min", "max"):
+                profile_df[bound] = profile_df[bound].apply(lambda value: "" if value is None else str(value))
+            st.dataframe(profile_df, use_container_width=True, hide_index=True)
+            st.download_button(
+                label="⬇️ Download Dataset Profile (CSV)",
+                data=profile_df.to_csv(index=False).encode('utf-8'),
+                file_name="dataset_profile.csv",
+                mime="text/csv",
+                use_container_width=True,
+                key="download_dataset_profile_csv"
+            )
+
+        if st.session_state['analyzer_profile_comparison']:
+            comparison = st.session_state['analyzer_profile_comparison']
+            st.markdown("<h4>Sketches vs Exact:</h4>", unsafe_allow_html=True)
+            st.caption(f"Exact profile took {comparison['exact_seconds']:.2f}s, sketch profile {comparison['sketch_seconds']:.2f}s. "
+                       "Distinct error bound is the HyperLogLog standard error.")
+            st.dataframe(pd.DataFrame(comparison["rows"]), use_container_width=True, hide_index=True)
     else:
         st.info("Upload a file above to start analyzing columns.")
 
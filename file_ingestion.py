@@ -0,0 +1,306 @@
+# file_ingestion.py
+import codecs
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as pa_feather
+import pyarrow.parquet as pa_parquet
+
+from metrics import FILE_PARSE_LATENCY, track_latency
+
+# --- Ingestion Limits ---
+# Streamlit enforces its own upload limit (server.maxUploadSize in .streamlit/config.toml);
+# raise both together to analyze larger files.
+ANALYZER_MAX_UPLOAD_MB = float(os.getenv("ANALYZER_MAX_UPLOAD_MB", "200"))
+# Files above this size are never loaded whole: the analyzer keeps a preview and streams the
+# file in chunks for every column report.
+ANALYZER_STREAMING_THRESHOLD_MB = float(os.getenv("ANALYZER_STREAMING_THRESHOLD_MB", "50"))
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+DEFAULT_CHUNK_ROWS = 100_000
+PREVIEW_ROWS = 1_000
+# "pyarrow" parses whole CSV files with Arrow's multithreaded reader; "pandas" uses the C engine.
+ANALYZER_CSV_ENGINE = os.getenv("ANALYZER_CSV_ENGINE", "pyarrow")
+
+SUPPORTED_FORMATS = ("csv", "json", "jsonl", "ndjson", "parquet", "feather", "arrow")
+# Formats that can be read in bounded chunks (and so analyzed in streaming mode). JSON is chunked
+# when it is a top-level array of records; other JSON documents are still parsed whole.
+CHUNKED_FORMATS = ("csv", "json", "jsonl", "ndjson", "parquet", "feather", "arrow")
+ARROW_IPC_FORMATS = ("feather", "arrow")  # Feather v2 is the Arrow IPC file format
+JSON_FORMATS = ("json", "jsonl", "ndjson")
+JSON_LINES_FORMATS = ("jsonl", "ndjson")
+JSON_SNIFF_BYTES = 64 * 1024
+
+
+def source_name(source) -> str:
+    """Returns the file name of an upload or a local path."""
+    return source if isinstance(source, str) else getattr(source, "name", "uploaded file")
+
+
+def source_format(source) -> str:
+    """Returns the lowercased file extension of an upload or a local path."""
+    return source_name(source).rsplit(".", 1)[-1].lower()
+
+
+def source_size(source) -> int:
+    """Returns the size in bytes of an upload (Streamlit UploadedFile or file object) or a local path."""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    if getattr(source, "size", None) is not None:
+        return source.size
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+
+@contextmanager
+def open_source(source):
+    """
+    Yields a binary file object positioned at the start of the source.
+    Local paths are opened (and closed afterwards); uploads are rewound and left open.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+
+def iter_byte_chunks(source, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """Yields the raw content of the source in fixed-size byte chunks."""
+    with open_source(source) as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _unsupported_format(file_format: str) -> ValueError:
+    return ValueError(f"Unsupported file format '{file_format}'. Expected one of {SUPPORTED_FORMATS}.")
+
+
+# --- JSON Readers ---
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _json_layout(f) -> str:
+    """
+    Sniffs the start of a .json file: "array" for a top-level array of records, "lines" for
+    newline-delimited JSON saved as .json, and "document" for anything else.
+    """
+    head = f.read(JSON_SNIFF_BYTES).decode("utf-8-sig", errors="ignore").lstrip()
+    f.seek(0)
+    if head.startswith("["):
+        return "array"
+    first_line, newline, rest = head.partition("\n")
+    if newline and rest.strip():
+        try:
+            json.loads(first_line)
+            return "lines"
+        except json.JSONDecodeError:
+            pass  # e.g. a pretty-printed document whose first line is just "{"
+    return "document"
+
+
+def iter_json_array_records(f, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """
+    Yields the elements of a top-level JSON array one by one, decoding the file chunk by chunk,
+    so only the current chunk (and any element spanning it) is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, position, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_bytes)
+        eof = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        position = _JSON_WHITESPACE.match(buffer, position).end()
+        while position == len(buffer) and not eof:
+            fill()
+            position = _JSON_WHITESPACE.match(buffer, position).end()
+
+    skip_whitespace()
+    if position == len(buffer) or buffer[position] != "[":
+        raise json.JSONDecodeError("Expected a top-level JSON array", buffer, position)
+    position += 1
+    expect_value = True  # Elements and separators alternate: value, comma, value, ..., closing bracket
+    while True:
+        skip_whitespace()
+        if position == len(buffer):
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, position)
+        if buffer[position] == "]":
+            return
+        if not expect_value:
+            if buffer[position] != ",":
+                raise json.JSONDecodeError("Expected ',' or ']' between array elements", buffer, position)
+            position += 1
+            expect_value = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            complete = end < len(buffer) or eof  # A number at the end of the buffer may continue in the next chunk
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            fill()
+            continue
+        position = end
+        expect_value = False
+        yield value
+
+
+def iter_json_lines_records(f):
+    """Yields the records of a newline-delimited JSON (NDJSON / JSON Lines) file one line at a time."""
+    for line_number, line in enumerate(f):
+        if line_number == 0:
+            line = line.removeprefix(codecs.BOM_UTF8)
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _records_to_frame(records: list) -> pd.DataFrame:
+    """Flattens a batch of JSON records: nested objects become dotted columns (e.g. user.address.city)."""
+    records = [record if isinstance(record, dict) else {"value": record} for record in records]
+    return pd.json_normalize(records, sep=".")
+
+
+def iter_json_frames(f, file_format: str, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    """
+    Yields a JSON, NDJSON or JSON Lines file as flattened DataFrames of at most chunk_rows records.
+    Top-level arrays and line-delimited files are parsed incrementally; other JSON documents are
+    parsed whole with pd.read_json, as a single frame.
+    """
+    layout = "lines" if file_format in JSON_LINES_FORMATS else _json_layout(f)
+    if layout == "document":
+        yield pd.read_json(f)
+        return
+    records = iter_json_lines_records(f) if layout == "lines" else iter_json_array_records(f)
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk_rows:
+            yield _records_to_frame(batch)
+            batch = []
+    if batch:
+        yield _records_to_frame(batch)
+
+
+def _project(df: pd.DataFrame, columns: list[str] | None) -> pd.DataFrame:
+    # Batches of JSON records may lack a key entirely; it is then an all-null column.
+    return df.reindex(columns=columns) if columns else df
+
+
+# --- Arrow Readers ---
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table to pandas, zero-copy for columns whose dtypes allow it (numeric columns
+    without nulls): split_blocks keeps each column in its own block instead of consolidating them
+    into new 2D arrays. Dates become datetime64 rather than objects.
+    """
+    return table.to_pandas(split_blocks=True, date_as_object=False)
+
+
+def _arrow_input(source, f):
+    """An Arrow-readable view of the source: memory-mapped for local paths, the upload's buffer otherwise."""
+    if isinstance(source, str):
+        return pa.memory_map(source, "r")
+    if hasattr(f, "getbuffer"):  # BytesIO / Streamlit UploadedFile: wrap the bytes without copying them
+        return pa.BufferReader(pa.py_buffer(f.getbuffer()))
+    return f
+
+
+def _read_csv_arrow(f, columns: list[str] | None = None) -> pa.Table:
+    """
+    Parses a whole CSV with Arrow's multithreaded reader, converting only the requested columns.
+    Empty and NA-like strings are nulls, as with pandas; unlike pandas, ISO dates and timestamps
+    are typed rather than left as strings.
+    """
+    return pa_csv.read_csv(
+        f,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(include_columns=columns, strings_can_be_null=True),
+    )
+
+
+def _iter_table_chunks(table: pa.Table, chunk_rows: int):
+    for batch in table.to_batches(max_chunksize=chunk_rows):
+        yield batch.to_pandas(date_as_object=False)
+
+
+def iter_dataframe_chunks(source, file_format: str | None = None, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                          columns: list[str] | None = None):
+    """
+    Yields the source as DataFrames of at most chunk_rows rows, so memory stays bounded by
+    the chunk size rather than the file size. columns restricts which columns are read: CSV
+    skips converting the others, Parquet and Arrow files never read them at all.
+    JSON arrays and NDJSON are parsed incrementally; other JSON documents are yielded as a single chunk.
+    """
+    file_format = file_format or source_format(source)
+    with open_source(source) as f:
+        if file_format == "csv":
+            yield from pd.read_csv(f, chunksize=chunk_rows, usecols=columns)
+        elif file_format in JSON_FORMATS:
+            for df in iter_json_frames(f, file_format, chunk_rows):
+                yield _project(df, columns)
+        elif file_format == "parquet":
+            # Row groups are decoded batch by batch, so only one batch is ever held in memory.
+            parquet_file = pa_parquet.ParquetFile(f)
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas(date_as_object=False)
+        elif file_format in ARROW_IPC_FORMATS:
+            # The table is a zero-copy view of the mapped file or upload buffer; only chunks are converted.
+            yield from _iter_table_chunks(pa_feather.read_table(_arrow_input(source, f), columns=columns), chunk_rows)
+        else:
+            raise _unsupported_format(file_format)
+
+
+def read_dataframe(source, file_format: str | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Parses the whole source into one DataFrame, reading the upload directly without copying its
+    bytes. columns restricts which columns are read (column projection).
+    """
+    file_format = file_format or source_format(source)
+    with track_latency(FILE_PARSE_LATENCY, "file_parse", format=file_format, mode="full"):
+        with open_source(source) as f:
+            if file_format == "csv":
+                if ANALYZER_CSV_ENGINE == "pyarrow":
+                    try:
+                        return _arrow_to_pandas(_read_csv_arrow(f, columns))
+                    except pa.ArrowInvalid as e:
+                        # Arrow is stricter than pandas (e.g. about quoting); fall back rather than fail.
+                        print(f"Arrow CSV reader failed, retrying with the pandas engine: {e}")
+                        f.seek(0)
+                return pd.read_csv(f, usecols=columns)
+            if file_format in JSON_FORMATS:
+                frames = [_project(df, columns) for df in iter_json_frames(f, file_format)]
+                if not frames:
+                    return pd.DataFrame(columns=columns)  # An empty array or an empty NDJSON file
+                return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            if file_format == "parquet":
+                return _arrow_to_pandas(pa_parquet.read_table(f, columns=columns))
+            if file_format in ARROW_IPC_FORMATS:
+                return _arrow_to_pandas(pa_feather.read_table(_arrow_input(source, f), columns=columns))
+        raise _unsupported_format(file_format)
+
+
+def read_preview(source, file_format: str | None = None, rows: int = PREVIEW_ROWS) -> pd.DataFrame:
+    """Returns the first rows of the source (its columns and a sample) without parsing the rest."""
+    file_format = file_format or source_format(source)
+    with track_latency(FILE_PARSE_LATENCY, "file_parse", format=file_format, mode="preview"):
+        return next(iter_dataframe_chunks(source, file_format, chunk_rows=rows)).head(rows)
@@ -0,0 +1,181 @@
+# gemini_client.py
+import asyncio
+import os
+import random
+import threading
+import time
+
+from metrics import GENERATION_LATENCY, GENERATION_RETRIES, track_latency
+
+# --- Rate Limit & Retry Settings ---
+# Conservative defaults; raise them to match the quota of your API key.
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+RETRY_BASE_DELAY_S = 1.0
+RETRY_MAX_DELAY_S = 32.0
+CHARS_PER_TOKEN = 4  # Rough estimate used to charge the token bucket without a count_tokens round trip
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket: holds up to 'capacity' tokens and refills at rate_per_minute.
+    acquire() waits until enough tokens are available; waiters are served in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        if rate_per_minute <= 0:
+            raise ValueError("Token bucket rate must be positive.")
+        self.rate_per_s = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)  # A request larger than the bucket waits for a full bucket
+        async with self._lock:
+            self._refill()
+            if self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self.rate_per_s)
+                self._refill()
+            self._tokens -= amount
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Returns True for rate-limit, overload and transient network errors that are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        api_exceptions.ResourceExhausted,     # 429: quota or rate limit
+        api_exceptions.TooManyRequests,
+        api_exceptions.ServiceUnavailable,    # 503: model overloaded
+        api_exceptions.InternalServerError,   # 500
+        api_exceptions.DeadlineExceeded,      # 504
+    ))
+
+
+class EmbeddingInputError(ValueError):
+    """Raised by embedding transports when they reject an input text itself (not the request or the response)."""
+
+
+def is_input_error(error: Exception) -> bool:
+    """
+    Returns True if the provider rejected the request's input (EmbeddingInputError, or an HTTP 400 /
+    invalid argument from the API), which resending it unchanged cannot fix.
+    """
+    if isinstance(error, EmbeddingInputError):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (api_exceptions.InvalidArgument, api_exceptions.BadRequest))
+
+
+def backoff_delay(attempt: int, base_delay_s: float = RETRY_BASE_DELAY_S, max_delay_s: float = RETRY_MAX_DELAY_S) -> float:
+    """Exponential backoff with full jitter: a random delay of up to base_delay_s * 2**attempt, capped."""
+    return random.uniform(0, min(max_delay_s, base_delay_s * (2 ** attempt)))
+
+
+class AsyncGeminiClient:
+    """
+    Async layer under the Gemini generative calls. All requests share one token-bucket limiter
+    (requests/min and tokens/min), retryable errors are retried with exponential backoff and full
+    jitter, and identical prompts that are already in flight are coalesced into a single API call.
+    model_provider is a callable returning a Gemini GenerativeModel (e.g. get_generative_model).
+    """
+
+    def __init__(self, model_provider, requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = GEMINI_TOKENS_PER_MINUTE, max_retries: int = GEMINI_MAX_RETRIES,
+                 base_delay_s: float = RETRY_BASE_DELAY_S, max_delay_s: float = RETRY_MAX_DELAY_S):
+        self.model_provider = model_provider
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._in_flight = {}  # coalescing key -> asyncio.Task
+
+        self.requests = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.base_delay_s, self.max_delay_s)
+
+    async def _generate_with_retry(self, prompt: str, generation_config):
+        model = self.model_provider()
+        kind = "text" if generation_config is None else "structured"
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(len(prompt) / CHARS_PER_TOKEN)
+            self.requests += 1
+            try:
+                with track_latency(GENERATION_LATENCY, "generation", kind=kind):
+                    if generation_config is None:
+                        return await model.generate_content_async(prompt)
+                    return await model.generate_content_async(prompt, generation_config=generation_config)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                self.retries += 1
+                GENERATION_RETRIES.inc(error_type=type(e).__name__)
+                delay = self._backoff_delay(attempt)
+                print(f"Retryable Gemini error ({type(e).__name__}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def generate(self, prompt: str, generation_config=None, coalesce_key=None):
+        """
+        Generates content for prompt. Concurrent calls with the same prompt and coalesce_key
+        (a hashable description of generation_config) share one API request and its outcome.
+        """
+        key = (prompt, coalesce_key)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._generate_with_retry(prompt, generation_config))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield() keeps one caller's cancellation from cancelling the shared request.
+        return await asyncio.shield(task)
+
+    # --- Sync Wrappers ---
+    def generate_sync(self, prompt: str, generation_config=None, coalesce_key=None):
+        """Blocking wrapper around generate(), safe to call from any thread (e.g. Streamlit sessions)."""
+        return run_coroutine_sync(self.generate(prompt, generation_config, coalesce_key))
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "retries": self.retries, "coalesced": self.coalesced}
+
+
+# --- Background Event Loop ---
+# One loop per process runs every Gemini request, so the limiter and the in-flight table are
+# shared by all threads that call the sync wrappers.
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-client-loop", daemon=True).start()
+    return _loop
+
+
+def run_coroutine_sync(coroutine):
+    """Runs a coroutine on the shared background loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_loop()).result()
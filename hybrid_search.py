@@ -0,0 +1,282 @@
+# hybrid_search.py
+import math
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+
+import numpy as np
+
+from attribute_index import AttributeIndex
+from metrics import INDEX_SEARCH_LATENCY, track_latency
+from tokenization import identifiers, split_words
+
+# --- BM25 Parameters ---
+BM25_K1 = 1.2   # Term frequency saturation
+BM25_B = 0.75   # Document length normalization
+RRF_K = 60      # Reciprocal rank fusion damping constant (the value from the original RRF paper)
+DEFAULT_CANDIDATES = 50  # Candidates taken from each retriever before fusion
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Tokenizes metadata or query text for lexical search: snake_case/camelCase words plus each
+    compound identifier as a whole, so an exact 'user_email' outranks entries that merely
+    mention 'user' and 'email' separately.
+    """
+    return split_words(text) + identifiers(text)
+
+
+def entry_tokens(entry: dict) -> list[str]:
+    """Returns the lexical tokens of a metadata entry: table name, column names and description."""
+    tokens = tokenize(entry["table"])
+    for column in entry.get("columns", []):
+        tokens += tokenize(column)
+    tokens += tokenize(entry.get("description", ""))
+    return tokens
+
+
+def looks_like_identifier(query: str) -> bool:
+    """
+    Returns True if every word of the query is a compound identifier (e.g. 'user_email' or
+    'registrationTimestamp, created_at'). Such queries are answered lexically, without an embedding call.
+    """
+    words = query.replace(",", " ").split()
+    return bool(words) and all(identifiers(word) == [word.lower()] for word in words)
+
+
+def bm25_idf(n_docs: int, doc_freq: int) -> float:
+    """BM25 inverse document frequency of a term found in doc_freq of n_docs entries (always positive)."""
+    return math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+class _SavedTerms(Mapping):
+    """
+    Read-only term -> value mapping over a saved, sorted term table (see BM25Index.to_arrays()):
+    a binary search over the UTF-8 encoded terms, with value_fn(row) giving the value of a row.
+    """
+
+    def __init__(self, terms: np.ndarray, value_fn):
+        self._terms = terms
+        self._value_fn = value_fn
+
+    def __getitem__(self, term: str):
+        encoded = term.encode("utf-8")
+        keys = self._terms["term"]
+        row = int(np.searchsorted(keys, encoded))
+        if row == len(keys) or keys[row] != encoded:
+            raise KeyError(term)
+        return self._value_fn(row)
+
+    def __iter__(self):
+        return (term.decode("utf-8") for term in self._terms["term"].tolist())
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+class BM25Index:
+    """
+    An in-process BM25 inverted index over metadata entries.
+    Postings are stored as NumPy arrays of (document, precomputed BM25 weight), so scoring a query
+    is one vectorized accumulation per query term. Attribute bitmaps over the same documents
+    restrict a search to filtered entries. to_arrays()/from_arrays() save it as flat arrays that
+    can be memory-mapped, so it does not have to be rebuilt from the entries in every process.
+    """
+
+    def __init__(self, entries: list[dict], k1: float = BM25_K1, b: float = BM25_B):
+        self._entries = list(entries)
+        self._postings = {}  # term -> (doc positions int32, weights float32)
+        self._idf = {}       # term -> IDF folded into its weights
+        self._attributes = AttributeIndex()
+        self._attributes.update(added=enumerate(self._entries), size=len(self._entries))
+
+        doc_lengths = np.zeros(len(self._entries), dtype="float32")
+        term_docs = defaultdict(list)
+        for position, entry in enumerate(self._entries):
+            counts = Counter(entry_tokens(entry))
+            doc_lengths[position] = sum(counts.values())
+            for term, tf in counts.items():
+                term_docs[term].append((position, tf))
+
+        average_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        n_docs = len(self._entries)
+        for term, postings in term_docs.items():
+            docs = np.fromiter((p for p, _ in postings), dtype="int32", count=len(postings))
+            tfs = np.fromiter((tf for _, tf in postings), dtype="float32", count=len(postings))
+            idf = self._idf[term] = bm25_idf(n_docs, len(postings))
+            norm = k1 * (1 - b + b * doc_lengths[docs] / (average_length or 1.0))
+            self._postings[term] = (docs, (idf * tfs * (k1 + 1) / (tfs + norm)).astype("float32"))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Persistence ---
+    def to_arrays(self) -> tuple[dict[str, np.ndarray], dict]:
+        """
+        Returns the index as flat arrays: a term table sorted by UTF-8 term (with each term's
+        postings range and IDF), all postings' documents and weights back to back, and the
+        attribute bitmaps, plus the directory from_arrays() needs.
+        """
+        terms = sorted(self._postings, key=lambda term: term.encode("utf-8"))
+        term_width = max((len(term.encode("utf-8")) for term in terms), default=1)
+        table = np.zeros(len(terms), dtype=[("term", f"S{term_width}"), ("start", "<i8"), ("end", "<i8"),
+                                           ("idf", "<f8")])
+        offset = 0
+        for row, term in enumerate(terms):
+            length = len(self._postings[term][0])
+            table[row] = (term.encode("utf-8"), offset, offset + length, self._idf[term])
+            offset += length
+        docs = np.concatenate([self._postings[term][0] for term in terms]) if terms else np.zeros(0, dtype="int32")
+        weights = np.concatenate([self._postings[term][1] for term in terms]) if terms else np.zeros(0, dtype="float32")
+        attribute_blob, attribute_directory = self._attributes.to_arrays()
+        arrays = {"terms": table, "docs": docs, "weights": weights, "attributes": attribute_blob}
+        return arrays, {"documents": len(self._entries), "attributes": attribute_directory}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray], directory: dict, entries) -> "BM25Index":
+        """
+        Rebuilds an index from to_arrays() output without copying the (possibly memory-mapped)
+        arrays. entries is a sequence of the indexed entries in document order.
+        """
+        if len(entries) != directory["documents"]:
+            raise ValueError(f"Expected {directory['documents']} entries, got {len(entries)}.")
+        index = cls.__new__(cls)
+        index._entries = entries
+        terms, docs, weights = arrays["terms"], arrays["docs"], arrays["weights"]
+
+        def postings(row):
+            start, end = int(terms["start"][row]), int(terms["end"][row])
+            return docs[start:end], weights[start:end]
+
+        index._postings = _SavedTerms(terms, postings)
+        index._idf = _SavedTerms(terms, lambda row: float(terms["idf"][row]))
+        index._attributes = AttributeIndex.from_arrays(arrays["attributes"], directory["attributes"])
+        return index
+
+    def doc_freqs(self, terms) -> dict[str, int]:
+        """Number of entries containing each term, for combining term statistics across shards."""
+        return {term: len(self._postings[term][0]) for term in terms if term in self._postings}
+
+    def search(self, query: str, k: int = 5, filters: dict | None = None,
+               corpus_stats: tuple[int, dict] | None = None) -> list[dict]:
+        """
+        Returns the top-k entries by BM25 score, best first, each with a 'score'.
+        filters (field -> allowed value or values, see FILTER_FIELDS) restricts the matches.
+        corpus_stats (entry count, term -> doc frequency) replaces this index's own IDF with that of
+        a larger corpus, so the scores of indexes over parts of a catalog (shards) are comparable.
+        """
+        with track_latency(INDEX_SEARCH_LATENCY, "index_search", index_type="bm25"):
+            terms = [term for term in set(tokenize(query)) if term in self._postings]
+            if not terms or k <= 0:
+                return []
+            scores = np.zeros(len(self._entries), dtype="float32")
+            for term in terms:
+                docs, weights = self._postings[term]
+                if corpus_stats is not None:
+                    n_docs, doc_freqs = corpus_stats
+                    weights = weights * np.float32(bm25_idf(n_docs, doc_freqs[term]) / self._idf[term])
+                scores[docs] += weights  # Each document appears once per term, so plain fancy indexing is safe
+            if filters:
+                scores[~self._attributes.select(filters, len(self._entries))] = 0.0
+
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        results = []
+        for position in matched.tolist():
+            result = dict(self._entries[position])
+            result["score"] = float(scores[position])
+            results.append(result)
+        return results
+
+
+def reciprocal_rank_fusion(result_lists: list[list[dict]], k: int = 5, rrf_k: int = RRF_K) -> list[dict]:
+    """
+    Fuses several ranked result lists with reciprocal rank fusion: each entry scores
+    sum(1 / (rrf_k + rank)) over the lists it appears in. Results are matched by entry 'id'
+    (falling back to the table name) and the fused 'score' replaces the per-retriever scores.
+    """
+    fused_scores = defaultdict(float)
+    entries = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result.get("id") or result["table"]
+            fused_scores[key] += 1.0 / (rrf_k + rank)
+            entries.setdefault(key, result)
+
+    ranked = sorted(fused_scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    fused = []
+    for key, score in ranked:
+        result = dict(entries[key])
+        result["score"] = score
+        fused.append(result)
+    return fused
+
+
+def _fuse(lexical: list[dict], vector: list[dict], k: int) -> list[dict]:
+    fused = reciprocal_rank_fusion([lexical, vector], k=k)
+    for result in fused:
+        result["match"] = "hybrid"
+    return fused
+
+
+def hybrid_search(query: str, metadata_index, lexical_index: BM25Index, embed_fn, k: int = 5,
+                  candidates: int = DEFAULT_CANDIDATES, filters: dict | None = None) -> list[dict]:
+    """
+    Searches metadata with BM25 and vector similarity and fuses both rankings with RRF.
+    Identifier-like queries (e.g. 'user_email') that have lexical hits are answered from BM25 alone,
+    skipping the embedding call. Each result carries a 'match' field: 'lexical' or 'hybrid'.
+    filters (attribute field -> allowed values) is applied inside both retrievers.
+    """
+    if looks_like_identifier(query):
+        lexical = lexical_index.search(query, k, filters)
+        if lexical:
+            for result in lexical:
+                result["match"] = "lexical"
+            return lexical
+
+    lexical = lexical_index.search(query, candidates, filters)
+    vector = metadata_index.search(embed_fn(query), candidates, filters)
+    return _fuse(lexical, vector, k)
+
+
+def hybrid_search_many(queries: list[str], metadata_index, lexical_index: BM25Index, embed_many_fn, k: int = 5,
+                       candidates: int = DEFAULT_CANDIDATES, filters: dict | None = None) -> list[list[dict]]:
+    """
+    Batch form of hybrid_search(), returning one result list per query in input order.
+    Queries that need a vector search are embedded with a single embed_many_fn(queries) call and
+    searched together with MetadataIndex.search_batch() instead of one index search per query.
+    embed_many_fn returns one vector per query, or None if its embedding failed; such queries fall
+    back to their BM25 results (match 'lexical').
+    """
+    all_results = [[] for _ in queries]
+    semantic = []  # Positions of queries that need a vector search
+    for position, query in enumerate(queries):
+        if not query.strip():
+            continue
+        if looks_like_identifier(query):
+            lexical = lexical_index.search(query, k, filters)
+            if lexical:
+                for result in lexical:
+                    result["match"] = "lexical"
+                all_results[position] = lexical
+                continue
+        semantic.append(position)
+    if not semantic:
+        return all_results
+
+    vectors = embed_many_fn([queries[position] for position in semantic])
+    embedded = [(position, vector) for position, vector in zip(semantic, vectors) if vector]
+    vector_results = metadata_index.search_batch([vector for _, vector in embedded], candidates, filters=filters)
+    vector_by_position = {position: results for (position, _), results in zip(embedded, vector_results)}
+    for position in semantic:
+        lexical = lexical_index.search(queries[position], candidates, filters)
+        vector = vector_by_position.get(position)
+        if vector is None:
+            all_results[position] = lexical[:k]
+            for result in all_results[position]:
+                result["match"] = "lexical"
+        else:
+            all_results[position] = _fuse(lexical, vector, k)
+    return all_results
@@ -1,14 +1,25 @@
 # main.py
 import streamlit as st
+import io
+import pandas as pd
 import os
+import time
 from dotenv import load_dotenv, find_dotenv
 
 # Import styling function
 from styling import apply_custom_css
 # Import the new feature module
 from file_analyzer_features import render_file_analyzer_section
-# Import AI embedding logic (for semantic search, though currently placeholder)
-from ai_embedding_logic import get_embedding # This import is to ensure the AI logic module is loaded and configured
+# Import AI embedding logic and the headless search engine (FAISS + BM25) used by semantic search
+from ai_embedding_logic import get_embedding_backend, is_api_key_configured
+from search_cache import QueryCache
+from search_engine import METADATA_INDEX_PATH, SAMPLE_METADATA, SEARCH_TOP_K, SemanticSearchEngine
+from attribute_index import FILTER_FIELDS, FILTER_LABELS
+from sharded_index import ShardedIndex, saved_shards
+from bulk_search import BULK_SEARCH_BLOCK_SIZE, QUERY_FILE_FORMATS, iter_bulk_search, read_queries, write_bulk_results
+# Hot-path metrics: Prometheus exporters and the optional performance panel
+from metrics import start_metrics_exporters
+from performance_panel import PERFORMANCE_PANEL, render_performance_panel
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -27,9 +38,8 @@ if dotenv_path:
     load_dotenv(dotenv_path)
 
 # --- API Key Check ---
-# Ensure get_embedding_model() and get_generative_model() from ai_embedding_logic are called
-# and the API key is validated there. This check here is a redundancy for quick user feedback.
-api_key_set = os.getenv("GEMINI_API_KEY") is not None and os.getenv("GEMINI_API_KEY") != "YOUR_ACTUAL_GEMINI_API_KEY_HERE"
+# Gemini models are initialized lazily on first use, so this only checks the key for quick user feedback.
+api_key_set = is_api_key_configured()
 
 if not api_key_set:
     st.warning("🚨 **Google Gemini API Key** not found or is the placeholder! "
@@ -39,6 +49,56 @@ if not api_key_set:
     # st.stop() # Removed st.stop() to allow app to load, just show warning
 
 
+# --- Metrics Exporters ---
+# Started once per process, if METRICS_PORT or METRICS_TEXTFILE_PATH is set.
+start_metrics_exporters()
+
+
+# --- Metadata Index ---
+# Index location, type and the bootstrap catalog are configured in search_engine.py.
+# The embedding backend is selected with EMBEDDING_BACKEND ("gemini" or "local").
+embedding_backend = get_embedding_backend()
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """Query embedding and search result cache shared by all sessions of this process."""
+    return QueryCache()
+
+@st.cache_resource
+def _loaded_search_engines() -> dict:
+    """Process-wide slot holding the search engine once get_search_engine() has created it."""
+    return {}
+
+@st.cache_resource(show_spinner="Loading metadata index...")
+def get_search_engine() -> SemanticSearchEngine:
+    """
+    Loads the search engine once per process; it reloads the index itself when the saved copy changes.
+    If no index has been saved yet, builds one from the sample catalog and saves it.
+    Only user actions (searches) call this, because loading can call the embedding provider.
+    """
+    search_engine = SemanticSearchEngine.from_path(
+        METADATA_INDEX_PATH,
+        backend=embedding_backend,
+        query_cache=get_query_cache(),
+        bootstrap_catalog=SAMPLE_METADATA
+    )
+    _loaded_search_engines()["engine"] = search_engine
+    return search_engine
+
+def loaded_search_engine() -> SemanticSearchEngine | None:
+    """The search engine if a search has already loaded it, else None; never loads it."""
+    return _loaded_search_engines().get("engine")
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_filter_options(_search_engine: SemanticSearchEngine, index_version: str) -> dict[str, dict[str, int]]:
+    """
+    Filter values with their entry counts, computed once per index version rather than on every rerun.
+    The version changes on every sync, reload and shard load or unload, so the options never go stale.
+    (The leading underscore keeps Streamlit from hashing the engine.)
+    """
+    return _search_engine.filter_options()
+
+
 # --- Session State Initialization ---
 if 'user_query' not in st.session_state:
     st.session_state['user_query'] = ""
@@ -46,6 +106,8 @@ if 'search_results' not in st.session_state:
     st.session_state['search_results'] = []
 if 'metadata_loaded' not in st.session_state:
     st.session_state['metadata_loaded'] = False
+if 'bulk_search_output' not in st.session_state:
+    st.session_state['bulk_search_output'] = None
 
 
 # --- Hero Section ---
@@ -75,39 +137,185 @@ with tab_data_discovery:
     )
     st.session_state['user_query'] = user_query_input
 
+    # --- Search Filters ---
+    # Options come from the index's attribute bitmaps; filters restrict the search itself, not just the displayed hits.
+    search_filters = {}
+    with st.expander("🎯 Filter by database, schema, owner or data type"):
+        # Tabs and collapsed expanders still run, so this must not load the index (or reach the
+        # embedding provider) on its own: options appear once a search has loaded it.
+        filter_options = {}
+        search_engine = loaded_search_engine()
+        if search_engine is None:
+            st.caption("Filter options appear after the first search has loaded the metadata index.")
+        else:
+            filter_options = get_filter_options(search_engine, search_engine.index.version)
+        for filter_column, field in zip(st.columns(len(FILTER_FIELDS)), FILTER_FIELDS):
+            value_counts = filter_options.get(field, {})
+            selected_values = filter_column.multiselect(
+                FILTER_LABELS[field],
+                options=list(value_counts),
+                # Databases of unloaded shards are listed too; selecting one loads its shard
+                format_func=lambda value, counts=value_counts: (
+                    f"{value} ({counts[value]})" if counts.get(value) else f"{value} (not loaded)"
+                ),
+                disabled=not value_counts,
+                key=f"search_filter_{field}"
+            )
+            if selected_values:
+                search_filters[field] = selected_values
+        st.caption("A table matches if it has any of the selected values of every filter. Filters also apply to bulk search.")
+
     if st.button("✨ Semantic Search", type="primary", use_container_width=True, key="perform_search_button"):
-        if not api_key_set:
+        if embedding_backend.requires_api_key and not api_key_set:
             st.error("Cannot perform search: Google Gemini API Key is not configured.")
         elif not user_query_input.strip():
             st.warning("Please enter a query to perform semantic search.")
             st.session_state['search_results'] = []
         else:
-            # Placeholder for actual semantic search logic.
-            # This will eventually use get_embedding from ai_embedding_logic.py
-            # For now, it still uses mock data.
-            st.info("Semantic search functionality will be implemented here, integrating AI embeddings and a vector store.")
-            st.session_state['search_results'] = [
-                {"table": "customer_profile", "columns": ["email", "created_at"], "description": "Stores registered users and their signup metadata"},
-                {"table": "user_accounts", "columns": ["user_email", "registration_timestamp"], "description": "Details of user login and account creation"}
-            ] # Mock results for now
-            
-            st.success("Search initiated (using mock data for now). See results below!")
-
-    # --- Display Search Results (Placeholder) ---
+            try:
+                with st.spinner("Searching metadata..."):
+                    search_engine = get_search_engine()
+                    search_engine.reload_if_changed()  # Pick up a metadata sync that rewrote the saved index
+                    st.session_state['search_results'] = search_engine.search(
+                        user_query_input, SEARCH_TOP_K, search_filters or None
+                    )
+                if st.session_state['search_results']:
+                    st.success(f"Found {len(st.session_state['search_results'])} relevant tables. See results below!")
+                else:
+                    st.info("No matching tables found in the metadata index"
+                            f"{' for the selected filters' if search_filters else ''}.")
+            except Exception as e:
+                st.error(f"❌ Semantic search failed: {e}")
+                st.session_state['search_results'] = []
+
+    # --- Display Search Results ---
     if st.session_state['search_results']:
         st.markdown("---")
         st.markdown("<h2>Search Results</h2>", unsafe_allow_html=True)
         for result in st.session_state['search_results']:
+            location = " · ".join(str(result[field]) for field in ("source", "schema") if result.get(field))
+            if result.get('owner'):
+                location += f" (owner: {result['owner']})"
+            location_html = f"<p><i class=\"fas fa-database\"></i> <strong>Location:</strong> {location}</p>" if location else ""
             st.markdown(f"""
             <div style="background-color: var(--bg-primary); padding: 15px; border-radius: var(--border-radius-md); margin-bottom: 10px; border: 1px solid var(--border-color); box-shadow: 0 2px 8px rgba(0,0,0,0.2);">
                 <h3><i class="fas fa-table"></i> Table: <span style="color: var(--accent-green);">{result['table']}</span></h3>
                 <p><i class="fas fa-columns"></i> <strong>Columns:</strong> {', '.join([f'<code>{col}</code>' for col in result['columns']])}</p>
-                <p><i class="fas fa-info-circle"></i> <strong>Description:</strong> {result['description']}</p>
+                {location_html}<p><i class="fas fa-info-circle"></i> <strong>Description:</strong> {result['description']}</p>
+                <p><i class="fas fa-chart-line"></i> <strong>Relevance:</strong> {result.get('score', 0.0):.3f} ({result.get('match', 'vector')} match)</p>
             </div>
             """, unsafe_allow_html=True)
         st.markdown("---")
 
+    # --- Bulk Search ---
+    st.subheader("📚 Bulk Search")
+    st.write("Map a whole list of terms (e.g. a business glossary) to catalog tables at once. Upload a .txt file "
+             "with one query per line, or a CSV/Parquet file with a 'query' or 'term' column.")
+    bulk_queries_file = st.file_uploader(
+        "Choose a query file",
+        type=list(QUERY_FILE_FORMATS),
+        accept_multiple_files=False,
+        key="bulk_queries_uploader"
+    )
+    bulk_output_format = st.radio("Results format", ["CSV", "Parquet"], horizontal=True, key="bulk_output_format")
+
+    if st.button("📚 Run Bulk Search", use_container_width=True, key="bulk_search_button", disabled=bulk_queries_file is None):
+        if embedding_backend.requires_api_key and not api_key_set:
+            st.error("Cannot perform search: Google Gemini API Key is not configured.")
+        else:
+            try:
+                queries = read_queries(bulk_queries_file)
+                if not queries:
+                    st.warning("The query file does not contain any queries.")
+                else:
+                    search_engine = get_search_engine()
+                    search_engine.reload_if_changed()
+                    output_format = bulk_output_format.lower()
+                    progress = st.progress(0.0, text=f"Searching {len(queries)} queries...")
+                    preview = []
+
+                    def report_progress(row_blocks):
+                        """Passes result blocks through to the writer, keeping a preview and updating the progress bar."""
+                        for block_number, rows in enumerate(row_blocks, start=1):
+                            if len(preview) < 100:
+                                preview.extend(rows[:100 - len(preview)])
+                            done = min(len(queries), block_number * BULK_SEARCH_BLOCK_SIZE)
+                            progress.progress(done / len(queries), text=f"Searched {done} of {len(queries)} queries...")
+                            yield rows
+
+                    # Results are written to the download as each block of queries is answered.
+                    output = io.BytesIO()
+                    started = time.perf_counter()
+                    rows_written = write_bulk_results(
+                        report_progress(iter_bulk_search(search_engine, queries, SEARCH_TOP_K, search_filters or None)),
+                        output, output_format
+                    )
+                    elapsed = time.perf_counter() - started
+                    progress.empty()
+                    st.session_state['bulk_search_output'] = {
+                        "data": output.getvalue(),
+                        "format": output_format,
+                        "queries": len(queries),
+                        "rows": rows_written,
+                        "seconds": elapsed,
+                        "preview": preview,
+                    }
+            except Exception as e:
+                st.error(f"❌ Bulk search failed: {e}")
+                st.session_state['bulk_search_output'] = None
+
+    bulk_output = st.session_state['bulk_search_output']
+    if bulk_output:
+        st.success(f"Searched {bulk_output['queries']} queries in {bulk_output['seconds']:.2f}s "
+                   f"({bulk_output['queries'] / max(bulk_output['seconds'], 1e-9):.0f} queries/s) ✅")
+        st.dataframe(bulk_output['preview'], use_container_width=True, hide_index=True)
+        st.caption(f"Showing the first {len(bulk_output['preview'])} of {bulk_output['rows']} result rows.")
+        st.download_button(
+            label=f"⬇️ Download Bulk Results ({bulk_output['format'].upper()})",
+            data=bulk_output['data'],
+            file_name=f"bulk_search_results.{bulk_output['format']}",
+            mime="text/csv" if bulk_output['format'] == "csv" else "application/vnd.apache.parquet",
+            use_container_width=True,
+            key="download_bulk_results"
+        )
+    st.markdown("---")
+
+    with st.expander("⚡ Search cache statistics"):
+        st.json(get_query_cache().stats())
+
+    # --- Index Shards ---
+    # Only shown for a sharded index (one shard per database), detected on disk so that rendering never loads
+    # the index; only the load button does. Shards are loaded for the whole process, not per session.
+    if ShardedIndex.exists(METADATA_INDEX_PATH):
+        with st.expander("🗂️ Index shards"):
+            search_engine = loaded_search_engine()
+            sharded_index = search_engine.index if search_engine is not None else None
+            if isinstance(sharded_index, ShardedIndex):
+                st.dataframe(pd.DataFrame(sharded_index.shard_stats()), use_container_width=True, hide_index=True)
+                loaded_shards = sharded_index.loaded_shards()
+            else:
+                st.caption("Shard statistics appear after the first search has loaded the metadata index.")
+                loaded_shards = []
+            shard_name = st.selectbox("Shard", saved_shards(METADATA_INDEX_PATH), key="shard_select")
+            load_column, unload_column = st.columns(2)
+            if load_column.button("📥 Load shard", use_container_width=True, key="load_shard_button",
+                                  disabled=shard_name is None or (embedding_backend.requires_api_key and not api_key_set)):
+                with st.spinner(f"Loading shard '{shard_name}'..."):
+                    get_search_engine().index.load_shard(shard_name)
+                st.rerun()
+            if unload_column.button("📤 Unload shard", use_container_width=True, key="unload_shard_button",
+                                    disabled=shard_name not in loaded_shards):
+                sharded_index.unload_shard(shard_name)
+                st.rerun()
+            st.caption("Per-shard latency is that shard's part of each search; shards are searched in parallel. "
+                       "Filtering by database loads its shard on demand.")
+
 with tab_file_analyzer:
     render_file_analyzer_section() # Call the new function to render the file analyzer UI
 
+# --- Performance Panel ---
+if st.sidebar.toggle("📈 Show performance panel", value=PERFORMANCE_PANEL, key="show_performance_panel"):
+    st.markdown("---")
+    render_performance_panel()
+
 st.caption("Semantic Search & Data Analyzer | Powered by Streamlit & Google Gemini AI")
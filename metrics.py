@@ -0,0 +1,374 @@
+# metrics.py
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Exposition Settings ---
+# Serve Prometheus text on http://METRICS_HOST:METRICS_PORT/metrics (0 disables the endpoint), and/or
+# rewrite METRICS_TEXTFILE_PATH every METRICS_EXPORT_INTERVAL_S seconds (e.g. for node_exporter's
+# textfile collector). Both are off by default.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH", "")
+METRICS_EXPORT_INTERVAL_S = float(os.getenv("METRICS_EXPORT_INTERVAL_S", "15"))
+METRICS_NAMESPACE = "semantic_search"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond index lookups to slow generative calls.
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(sorted(labels))}.")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames: tuple, key: tuple, extra: dict | None = None) -> str:
+    pairs = list(zip(labelnames, key)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# --- Metric Types ---
+class Counter:
+    """A monotonically increasing count per label combination."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> dict:
+        """Returns label values -> count."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def exposition(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self.values().items())]
+
+
+class Gauge:
+    """A value computed when metrics are collected (e.g. a ratio of two counters)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, value_fn):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.value_fn = value_fn  # () -> {label values: value}
+
+    def values(self) -> dict:
+        return self.value_fn()
+
+    def reset(self) -> None:
+        pass
+
+    def exposition(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self.values().items())]
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram per label combination, as in Prometheus: observations are
+    counted into fixed buckets, so memory stays constant however many calls are recorded.
+    Quantiles are estimated from the buckets by linear interpolation (like histogram_quantile()).
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        position = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def series(self) -> dict:
+        """Returns label values -> (per-bucket counts, sum, count)."""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def quantile(self, q: float, counts: list[int]) -> float:
+        """Estimates the q-quantile (0..1) of one series from its per-bucket counts."""
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for position, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[position - 1] if position > 0 else 0.0
+                if position == len(self.buckets):
+                    return lower  # Beyond the last bucket: the best estimate is its lower bound
+                return lower + (self.buckets[position] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def exposition(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = {"le": _format_value(bound)}
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+# --- Registry ---
+class MetricsRegistry:
+    """The process-wide set of metrics; renders them in the Prometheus text exposition format."""
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # Registering a name twice returns the metric registered first
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple, value_fn) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help_text, labelnames, value_fn))
+
+    def metrics(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self) -> None:
+        """Clears every recorded value (the metrics themselves stay registered)."""
+        for metric in self.metrics():
+            metric.reset()
+
+    def to_prometheus_text(self) -> str:
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Hot-Path Metrics ---
+EMBEDDING_LATENCY = REGISTRY.histogram(
+    "embedding_request_seconds", "Latency of embedding provider calls (one call per batch).", ("backend",))
+EMBEDDING_TEXTS = REGISTRY.counter(
+    "embedding_texts_total", "Texts sent to embedding providers.", ("backend",))
+EMBEDDING_RETRIES = REGISTRY.counter(
+    "embedding_retries_total", "Embedding batches retried after a retryable error.", ("backend", "error_type"))
+GENERATION_LATENCY = REGISTRY.histogram(
+    "generation_request_seconds", "Latency of Gemini generative API requests, per attempt.", ("kind",))
+GENERATION_RETRIES = REGISTRY.counter(
+    "generation_retries_total", "Gemini generative requests retried after a retryable error.", ("error_type",))
+INDEX_SEARCH_LATENCY = REGISTRY.histogram(
+    "index_search_seconds", "Latency of metadata index searches (vector indexes and BM25).", ("index_type",))
+SHARD_SEARCH_LATENCY = REGISTRY.histogram(
+    "shard_search_seconds", "Latency of one index shard's part of a fanned-out search.", ("shard", "retriever"))
+SHARD_LOAD_LATENCY = REGISTRY.histogram(
+    "shard_load_seconds", "Time to load one index shard from disk.", ("shard",))
+FILE_PARSE_LATENCY = REGISTRY.histogram(
+    "file_parse_seconds", "Time to parse an analyzer file (whole file or preview).", ("format", "mode"))
+COLUMN_PROFILE_LATENCY = REGISTRY.histogram(
+    "column_profile_seconds", "Time to profile one in-memory column.", ("mode",))
+DATASET_PROFILE_LATENCY = REGISTRY.histogram(
+    "dataset_profile_seconds", "Time to profile every column of a file or DataFrame.", ("mode", "executor"))
+ERRORS = REGISTRY.counter(
+    "errors_total", "Errors raised on instrumented paths, by operation and exception type.",
+    ("operation", "error_type"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+
+
+def _cache_hit_ratios() -> dict:
+    totals = {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (count if result == "hit" else 0.0), lookups + count)
+    return {(cache,): hits / lookups for cache, (hits, lookups) in totals.items() if lookups}
+
+
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "cache_hit_ratio", "Share of cache lookups that were hits, since the process started.", ("cache",),
+    _cache_hit_ratios)
+
+
+@contextmanager
+def track_latency(histogram: Histogram, operation: str, **labels):
+    """
+    Times the enclosed block into histogram (with labels), whether it succeeds or fails;
+    exceptions are also counted in errors_total by operation and type, then re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.inc(operation=operation, error_type=type(e).__name__)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def record_cache_lookups(cache: str, hits: int = 0, misses: int = 0) -> None:
+    """Counts cache hits and misses for the hit-ratio metrics."""
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result="miss")
+
+
+def latency_summary(registry: MetricsRegistry = REGISTRY) -> list[dict]:
+    """One row per histogram series: calls, total time and estimated p50/p99/mean latency."""
+    rows = []
+    for metric in registry.metrics():
+        if not isinstance(metric, Histogram):
+            continue
+        operation = metric.name[len(registry.namespace) + 1:].removesuffix("_seconds")
+        for key, (counts, total, count) in sorted(metric.series().items()):
+            rows.append({
+                "operation": operation,
+                "labels": ", ".join(f"{name}={value}" for name, value in zip(metric.labelnames, key)),
+                "calls": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p50_ms": metric.quantile(0.5, counts) * 1000,
+                "p99_ms": metric.quantile(0.99, counts) * 1000,
+            })
+    return rows
+
+
+def error_summary() -> list[dict]:
+    """One row per (operation, exception type) with its error count, most frequent first."""
+    rows = [{"operation": operation, "error_type": error_type, "errors": int(count)}
+            for (operation, error_type), count in ERRORS.values().items()]
+    return sorted(rows, key=lambda row: row["errors"], reverse=True)
+
+
+def cache_summary() -> list[dict]:
+    """One row per cache with its hits, misses and hit ratio."""
+    caches = {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        row = caches.setdefault(cache, {"cache": cache, "hits": 0, "misses": 0})
+        row["hits" if result == "hit" else "misses"] += int(count)
+    for row in caches.values():
+        lookups = row["hits"] + row["misses"]
+        row["hit_ratio"] = row["hits"] / lookups if lookups else 0.0
+    return sorted(caches.values(), key=lambda row: row["cache"])
+
+
+# --- Exporters ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.to_prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the app's log
+
+
+def write_metrics_file(path: str) -> None:
+    """Writes the current metrics to path atomically, so a collector never reads a half-written file."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.to_prometheus_text())
+    os.replace(temporary_path, path)
+
+
+_exporter_lock = threading.Lock()
+_metrics_server = None
+_textfile_thread = None
+
+def start_metrics_exporters(port: int = METRICS_PORT, textfile_path: str = METRICS_TEXTFILE_PATH,
+                            interval_s: float = METRICS_EXPORT_INTERVAL_S, host: str = METRICS_HOST) -> None:
+    """
+    Starts the configured exporters once per process (later calls do nothing): an HTTP endpoint
+    serving /metrics when port is set, and a thread rewriting textfile_path every interval_s seconds.
+    """
+    global _metrics_server, _textfile_thread
+    with _exporter_lock:
+        if port and _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Could not start the metrics endpoint on {host}:{port}: {e}")
+                _metrics_server = False  # Do not retry on every Streamlit rerun
+            else:
+                threading.Thread(target=_metrics_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+                print(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+
+        if textfile_path and _textfile_thread is None:
+            def export_forever():
+                while True:
+                    try:
+                        write_metrics_file(textfile_path)
+                    except OSError as e:
+                        print(f"Could not write metrics to {textfile_path}: {e}")
+                    time.sleep(interval_s)
+
+            _textfile_thread = threading.Thread(target=export_forever, name="metrics-textfile", daemon=True)
+            _textfile_thread.start()
@@ -0,0 +1,232 @@
+# parallel_profiling.py
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+from data_profiling import TOP_K, profile_series, profile_series_sketch
+from metrics import COLUMN_PROFILE_LATENCY, DATASET_PROFILE_LATENCY, ERRORS
+
+# --- Worker Pool Settings ---
+ANALYZER_PROFILE_WORKERS = int(os.getenv("ANALYZER_PROFILE_WORKERS", str(os.cpu_count() or 1)))
+# Narrower DataFrames are profiled in-process: shipping them to workers costs more than it saves.
+ANALYZER_PARALLEL_MIN_COLUMNS = int(os.getenv("ANALYZER_PARALLEL_MIN_COLUMNS", "8"))
+# Columns are handed to workers as an Arrow IPC file that every worker memory-maps; on Linux it
+# lives in /dev/shm so the pages are shared memory rather than disk.
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+WORKER_START_TIMEOUT_S = 120  # How long a new pool waits for all of its workers to start
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_profile_pool(workers: int = ANALYZER_PROFILE_WORKERS) -> ProcessPoolExecutor:
+    """
+    Returns the process pool shared by all analyzer sessions, starting it on first use.
+    Every worker is started here, up front, so submitting columns later never starts a process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, workers)
+            # 'spawn' keeps workers from inheriting the Streamlit server's threads and locks.
+            context = multiprocessing.get_context("spawn")
+            all_started = context.Barrier(workers)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                       initializer=_init_worker, initargs=(all_started,))
+            # The pool starts a worker for each task submitted while none is idle, and no warm-up
+            # task finishes before every worker has reached the barrier, so this starts all of them.
+            with _main_module_hidden():
+                warm_up = [pool.submit(_wait_for_all_workers) for _ in range(workers)]
+            wait(warm_up, timeout=WORKER_START_TIMEOUT_S)
+            _pool = pool
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Shuts down a pool that broke (a worker died, e.g. killed for memory), so the next
+    get_profile_pool() call starts a fresh one instead of failing every later job.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def _main_module_hidden():
+    """
+    Spawned workers re-import the parent's __main__ module. Under Streamlit that is the app script
+    itself, so it is swapped for an empty module while get_profile_pool() starts the workers.
+    """
+    main_module = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+# --- Worker Side ---
+_all_workers_started = None
+
+
+def _init_worker(all_started) -> None:
+    global _all_workers_started
+    _all_workers_started = all_started
+
+
+def _wait_for_all_workers() -> None:
+    """Warm-up task of a new pool: returns once every worker process has started."""
+    _all_workers_started.wait(WORKER_START_TIMEOUT_S)
+
+
+def _profile_shared_column(path: str, position: int, column_name, mode: str, top_k: int) -> tuple[int, dict, float]:
+    """
+    Profiles one column of a shared Arrow file. Runs in a worker process: the file is memory-mapped
+    (a zero-copy view) and only this column is converted to pandas. Returns the profiling time too,
+    since metrics recorded in the worker never reach the app.
+    """
+    started = time.perf_counter()
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        column = table.select([position]).to_pandas().iloc[:, 0].rename(column_name)
+    profile_fn = profile_series_sketch if mode == "sketch" else profile_series
+    return position, profile_fn(column, top_k), time.perf_counter() - started
+
+
+# --- Profile Jobs ---
+def _write_shared_table(df: pd.DataFrame) -> tuple[str, list[int]]:
+    """
+    Writes the Arrow-convertible columns of df to a shared IPC file. Returns the file path and the
+    positions (in df) of the columns it holds, in file order.
+    """
+    positions = list(range(df.shape[1]))
+    frame = df.set_axis([str(position) for position in positions], axis=1)
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Mixed-type object columns cannot be stored in Arrow; they are profiled in-process instead.
+        positions = [position for position in positions if _arrow_convertible(frame.iloc[:, [position]])]
+        table = pa.Table.from_pandas(frame.iloc[:, positions], preserve_index=False)
+
+    fd, path = tempfile.mkstemp(prefix="analyzer-profile-", suffix=".arrow", dir=SHARED_DIR)
+    with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path, positions
+
+
+def _arrow_convertible(frame: pd.DataFrame) -> bool:
+    try:
+        pa.Table.from_pandas(frame, preserve_index=False)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return False
+
+
+class ProfileJob:
+    """
+    Profiles every column of a DataFrame on the shared process pool. Iterating the job yields
+    (column position, profile) as each column finishes, so results can be shown while the rest
+    are still running. cancel() drops columns that have not started and ignores the rest.
+    """
+
+    def __init__(self, df: pd.DataFrame, mode: str = "exact", top_k: int = TOP_K,
+                 workers: int = ANALYZER_PROFILE_WORKERS):
+        self.df = df
+        self.mode = mode
+        self.top_k = top_k
+        self.parallel = workers > 1 and df.shape[1] >= ANALYZER_PARALLEL_MIN_COLUMNS
+        self.workers = workers
+        self.cancelled = False
+        self._futures = []
+        self._path = None
+
+    def __len__(self) -> int:
+        return self.df.shape[1]
+
+    def _profile_locally(self, position: int) -> tuple[int, dict]:
+        profile_fn = profile_series_sketch if self.mode == "sketch" else profile_series
+        return position, profile_fn(self.df.iloc[:, position].rename(self.df.columns[position]), self.top_k)
+
+    def __iter__(self):
+        started = time.perf_counter()
+        if not self.parallel:
+            for position in range(self.df.shape[1]):
+                if self.cancelled:
+                    return
+                yield self._profile_locally(position)
+            DATASET_PROFILE_LATENCY.observe(time.perf_counter() - started, mode=self.mode, executor="inline")
+            return
+
+        done = set()  # Positions already yielded
+        try:
+            self._path, shared_positions = _write_shared_table(self.df)
+            pool = get_profile_pool(self.workers)
+            try:
+                self._futures = [
+                    pool.submit(_profile_shared_column, self._path, file_position, self.df.columns[position], self.mode, self.top_k)
+                    for file_position, position in enumerate(shared_positions)
+                ]
+                file_to_df_position = dict(enumerate(shared_positions))
+                # Columns Arrow cannot hold are profiled here while the workers run.
+                for position in sorted(set(range(self.df.shape[1])) - set(shared_positions)):
+                    if self.cancelled:
+                        return
+                    done.add(position)
+                    yield self._profile_locally(position)
+                for future in as_completed(self._futures):
+                    if self.cancelled:
+                        return
+                    if future.cancelled():
+                        continue
+                    file_position, profile, seconds = future.result()
+                    COLUMN_PROFILE_LATENCY.observe(seconds, mode=self.mode)
+                    done.add(file_to_df_position[file_position])
+                    yield file_to_df_position[file_position], profile
+                executor = "parallel"
+            except BrokenProcessPool as e:
+                ERRORS.inc(operation="dataset_profile", error_type=type(e).__name__)
+                print("⚠️ A profiling worker process died; restarting the pool and profiling the remaining columns in-process.")
+                _discard_pool(pool)
+                for position in range(self.df.shape[1]):
+                    if self.cancelled:
+                        return
+                    if position not in done:
+                        yield self._profile_locally(position)
+                executor = "inline"
+            DATASET_PROFILE_LATENCY.observe(time.perf_counter() - started, mode=self.mode, executor=executor)
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Stops the job: queued columns are cancelled and the shared file is removed."""
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
+        if self._path is not None:
+            try:
+                os.remove(self._path)  # Workers still mapping it keep their view until they finish
+            except FileNotFoundError:
+                pass
+            self._path = None
+
+    def run(self, on_result=None) -> list[dict]:
+        """Runs the job to completion and returns the profiles in column order."""
+        profiles = [None] * len(self)
+        for position, profile in self:
+            profiles[position] = profile
+            if on_result is not None:
+                on_result(position, profile)
+        return [profile for profile in profiles if profile is not None]
@@ -0,0 +1,56 @@
+# performance_panel.py
+import os
+
+import streamlit as st
+import pandas as pd
+
+from metrics import (
+    METRICS_PORT, METRICS_TEXTFILE_PATH, PROMETHEUS_CONTENT_TYPE, REGISTRY, cache_summary, error_summary,
+    latency_summary
+)
+
+# Show the performance panel by default ("1") or only when toggled on in the sidebar ("0").
+PERFORMANCE_PANEL = os.getenv("PERFORMANCE_PANEL", "0") == "1"
+
+def render_performance_panel():
+    """
+    Renders the process-wide hot-path metrics: latency per operation, cache hit ratios and errors
+    by type. These are the same numbers the Prometheus exporters publish.
+    """
+    st.markdown("<h2>📈 Performance</h2>", unsafe_allow_html=True)
+    st.caption("Collected since this app process started, across all sessions. "
+               "Percentiles are estimated from histogram buckets.")
+
+    latencies = latency_summary()
+    if latencies:
+        st.markdown("**⏱️ Latency by operation**")
+        latency_df = pd.DataFrame(latencies).sort_values("total_s", ascending=False)
+        st.dataframe(
+            latency_df.style.format({"total_s": "{:.3f}", "mean_ms": "{:.2f}", "p50_ms": "{:.2f}", "p99_ms": "{:.2f}"}),
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.info("No timed operations yet. Run a search or analyze a file to collect metrics.")
+
+    caches = cache_summary()
+    if caches:
+        st.markdown("**⚡ Cache hit ratios**")
+        st.dataframe(pd.DataFrame(caches).style.format({"hit_ratio": "{:.1%}"}),
+                     use_container_width=True, hide_index=True)
+
+    errors = error_summary()
+    if errors:
+        st.markdown("**❌ Errors by type**")
+        st.dataframe(pd.DataFrame(errors), use_container_width=True, hide_index=True)
+
+    st.download_button(
+        label="⬇️ Download metrics (Prometheus text)",
+        data=REGISTRY.to_prometheus_text(),
+        file_name="metrics.prom",
+        mime=PROMETHEUS_CONTENT_TYPE,
+        key="download_metrics_button"
+    )
+    if METRICS_PORT:
+        st.caption(f"📡 Prometheus endpoint: port {METRICS_PORT}, path `/metrics`")
+    if METRICS_TEXTFILE_PATH:
+        st.caption(f"📝 Metrics file: `{METRICS_TEXTFILE_PATH}`")
@@ -0,0 +1,168 @@
+# search_cache.py
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from embedding_cache import normalize_text
+from metrics import record_cache_lookups
+
+# --- Cache Defaults ---
+DEFAULT_MAX_EMBEDDINGS = 5_000
+DEFAULT_MAX_RESULTS = 2_000
+DEFAULT_TTL_S = 60 * 60  # Query results are cheap to recompute; an hour keeps the cache fresh
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query for cache lookups: Unicode NFC and collapsed whitespace. Case is kept, since
+    it changes the search path ('registrationTimestamp' is answered lexically as an identifier,
+    'registration timestamp' by hybrid search) and so the results.
+    """
+    return normalize_text(unicodedata.normalize("NFC", query))
+
+
+def _freeze(value):
+    """Turns filter values (dicts, lists, sets) into hashable tuples for use in cache keys."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_freeze(item) for item in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    return value
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire ttl_s seconds after being stored.
+    name labels its hits and misses in the cache metrics.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, name: str = "ttl"):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.name = name
+        self._data = OrderedDict()  # key -> (stored_at, value), most recently used last
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                record_cache_lookups(self.name, misses=1)
+                return default
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl_s:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                record_cache_lookups(self.name, misses=1)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            record_cache_lookups(self.name, hits=1)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class QueryCache:
+    """
+    Process-wide cache for the search path, shared by every Streamlit session:
+    normalized query -> query embedding, and (query, index version, k, filters) -> results.
+    When a new index version is seen, cached results for older versions are dropped.
+    """
+
+    def __init__(self, max_embeddings: int = DEFAULT_MAX_EMBEDDINGS, max_results: int = DEFAULT_MAX_RESULTS,
+                 ttl_s: float = DEFAULT_TTL_S):
+        self.embeddings = TTLCache(max_embeddings, ttl_s, name="query_embedding")
+        self.results = TTLCache(max_results, ttl_s, name="search_results")
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    def get_embedding(self, query: str, model_name: str, embed_fn) -> list[float]:
+        """Returns the cached embedding of query for model_name, calling embed_fn(query) on a miss."""
+        key = (model_name, normalize_query(query))
+        embedding = self.embeddings.get(key, _MISSING)
+        if embedding is _MISSING:
+            embedding = embed_fn(query)
+            self.embeddings.put(key, embedding)
+        return embedding
+
+    def get_embeddings(self, queries: list[str], model_name: str, embed_many_fn) -> list[list[float] | None]:
+        """
+        Returns the embedding of each query, calling embed_many_fn(missed queries) once for all
+        cache misses. embed_many_fn returns one vector per query, or None for a failed query
+        (which is not cached).
+        """
+        keys = [(model_name, normalize_query(query)) for query in queries]
+        embeddings = [self.embeddings.get(key, _MISSING) for key in keys]
+        missed = {}
+        for position, embedding in enumerate(embeddings):
+            if embedding is _MISSING:
+                missed.setdefault(keys[position], []).append(position)
+        if missed:
+            fresh = embed_many_fn([queries[positions[0]] for positions in missed.values()])
+            for (key, positions), embedding in zip(missed.items(), fresh):
+                if embedding is not None:
+                    self.embeddings.put(key, embedding)
+                for position in positions:
+                    embeddings[position] = embedding
+        return embeddings
+
+    def get_results(self, query: str, index_version: str, k: int, filters, search_fn) -> list[dict]:
+        """
+        Returns cached results for this query against this index version, calling search_fn()
+        on a miss. Results are copied so callers cannot modify the cached lists.
+        """
+        with self._lock:
+            if index_version != self._index_version:
+                self.results.clear()
+                self._index_version = index_version
+
+        key = (normalize_query(query), index_version, k, _freeze(filters))
+        results = self.results.get(key, _MISSING)
+        if results is _MISSING:
+            results = search_fn()
+            self.results.put(key, [dict(result) for result in results])
+        return [dict(result) for result in results]
+
+    def clear(self) -> None:
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self) -> dict:
+        return {
+            "index_version": self._index_version,
+            "query_embeddings": self.embeddings.stats(),
+            "search_results": self.results.stats(),
+        }
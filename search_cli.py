@@ -0,0 +1,111 @@
+# search_cli.py
+import argparse
+import json
+import os
+import sys
+import time
+
+from bulk_search import OUTPUT_FORMATS, result_rows, write_bulk_results
+from search_engine import METADATA_INDEX_PATH, METADATA_SHARDS, SEARCH_TOP_K, SemanticSearchEngine
+from vector_index import IndexMismatchError
+
+
+def parse_filters(values: list[str]) -> dict:
+    """Turns repeated FIELD=VALUE arguments into a filters dict; repeating a field allows any of its values."""
+    filters = {}
+    for value in values:
+        field, separator, allowed = value.partition("=")
+        if not separator or not field:
+            raise ValueError(f"Invalid filter '{value}'. Expected FIELD=VALUE.")
+        filters.setdefault(field, []).append(allowed)
+    return filters
+
+
+def iter_query_batches(lines, batch_size: int):
+    """Yields the non-empty lines as lists of at most batch_size queries."""
+    batch = []
+    for line in lines:
+        query = line.strip()
+        if not query:
+            continue
+        batch.append(query)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_results(query: str, results: list[dict], output_format: str) -> str:
+    if output_format == "json":
+        return json.dumps({"query": query, "results": results}, ensure_ascii=False)
+    lines = [f"> {query}"]
+    if not results:
+        lines.append("  (no matching tables)")
+    for rank, result in enumerate(results, start=1):
+        lines.append(f"  {rank}. {result['table']}  score={result.get('score', 0.0):.3f} ({result.get('match', 'vector')})"
+                     f"  columns: {', '.join(result.get('columns', []))}")
+    return "\n".join(lines)
+
+
+# --- Command Line ---
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search the metadata index from the command line. Queries are read one per line "
+                    "from --file or stdin; the index is loaded once for all of them."
+    )
+    parser.add_argument("--index", default=METADATA_INDEX_PATH, help="Directory of the metadata index.")
+    parser.add_argument("--file", help="File with one query per line (default: stdin).")
+    parser.add_argument("-k", type=int, default=SEARCH_TOP_K, help="Results per query.")
+    parser.add_argument("--filter", action="append", default=[], metavar="FIELD=VALUE",
+                        help="Only return entries whose FIELD equals VALUE (repeatable).")
+    parser.add_argument("--format", choices=("text", "json"), default="text",
+                        help="Output format: readable text, or one JSON object per query (JSON Lines).")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="Queries embedded per provider call when reading a file or a pipe.")
+    parser.add_argument("--output", help="Write the results to a .csv or .parquet file instead of printing them.")
+    parser.add_argument("--shards", help="For a sharded index: comma-separated shards to load (default: all, or METADATA_SHARDS).")
+    args = parser.parse_args()
+
+    output_format = os.path.splitext(args.output)[1].lower().lstrip(".") if args.output else None
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        parser.error(f"--output must end in one of {', '.join('.' + f for f in OUTPUT_FORMATS)}.")
+
+    try:
+        filters = parse_filters(args.filter) or None
+        shards = [name.strip() for name in args.shards.split(",") if name.strip()] if args.shards else METADATA_SHARDS
+        engine = SemanticSearchEngine.from_path(args.index, shards=shards or None)
+    except (ValueError, FileNotFoundError, IndexMismatchError) as e:
+        sys.exit(f"Error: {e}")
+
+    source = open(args.file, "r", encoding="utf-8") if args.file else sys.stdin
+    # Interactive input is answered line by line; files and pipes in batches.
+    batch_size = 1 if source.isatty() else max(1, args.batch_size)
+    answered = 0
+    started = time.perf_counter()
+
+    def answer_batches():
+        nonlocal answered
+        for queries in iter_query_batches(source, batch_size):
+            yield queries, engine.search_many(queries, k=args.k, filters=filters, use_cache=output_format is None)
+            answered += len(queries)
+
+    try:
+        if output_format:
+            rows = write_bulk_results((result_rows(queries, results) for queries, results in answer_batches()),
+                                      args.output, output_format)
+            print(f"Wrote {rows} result rows to {args.output}.", file=sys.stderr)
+        else:
+            for queries, all_results in answer_batches():
+                for query, results in zip(queries, all_results):
+                    print(format_results(query, results, args.format), flush=True)
+    finally:
+        if args.file:
+            source.close()
+    elapsed = time.perf_counter() - started
+    print(f"Answered {answered} queries in {elapsed:.2f}s ({answered / elapsed if elapsed else 0:.1f} queries/s).",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# search_engine.py
+import os
+import threading
+
+from ai_embedding_logic import get_embedding, get_embedding_backend, get_embeddings
+from attribute_index import FILTER_FIELDS, split_filters
+from hybrid_search import DEFAULT_CANDIDATES, hybrid_search, hybrid_search_many
+from search_cache import QueryCache
+from sharded_index import ShardedIndex
+from vector_index import METADATA_FILE_NAME, MetadataIndex
+
+# --- Search Settings ---
+# The index is saved to disk so it is not rebuilt on every start.
+METADATA_INDEX_PATH = os.getenv("METADATA_INDEX_PATH", "metadata_index")
+METADATA_INDEX_TYPE = os.getenv("METADATA_INDEX_TYPE", "flat")
+METADATA_INDEX_STORAGE = os.getenv("METADATA_INDEX_STORAGE", "float32")
+# Memory-map the saved index files (the default), so server processes on one host share them
+# through the page cache and start without deserializing the index.
+METADATA_INDEX_MMAP = os.getenv("METADATA_INDEX_MMAP", "true").lower() not in ("0", "false", "no")
+# For a sharded index (one shard per database): comma-separated shards to load at start; empty loads all.
+METADATA_SHARDS = [name.strip() for name in os.getenv("METADATA_SHARDS", "").split(",") if name.strip()]
+SEARCH_TOP_K = 5
+# Filters on the attribute fields (FILTER_FIELDS) are applied inside both retrievers; filters on
+# any other entry field are applied to the fused candidates, so those searches fetch this many times k.
+FILTER_OVERFETCH = 10
+
+# Small demo catalog used to bootstrap an index when none has been ingested yet.
+SAMPLE_METADATA = [
+    {"table": "customer_profile", "columns": ["email", "created_at"], "description": "Stores registered users and their signup metadata"},
+    {"table": "user_accounts", "columns": ["user_email", "registration_timestamp"], "description": "Details of user login and account creation"}
+]
+
+
+def _matches_filters(entry: dict, filters: dict) -> bool:
+    """
+    True if the entry satisfies every filter. A filter maps an entry field to one allowed value or
+    a list of allowed values; list-valued fields (e.g. column types) match if any element is allowed.
+    """
+    for field, allowed in filters.items():
+        allowed = set(allowed) if isinstance(allowed, (list, tuple, set, frozenset)) else {allowed}
+        value = entry.get(field)
+        values = set(value) if isinstance(value, (list, tuple)) else {value}
+        if not values & allowed:
+            return False
+    return True
+
+
+def _fetch_sizes(k: int, filters: dict | None) -> tuple[int, int]:
+    """How many fused results and per-retriever candidates to fetch so that k survive the (post-)filters."""
+    if not filters:
+        return k, DEFAULT_CANDIDATES
+    fetch_k = k * FILTER_OVERFETCH
+    return fetch_k, max(DEFAULT_CANDIDATES, fetch_k)
+
+
+def _apply_filters(results: list[dict], filters: dict | None, k: int) -> list[dict]:
+    if not filters:
+        return results
+    return [result for result in results if _matches_filters(result, filters)][:k]
+
+
+class SemanticSearchEngine:
+    """
+    Headless semantic search over the metadata index. Owns the embedding backend, the vector
+    index, the BM25 index built over the same entries and the query cache, so the Streamlit app,
+    the CLI and other tools all run the same search path. Safe to share between threads.
+    The index is a MetadataIndex or a ShardedIndex (one shard per database, searched in parallel).
+    """
+
+    def __init__(self, index: MetadataIndex | ShardedIndex, backend=None, query_cache: QueryCache | None = None,
+                 index_path: str | None = None, mmap: bool = METADATA_INDEX_MMAP):
+        self.backend = backend or get_embedding_backend()
+        self.query_cache = query_cache if query_cache is not None else QueryCache()
+        self.index_path = index_path
+        self.mmap = mmap
+        self._index = index
+        self._index_mtime = self._saved_mtime()
+        self._lexical_index = None
+        self._lexical_version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path: str = METADATA_INDEX_PATH, backend=None, query_cache: QueryCache | None = None,
+                  bootstrap_catalog: list[dict] | None = None, index_type: str = METADATA_INDEX_TYPE,
+                  storage: str = METADATA_INDEX_STORAGE,
+                  shards: list[str] | None = METADATA_SHARDS or None,
+                  mmap: bool = METADATA_INDEX_MMAP) -> "SemanticSearchEngine":
+        """
+        Loads the index saved at path: a sharded index (only the given shards, default all) or a
+        single one. If none has been saved yet, builds one from bootstrap_catalog and saves it
+        (or raises FileNotFoundError without a catalog).
+        With mmap, the saved files are memory-mapped rather than read (see MetadataIndex.load).
+        Loading fails if the saved index was built by a different embedding backend.
+        """
+        backend = backend or get_embedding_backend()
+        if ShardedIndex.exists(path):
+            index = ShardedIndex.load(path, embedding_model=backend.model_name, dimension=backend.dimension,
+                                      shards=shards, mmap=mmap)
+        elif MetadataIndex.exists(path):
+            index = MetadataIndex.load(path, embedding_model=backend.model_name, dimension=backend.dimension,
+                                       mmap=mmap)
+        elif bootstrap_catalog:
+            index = MetadataIndex.build(
+                bootstrap_catalog,
+                lambda text: get_embedding(text, backend=backend),
+                index_type=index_type,
+                storage=storage,
+                embedding_backend=backend.name,
+                embedding_model=backend.model_name
+            )
+            index.save(path)
+        else:
+            raise FileNotFoundError(f"No metadata index found at '{path}'. Run metadata_ingestion.py to build one.")
+        return cls(index, backend=backend, query_cache=query_cache, index_path=path, mmap=mmap)
+
+    # --- Index Lifecycle ---
+    @property
+    def index(self) -> MetadataIndex | ShardedIndex:
+        return self._index
+
+    def _saved_mtime(self) -> float:
+        if not self.index_path:
+            return 0.0
+        metadata_path = os.path.join(self.index_path, METADATA_FILE_NAME)
+        return os.path.getmtime(metadata_path) if os.path.exists(metadata_path) else 0.0
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reloads the index if its saved copy changed since it was loaded (e.g. after a metadata sync).
+        A sharded index only reloads the shards that changed. Returns True if it was reloaded.
+        """
+        if isinstance(self._index, ShardedIndex):
+            return self._index.reload_changed()
+        mtime = self._saved_mtime()
+        if not self.index_path or mtime == self._index_mtime:
+            return False
+        index = MetadataIndex.load(self.index_path, embedding_model=self.backend.model_name,
+                                   dimension=self.backend.dimension, mmap=self.mmap)
+        with self._lock:
+            self._index = index
+            self._index_mtime = mtime
+        return True
+
+    def _indexes(self) -> tuple:
+        """
+        The current vector index and its BM25 index. A loaded index serves the BM25 index saved with
+        it (memory-mapped), and a modified one rebuilds it once per version; a sharded index does
+        this per shard.
+        """
+        with self._lock:
+            index = self._index
+            if self._lexical_version != index.version:
+                self._lexical_index = index.lexical_index()
+                self._lexical_version = index.version
+            return index, self._lexical_index
+
+    # --- Search ---
+    def embed_query(self, query: str) -> list[float]:
+        """Embeds a query with the engine's backend, through the query cache."""
+        return self.query_cache.get_embedding(
+            query, self.backend.model_name, lambda text: get_embedding(text, backend=self.backend)
+        )
+
+    def search(self, query: str, k: int = SEARCH_TOP_K, filters: dict | None = None) -> list[dict]:
+        """
+        Returns the top-k entries for a natural-language or identifier query (hybrid BM25 + vector
+        search), best first. filters (field -> allowed value or values) restricts the results;
+        database, schema, owner and data type filters are answered from the attribute bitmaps.
+        """
+        if not query.strip():
+            return []
+        index, lexical_index = self._indexes()
+        indexed_filters, other_filters = split_filters(filters)
+
+        def run_search():
+            fetch_k, candidates = _fetch_sizes(k, other_filters)
+            results = hybrid_search(query, index, lexical_index, self.embed_query, k=fetch_k, candidates=candidates,
+                                    filters=indexed_filters)
+            return _apply_filters(results, other_filters, k)
+
+        return self.query_cache.get_results(query, index.version, k, filters, run_search)
+
+    def _embed_many(self, queries: list[str], batch_size: int) -> list[list[float] | None]:
+        result = get_embeddings(queries, batch_size=batch_size, transport=self.backend)
+        if result.errors:
+            print(f"⚠️ {len(result.errors)} of {len(queries)} queries could not be embedded; "
+                  "they are answered from lexical matches only.")
+        return result.embeddings
+
+    def search_many(self, queries: list[str], k: int = SEARCH_TOP_K, filters: dict | None = None,
+                    batch_size: int = 100, use_cache: bool = True) -> list[list[dict]]:
+        """
+        Searches several queries at once, returning one result list per query in input order.
+        Query embeddings are fetched in batches (one provider call per batch_size queries) and all
+        vector searches run as blocked matrix products over the index (MetadataIndex.search_batch).
+        use_cache=False bypasses the query cache, so bulk runs (e.g. a whole glossary) do not evict
+        interactive queries; embeddings still go through the persistent embedding cache.
+        Queries whose embedding fails get their lexical matches only.
+        """
+        def embed_many(texts):
+            if not use_cache:
+                return self._embed_many(texts, batch_size)
+            return self.query_cache.get_embeddings(
+                texts, self.backend.model_name, lambda missed: self._embed_many(missed, batch_size)
+            )
+
+        index, lexical_index = self._indexes()
+        indexed_filters, other_filters = split_filters(filters)
+        fetch_k, candidates = _fetch_sizes(k, other_filters)
+        all_results = hybrid_search_many(queries, index, lexical_index, embed_many, k=fetch_k, candidates=candidates,
+                                         filters=indexed_filters)
+        return [_apply_filters(results, other_filters, k) for results in all_results]
+
+    def filter_options(self) -> dict[str, dict[str, int]]:
+        """Returns the values of each filterable field with their entry counts, for building filter controls."""
+        index = self._index
+        return {field: index.filter_values(field) for field in FILTER_FIELDS}
+
+    def stats(self) -> dict:
+        index = self._index
+        stats = {
+            "entries": len(index),
+            "index_type": index.index_type,
+            "index_version": index.version,
+            "embedding_model": self.backend.model_name,
+            "query_cache": self.query_cache.stats(),
+        }
+        if isinstance(index, ShardedIndex):
+            stats["shards"] = index.shard_stats()
+        return stats
@@ -0,0 +1,277 @@
+# sharded_index.py
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+from hybrid_search import BM25Index, tokenize
+from metrics import SHARD_LOAD_LATENCY, SHARD_SEARCH_LATENCY, track_latency
+from vector_index import BATCH_ROW_BLOCK, METADATA_FILE_NAME, MetadataIndex
+
+# --- Shard Layout ---
+# A sharded index is a directory holding one saved MetadataIndex per database (the entries' 'source'):
+#   <path>/shards/<url-quoted source>/{metadata.json, data-<generation>/...}
+SHARDS_DIR_NAME = "shards"
+# Threads searching shards concurrently; FAISS and NumPy release the GIL while they search.
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", str(min(8, os.cpu_count() or 1))))
+# One pool for every ShardedIndex in the process, so reloading or rebuilding an index leaks no threads.
+# Its threads are started on first use.
+_search_executor = ThreadPoolExecutor(max_workers=max(1, SHARD_SEARCH_WORKERS), thread_name_prefix="shard-search")
+
+
+def shard_path(path: str, name: str) -> str:
+    """Directory of the shard for database name inside the sharded index at path."""
+    return os.path.join(path, SHARDS_DIR_NAME, quote(name, safe=""))
+
+
+def saved_shards(path: str) -> list[str]:
+    """Names of the shards saved in the sharded index at path, read from disk without loading any."""
+    shards_dir = os.path.join(path, SHARDS_DIR_NAME)
+    if not os.path.isdir(shards_dir):
+        return []
+    return sorted(unquote(name) for name in os.listdir(shards_dir)
+                  if MetadataIndex.exists(os.path.join(shards_dir, name)))
+
+
+def _merge_top_k(result_lists, k: int) -> list[dict]:
+    """Merges per-shard result lists (each sorted best first) into the overall top-k with a heap."""
+    return list(itertools.islice(heapq.merge(*result_lists, key=lambda result: -result["score"]), k))
+
+
+class ShardedIndex:
+    """
+    A metadata index split into one shard per database, each a MetadataIndex saved in its own
+    directory, so one warehouse can be re-synced, loaded or unloaded without touching the others.
+    Searches fan out to the loaded shards on a thread pool and the per-shard top-k lists are
+    merged with a heap; a 'source' filter only searches those databases' shards, loading them on
+    demand. Offers the search interface of MetadataIndex, so hybrid search and the engine accept either.
+    """
+    index_type = "sharded"
+
+    def __init__(self, path: str, embedding_model: str | None = None, dimension: int | None = None,
+                 mmap: bool = True):
+        self.path = path
+        self.embedding_model = embedding_model
+        self.dimension = dimension
+        self.mmap = mmap  # Memory-map shard files on load (see MetadataIndex.load)
+        self._shards = {}      # name -> MetadataIndex
+        self._mtimes = {}      # name -> mtime of the shard's saved metadata when it was loaded
+        self._load_all = False  # Opened with every shard: shards synced later are picked up by reload_changed()
+        self._lock = threading.RLock()
+        self.version = self._compute_version()
+
+    @classmethod
+    def load(cls, path: str, embedding_model: str | None = None, dimension: int | None = None,
+             shards: list[str] | None = None, mmap: bool = True) -> "ShardedIndex":
+        """
+        Opens the sharded index at path, loading the given shards (default: all of them).
+        Loading fails if a shard was built by a different embedding model or dimension.
+        """
+        index = cls(path, embedding_model=embedding_model, dimension=dimension, mmap=mmap)
+        index._load_all = shards is None
+        for name in (index.available_shards() if shards is None else shards):
+            index.load_shard(name)
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Returns True if path holds a sharded index with at least one saved shard."""
+        return bool(saved_shards(path))
+
+    # --- Shard Lifecycle ---
+    def available_shards(self) -> list[str]:
+        """Names of the shards saved on disk, loaded or not."""
+        return saved_shards(self.path)
+
+    def loaded_shards(self) -> list[str]:
+        return sorted(self._shards)
+
+    def _saved_mtime(self, name: str) -> float:
+        metadata_path = os.path.join(shard_path(self.path, name), METADATA_FILE_NAME)
+        return os.path.getmtime(metadata_path) if os.path.exists(metadata_path) else 0.0
+
+    def _compute_version(self) -> str:
+        """Changes whenever a shard is loaded, unloaded or modified, so caches keyed by it stay fresh."""
+        parts = "|".join(f"{name}:{shard.version}" for name, shard in sorted(self._shards.items()))
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()[:12]
+
+    def load_shard(self, name: str) -> MetadataIndex:
+        """Loads (or reloads) one shard from disk and starts searching it."""
+        mtime = self._saved_mtime(name)
+        with track_latency(SHARD_LOAD_LATENCY, "shard_load", shard=name):
+            shard = MetadataIndex.load(shard_path(self.path, name), embedding_model=self.embedding_model,
+                                       dimension=self.dimension, mmap=self.mmap)
+        with self._lock:
+            self._shards[name] = shard
+            self._mtimes[name] = mtime
+            self.version = self._compute_version()
+        return shard
+
+    def unload_shard(self, name: str) -> bool:
+        """Stops searching a shard and frees its memory. Returns False if it was not loaded."""
+        with self._lock:
+            if self._shards.pop(name, None) is None:
+                return False
+            self._mtimes.pop(name, None)
+            self.version = self._compute_version()
+        return True
+
+    def add_shard(self, name: str, shard: MetadataIndex) -> None:
+        """Saves shard as the shard of database name (replacing any previous one) and starts searching it."""
+        shard.save(shard_path(self.path, name))
+        with self._lock:
+            self._shards[name] = shard
+            self._mtimes[name] = self._saved_mtime(name)
+            self.version = self._compute_version()
+
+    def reload_changed(self) -> bool:
+        """
+        Reloads loaded shards whose saved copy changed (e.g. after a metadata sync of one database),
+        and loads new shards if the index was opened with all of them. Returns True if anything changed.
+        """
+        changed = False
+        for name in list(self._shards):
+            if self._saved_mtime(name) != self._mtimes.get(name):
+                self.load_shard(name)
+                changed = True
+        if self._load_all:
+            for name in set(self.available_shards()) - set(self._shards):
+                self.load_shard(name)
+                changed = True
+        return changed
+
+    # --- Entries ---
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in list(self._shards.values()))
+
+    def __contains__(self, entry_id: str) -> bool:
+        return any(entry_id in shard for shard in list(self._shards.values()))
+
+    def entries(self):
+        """Yields every entry of the loaded shards."""
+        return itertools.chain.from_iterable(shard.entries() for shard in list(self._shards.values()))
+
+    def get(self, entry_id: str) -> dict | None:
+        for shard in list(self._shards.values()):
+            entry = shard.get(entry_id)
+            if entry is not None:
+                return entry
+        return None
+
+    def filter_values(self, field: str) -> dict[str, int]:
+        """
+        Returns the values of a filterable field across the loaded shards, most common first.
+        For 'source', shards that are saved but not loaded are listed with a count of 0.
+        """
+        counts = {}
+        for shard in list(self._shards.values()):
+            for value, count in shard.filter_values(field).items():
+                counts[value] = counts.get(value, 0) + count
+        if field == "source":
+            for name in self.available_shards():
+                counts.setdefault(name, 0)
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    # --- Search ---
+    def _target_shards(self, filters: dict | None) -> list[tuple[str, MetadataIndex]]:
+        """The shards a search has to visit: all loaded shards, or only those named by a 'source' filter."""
+        allowed = (filters or {}).get("source")
+        if allowed is None:
+            return sorted(self._shards.items())
+        names = {str(name) for name in (allowed if isinstance(allowed, (list, tuple, set, frozenset)) else [allowed])}
+        available = set(self.available_shards())
+        for name in sorted(names - set(self._shards)):
+            if name in available:
+                self.load_shard(name)
+        return sorted((name, shard) for name, shard in list(self._shards.items()) if name in names)
+
+    def _fan_out(self, shards: list[tuple[str, MetadataIndex]], retriever: str, search_fn) -> list:
+        """Runs search_fn(name, shard) for every shard on the thread pool, timing each shard."""
+        def run(name, shard):
+            with track_latency(SHARD_SEARCH_LATENCY, "shard_search", shard=name, retriever=retriever):
+                return search_fn(name, shard)
+
+        if len(shards) == 1:
+            return [run(*shards[0])]
+        return [future.result() for future in [_search_executor.submit(run, name, shard) for name, shard in shards]]
+
+    def search(self, query_vector, k: int = 5, filters: dict | None = None) -> list[dict]:
+        """Returns the top-k entries over all searched shards, best first (see MetadataIndex.search)."""
+        shards = self._target_shards(filters)
+        if not shards:
+            return []
+        return _merge_top_k(self._fan_out(shards, "vector", lambda _, shard: shard.search(query_vector, k, filters)), k)
+
+    def search_batch(self, query_vectors, k: int = 5, row_block_size: int = BATCH_ROW_BLOCK,
+                     filters: dict | None = None) -> list[list[dict]]:
+        """Batch search over all searched shards (see MetadataIndex.search_batch), one result list per query."""
+        shards = self._target_shards(filters)
+        if not shards or len(query_vectors) == 0:
+            return [[] for _ in range(len(query_vectors))]
+        per_shard = self._fan_out(
+            shards, "batch", lambda _, shard: shard.search_batch(query_vectors, k, row_block_size, filters)
+        )
+        return [_merge_top_k(query_results, k) for query_results in zip(*per_shard)]
+
+    def _shard_lexical_index(self, name: str, shard: MetadataIndex) -> BM25Index:
+        """The BM25 index of one shard: the memory-mapped one saved with it, or rebuilt after the shard changes."""
+        with self._lock:
+            return shard.lexical_index()
+
+    def lexical_search(self, query: str, k: int = 5, filters: dict | None = None) -> list[dict]:
+        """
+        BM25 search over all searched shards. Term document frequencies are first summed over the
+        shards, so every shard scores with the IDF of the whole catalog and the per-shard top-k lists
+        can be merged by score (like a distributed search engine's DFS query-then-fetch).
+        """
+        shards = self._target_shards(filters)
+        if not shards:
+            return []
+        lexical_indexes = {name: self._shard_lexical_index(name, shard) for name, shard in shards}
+        terms = set(tokenize(query))
+        doc_freqs = {}
+        for lexical_index in lexical_indexes.values():
+            for term, doc_freq in lexical_index.doc_freqs(terms).items():
+                doc_freqs[term] = doc_freqs.get(term, 0) + doc_freq
+        corpus_stats = (sum(len(lexical_index) for lexical_index in lexical_indexes.values()), doc_freqs)
+        return _merge_top_k(self._fan_out(
+            shards, "lexical", lambda name, _: lexical_indexes[name].search(query, k, filters, corpus_stats)
+        ), k)
+
+    def lexical_index(self) -> "ShardedLexicalIndex":
+        return ShardedLexicalIndex(self)
+
+    # --- Reporting ---
+    def shard_stats(self) -> list[dict]:
+        """One row per saved shard: whether it is loaded, its size and its search latency so far."""
+        series = SHARD_SEARCH_LATENCY.series()
+        rows = []
+        for name in sorted(set(self.available_shards()) | set(self._shards)):
+            shard = self._shards.get(name)
+            counts, total, count = series.get((name, "vector"), ([], 0.0, 0))
+            rows.append({
+                "shard": name,
+                "loaded": shard is not None,
+                "entries": len(shard) if shard is not None else None,
+                "searches": count,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p50_ms": SHARD_SEARCH_LATENCY.quantile(0.5, counts) * 1000 if count else 0.0,
+                "p99_ms": SHARD_SEARCH_LATENCY.quantile(0.99, counts) * 1000 if count else 0.0,
+            })
+        return rows
+
+
+class ShardedLexicalIndex:
+    """BM25Index-compatible view over a ShardedIndex's per-shard BM25 indexes, for hybrid_search()."""
+
+    def __init__(self, sharded_index: ShardedIndex):
+        self.sharded_index = sharded_index
+
+    def __len__(self) -> int:
+        return len(self.sharded_index)
+
+    def search(self, query: str, k: int = 5, filters: dict | None = None) -> list[dict]:
+        return self.sharded_index.lexical_search(query, k, filters)
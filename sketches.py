@@ -0,0 +1,148 @@
+# sketches.py
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_HLL_PRECISION = 14      # 2^14 registers (16KB): ~0.8% standard error on distinct counts
+DEFAULT_TOPK_CAPACITY = 1024    # Counters kept by Space-Saving: count error <= rows / capacity
+HASH_RANK_BITS = 50             # Hash bits used for register ranks (exact in float64, ample for any file)
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """
+    Hashes non-null values to uint64 with pandas' vectorized hashing. Numeric values are hashed as
+    float64 so a value hashes the same in int and float chunks of the same column.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        values = values.astype("float64")
+    try:
+        return pd.util.hash_pandas_object(values, index=False).to_numpy()
+    except TypeError:  # Unhashable values (e.g. nested JSON) are hashed as text
+        return pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy()
+
+
+# --- HyperLogLog ---
+class HyperLogLog:
+    """
+    A HyperLogLog distinct-count sketch with 2^precision one-byte registers. Memory is fixed
+    regardless of cardinality, and two sketches of the same precision merge by taking the
+    register-wise maximum, so chunks and worker processes can be sketched independently.
+    """
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16.")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        """The sketch's standard error relative to the true distinct count."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Adds values given by their uint64 hashes (see hash_values)."""
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # Rank = position of the leftmost 1-bit in the low HASH_RANK_BITS bits (all zeros -> bits + 1).
+        low_bits = (hashes & np.uint64((1 << HASH_RANK_BITS) - 1)).astype(np.float64)
+        bit_length = np.frexp(low_bits)[1]
+        ranks = (HASH_RANK_BITS - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def add(self, values: pd.Series) -> None:
+        """Adds the non-null values of a column chunk."""
+        self.add_hashes(hash_values(values.dropna()))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Folds another sketch of the same precision into this one and returns self."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        """Estimates the number of distinct values added so far."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            return m * math.log(m / empty)  # Linear counting is more accurate for small cardinalities
+        return float(raw)
+
+
+# --- Space-Saving Top-K ---
+class SpaceSaving:
+    """
+    A mergeable Space-Saving heavy-hitters sketch keeping at most 'capacity' counters. Each kept
+    value has an upper-bound count and the most it may be overestimated by; any value occurring
+    more than total / capacity times is guaranteed to be kept. Chunks are folded in as exact
+    per-chunk counts and merged with the standard mergeable-summaries rule, so memory stays
+    bounded by the capacity (plus one chunk) instead of the column's cardinality.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOPK_CAPACITY):
+        if capacity < 1:
+            raise ValueError("Space-Saving capacity must be positive.")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = pd.Series(dtype="int64")  # value -> upper-bound count
+        self.errors = pd.Series(dtype="int64")  # value -> maximum overestimation
+
+    def _floor(self) -> int:
+        """Upper bound on the count of any value not kept (0 while fewer than capacity are kept)."""
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def add_counts(self, counts: pd.Series) -> None:
+        """Folds exact value counts of one chunk into the sketch."""
+        chunk = SpaceSaving(self.capacity)
+        chunk.total = int(counts.sum())
+        chunk.counts = counts.astype("int64")
+        chunk.errors = pd.Series(0, index=counts.index, dtype="int64")
+        chunk._truncate()
+        self.merge(chunk)
+
+    def add(self, values: pd.Series) -> None:
+        """Adds the non-null values of a column chunk."""
+        values = values.dropna()
+        try:
+            codes, uniques = pd.factorize(values)
+        except TypeError:  # Unhashable values (e.g. nested JSON) are counted as text
+            codes, uniques = pd.factorize(values.astype(str))
+        counts = np.bincount(codes, minlength=len(uniques))
+        self.add_counts(pd.Series(counts, index=pd.Index(uniques, tupleize_cols=False), dtype="int64"))
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Folds another sketch into this one and returns self."""
+        self_floor, other_floor = self._floor(), other._floor()
+        index = self.counts.index.union(other.counts.index, sort=False)
+        self.counts = (self.counts.reindex(index, fill_value=self_floor)
+                       + other.counts.reindex(index, fill_value=other_floor))
+        self.errors = (self.errors.reindex(index, fill_value=self_floor)
+                       + other.errors.reindex(index, fill_value=other_floor))
+        self.total += other.total
+        self._truncate()
+        return self
+
+    def _truncate(self) -> None:
+        if len(self.counts) > self.capacity:
+            keep = self.counts.nlargest(self.capacity, keep="first").index
+            self.counts = self.counts.loc[keep]
+            self.errors = self.errors.loc[keep]
+
+    @property
+    def max_error(self) -> int:
+        """Worst-case overestimation of any reported count."""
+        return self.total // self.capacity
+
+    def top(self, k: int) -> list[tuple]:
+        """Returns up to k (value, upper-bound count, guaranteed lower-bound count) by descending count."""
+        order = np.argsort(-self.counts.to_numpy(), kind="stable")[:k]
+        counts = self.counts.to_numpy()[order]
+        errors = self.errors.to_numpy()[order]
+        return [(value, int(count), int(count - error))
+                for value, count, error in zip(self.counts.index[order], counts, errors)]
@@ -0,0 +1,126 @@
+# tests/test_ai_embedding_logic.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import ai_embedding_logic
+from ai_embedding_logic import (FakeEmbeddingTransport, GeminiEmbeddingBackend, LocalHashingEmbeddingBackend,
+                                get_embedding_backend, get_embeddings)
+from gemini_client import EmbeddingInputError
+
+
+@pytest.fixture(autouse=True)
+def no_cache_or_backoff(monkeypatch):
+    monkeypatch.setattr(ai_embedding_logic, "EMBEDDING_CACHE_PATH", "")
+    monkeypatch.setattr(ai_embedding_logic, "backoff_delay", lambda attempt: 0.0)
+
+
+class FlakyTransport(FakeEmbeddingTransport):
+    """Raises error on the first `failures` calls, then embeds normally."""
+
+    def __init__(self, failures: int, error: Exception):
+        super().__init__(dimension=4, latency_s=0.0)
+        self.failures = failures
+        self.error = error
+
+    def __call__(self, texts):
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise self.error
+        return super().__call__(texts)
+
+
+class ShortResponseTransport(FakeEmbeddingTransport):
+    """Returns one embedding too few, like a malformed provider response."""
+
+    def __call__(self, texts):
+        return super().__call__(texts)[:-1]
+
+
+def _texts(count: int) -> list[str]:
+    return [f"text {i}" for i in range(count)]
+
+
+def test_rejected_input_only_fails_itself():
+    transport = FakeEmbeddingTransport(dimension=4, latency_s=0.0, fail_texts={"text 7"})
+    result = get_embeddings(_texts(16), batch_size=16, transport=transport)
+    assert list(result.errors) == [7]
+    assert all(vector is not None for position, vector in enumerate(result.embeddings) if position != 7)
+
+
+def test_malformed_response_fails_batch_without_bisecting():
+    transport = ShortResponseTransport(dimension=4, latency_s=0.0)
+    result = get_embeddings(_texts(16), batch_size=16, transport=transport)
+    assert transport.calls == 1
+    assert len(result.errors) == 16
+
+
+def test_transient_error_retries_whole_batch():
+    transport = FlakyTransport(2, ConnectionError("connection reset"))
+    result = get_embeddings(_texts(16), batch_size=16, transport=transport)
+    assert result.ok
+    assert transport.calls == 3
+
+
+def test_other_errors_fail_batch_once():
+    transport = FlakyTransport(100, PermissionError("API key not valid"))
+    result = get_embeddings(_texts(16), batch_size=16, transport=transport)
+    assert transport.calls == 1
+    assert len(result.errors) == 16
+
+
+def test_local_backend_rejects_non_text_input():
+    with pytest.raises(EmbeddingInputError):
+        LocalHashingEmbeddingBackend(8).embed_texts(["orders", None])
+
+
+def test_local_backend_is_deterministic_and_normalized():
+    backend = LocalHashingEmbeddingBackend(64)
+    first, second = backend.embed_texts(["customer_orders table", "customer_orders table"])
+    assert first == second
+    assert np.linalg.norm(first) == pytest.approx(1.0, rel=1e-5)
+    assert backend.model_name == "local-hashing-64"
+
+
+def test_local_backend_splits_identifiers_into_words():
+    backend = LocalHashingEmbeddingBackend(256)
+    snake, camel, other = np.array(backend.embed_texts(["customer_orders", "customerOrders", "invoice_lines"]))
+    assert snake @ camel > 0.9
+    assert snake @ camel > snake @ other
+
+
+def test_unknown_backend_name_is_rejected():
+    with pytest.raises(ValueError):
+        get_embedding_backend("word2vec")
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Replaces the Gemini model and transport with a fake that returns 3-dimensional vectors."""
+    calls = []
+    monkeypatch.setattr(ai_embedding_logic, "get_embedding_model", lambda: SimpleNamespace(model_name="models/fake"))
+
+    def transport(texts, output_dimensionality=None):
+        calls.append((list(texts), output_dimensionality))
+        return [[0.0, 0.6, 0.8] for _ in texts]
+
+    monkeypatch.setattr(ai_embedding_logic, "gemini_embedding_transport", transport)
+    return calls
+
+
+def test_gemini_backend_learns_dimension_from_the_model(fake_gemini):
+    backend = GeminiEmbeddingBackend(dimension=None)
+    assert backend.model_name == "models/fake"
+    assert backend.dimension == 3
+    assert backend.dimension == 3
+    assert fake_gemini == [(["dimension probe"], None)]
+
+
+def test_gemini_backend_rejects_unsupported_requested_dimension(fake_gemini):
+    backend = GeminiEmbeddingBackend(dimension=5)
+    assert backend.model_name == "models/fake@5"
+    with pytest.raises(RuntimeError):
+        backend.embed_texts(["orders"])
+    assert fake_gemini == [(["orders"], 5)]
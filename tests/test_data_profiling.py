@@ -0,0 +1,77 @@
+# tests/test_data_profiling.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_profiling import ColumnStatsAccumulator, profile_dataframe, profile_file_streaming, profile_series
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(7)
+    values = rng.integers(0, 50, 1_000).astype("float64")
+    values[rng.random(1_000) < 0.1] = np.nan
+    return pd.DataFrame({
+        "amount": values,
+        "city": rng.choice(["Oslo", "Lima", "Pune", None], 1_000),
+        "flag": rng.random(1_000) < 0.3,
+    })
+
+
+def _pandas_profile(series: pd.Series) -> dict:
+    """The statistics computed the straightforward way, one pandas pass each."""
+    non_null = series.dropna()
+    return {
+        "null_count": int(series.isnull().sum()),
+        "distinct_count": int(non_null.nunique()),
+        "duplicate_count": int(non_null.duplicated().sum()),
+        "top_counts": sorted(non_null.value_counts().tolist(), reverse=True)[:10],
+    }
+
+
+def test_single_pass_profile_matches_separate_pandas_passes(frame):
+    for profile in profile_dataframe(frame):
+        series = frame[profile["column"]]
+        expected = _pandas_profile(series)
+        counts = series.value_counts()
+        assert profile["total_rows"] == len(series)
+        assert {key: profile[key] for key in ("null_count", "distinct_count", "duplicate_count")} == \
+            {key: expected[key] for key in ("null_count", "distinct_count", "duplicate_count")}
+        assert [int(counts[value]) for value in profile["top_values"]] == expected["top_counts"]
+
+    amount = profile_series(frame["amount"])
+    assert amount["mean"] == pytest.approx(frame["amount"].mean())
+    assert amount["std"] == pytest.approx(frame["amount"].std())
+    assert (amount["min"], amount["max"]) == (frame["amount"].min(), frame["amount"].max())
+
+
+def test_categorical_and_unhashable_columns():
+    categorical = profile_series(pd.Series(["b", "a", "b", None], dtype="category", name="grade"))
+    assert (categorical["distinct_count"], categorical["null_count"]) == (2, 1)
+    assert categorical["top_values"][0] == "b"
+
+    nested = profile_series(pd.Series([{"a": 1}, {"a": 1}, [1, 2], None], name="payload"))
+    assert (nested["distinct_count"], nested["duplicate_count"], nested["null_count"]) == (2, 1, 1)
+
+
+def test_chunked_accumulator_matches_in_memory_profile(frame):
+    accumulator = ColumnStatsAccumulator("amount")
+    for start in range(0, len(frame), 64):
+        accumulator.update(frame["amount"].iloc[start:start + 64])
+    streamed, in_memory = accumulator.profile(), profile_series(frame["amount"])
+    for key in ("total_rows", "null_count", "distinct_count", "duplicate_count", "min", "max", "dtype"):
+        assert streamed[key] == in_memory[key]
+    assert streamed["mean"] == pytest.approx(in_memory["mean"])
+    assert streamed["std"] == pytest.approx(in_memory["std"])
+
+
+def test_streaming_file_profile_matches_in_memory_profile(frame):
+    buffer = io.BytesIO(frame.to_csv(index=False).encode("utf-8"))
+    buffer.name = "frame.csv"
+    streamed = profile_file_streaming(buffer, chunk_rows=100)
+    in_memory = profile_dataframe(pd.read_csv(io.BytesIO(frame.to_csv(index=False).encode("utf-8"))))
+    for streamed_column, column in zip(streamed, in_memory):
+        for key in ("column", "total_rows", "null_count", "distinct_count", "duplicate_count", "dtype"):
+            assert streamed_column[key] == column[key]
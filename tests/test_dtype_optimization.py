@@ -0,0 +1,67 @@
+# tests/test_dtype_optimization.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_profiling import profile_dataframe
+from dtype_optimization import optimize_dtypes, original_dtype
+
+
+@pytest.fixture
+def frame():
+    rows = 2_000
+    rng = np.random.default_rng(11)
+    return pd.DataFrame({
+        "small_int": rng.integers(0, 200, rows),
+        "signed_int": rng.integers(-1_000, 1_000, rows),
+        "halves": rng.integers(0, 100, rows) / 2,    # Exactly representable in float32
+        "prices": rng.random(rows) * 100,             # Not representable: stays float64
+        "country": rng.choice(["NO", "PE", "IN"], rows),
+        "email": [f"user{i}@example.com" for i in range(rows)],
+        "created": pd.Series(pd.date_range("2024-01-01", periods=rows, freq="h")).dt.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mixed": [1 if i % 2 else "one" for i in range(rows)],
+        "flag": rng.random(rows) < 0.5,
+    })
+
+
+def test_columns_get_smaller_dtypes(frame):
+    optimized = optimize_dtypes(frame)
+    dtypes = {column: str(dtype) for column, dtype in optimized.dtypes.items()}
+    assert dtypes["small_int"] == "uint8"
+    assert dtypes["signed_int"] == "int16"
+    assert dtypes["halves"] == "float32"
+    assert dtypes["prices"] == "float64"
+    assert dtypes["country"] == "category"
+    assert dtypes["created"].startswith("datetime64")
+    assert dtypes["mixed"] == "object"
+    assert dtypes["flag"] == "bool"
+    assert optimized.memory_usage(deep=True).sum() < frame.memory_usage(deep=True).sum()
+
+
+def test_values_and_profiles_are_unchanged(frame):
+    optimized = optimize_dtypes(frame)
+    for column in ["small_int", "signed_int", "halves", "prices", "country", "email"]:
+        assert optimized[column].astype(frame[column].dtype).equals(frame[column])
+    for before, after in zip(profile_dataframe(frame), profile_dataframe(optimized)):
+        if before["column"] == "created":
+            continue  # Parsed dates profile as timestamps
+        for key in ("null_count", "distinct_count", "duplicate_count", "mean"):
+            assert after[key] == pytest.approx(before[key])
+
+
+def test_original_dtypes_and_report_are_recorded(frame):
+    optimized = optimize_dtypes(frame)
+    assert original_dtype(optimized, "small_int", "unknown") == str(frame["small_int"].dtype)
+    assert original_dtype(frame, "small_int", "unknown") == "unknown"
+    report = optimized.attrs["dtype_optimization"]
+    assert report["saved_pct"] > 0
+    assert {change["column"] for change in report["changes"]} >= {"small_int", "country", "created"}
+    assert "prices" not in {change["column"] for change in report["changes"]}
+
+
+def test_nulls_in_date_like_columns_are_kept_and_bad_dates_are_not_parsed():
+    dates = optimize_dtypes(pd.DataFrame({"d": ["2024-01-01", None, "2024-02-30"] * 10}))
+    assert not str(dates["d"].dtype).startswith("datetime64")
+    parsed = optimize_dtypes(pd.DataFrame({"d": ["2024-01-01", None, "2024-02-03"] * 10}))
+    assert str(parsed["d"].dtype).startswith("datetime64")
+    assert parsed["d"].isna().sum() == 10
@@ -0,0 +1,83 @@
+# tests/test_embedding_cache.py
+import itertools
+
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+VECTOR_BYTES = 16  # Four float32 values
+
+
+@pytest.fixture(autouse=True)
+def ordered_clock(monkeypatch):
+    """Gives every write and lookup a distinct, increasing access time."""
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(clock)))
+
+
+def _vector(i: int) -> list[float]:
+    return [float(i), 0.0, 0.0, 1.0]
+
+
+def test_eviction_removes_least_recently_used_rows_down_to_target():
+    cache = EmbeddingCache(":memory:", max_bytes=10 * VECTOR_BYTES, memory_entries=0)
+    for i in range(10):
+        cache.put("model", f"text {i}", _vector(i))
+    assert cache.stats()["evictions"] == 0
+
+    cache.get("model", "text 0")  # Refreshes the oldest row
+    cache.put("model", "text 10", _vector(10))
+
+    # 11 rows exceed the budget; eviction goes down to 90% (9 rows), oldest first
+    stats = cache.stats()
+    assert stats["evictions"] == 2
+    assert stats["stored_bytes"] == 9 * VECTOR_BYTES
+    assert cache.get("model", "text 0") == _vector(0)
+    assert cache.get("model", "text 1") is None
+    assert cache.get("model", "text 2") is None
+    assert cache.get("model", "text 3") == _vector(3)
+
+
+def test_memory_lru_serves_recent_entries_and_falls_back_to_sqlite():
+    cache = EmbeddingCache(":memory:", memory_entries=2)
+    cache.put_many("model", ["a", "b", "c"], [_vector(1), _vector(2), _vector(3)])
+
+    assert cache.get("model", "c") == _vector(3)
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.get("model", "a") == _vector(1)  # Dropped from memory, read from SQLite
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("model", "a") == _vector(1)
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_lookups_are_keyed_by_model_and_normalized_text():
+    cache = EmbeddingCache(":memory:", memory_entries=0)
+    cache.put("model", "orders  table\n", _vector(1))
+    assert cache.get("model", "orders table") == _vector(1)
+    assert cache.get("other-model", "orders table") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_eviction_counts_rows_written_by_other_processes(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    first = EmbeddingCache(path, max_bytes=10 * VECTOR_BYTES, memory_entries=0)
+    second = EmbeddingCache(path, max_bytes=10 * VECTOR_BYTES, memory_entries=0)
+    first.put_many("model", [f"first {i}" for i in range(6)], [_vector(i) for i in range(6)])
+    second.put_many("model", [f"second {i}" for i in range(6)], [_vector(i) for i in range(6)])
+
+    # The second writer saw the first one's rows, so the shared file is back within budget
+    assert second.stats()["evictions"] == 3
+    assert first.stats()["stored_bytes"] == 9 * VECTOR_BYTES
+    assert first.get("model", "first 2") is None
+    assert first.get("model", "first 3") == _vector(3)
+
+
+def test_duplicate_texts_in_one_write_are_stored_once():
+    cache = EmbeddingCache(":memory:", max_bytes=2 * VECTOR_BYTES, memory_entries=0)
+    cache.put_many("model", ["orders", "orders ", "users"], [_vector(1), _vector(2), _vector(3)])
+    stats = cache.stats()
+    assert stats["stored_bytes"] == 2 * VECTOR_BYTES
+    assert stats["evictions"] == 0
+    assert cache.get("model", "orders") == _vector(2)
@@ -0,0 +1,80 @@
+# tests/test_file_ingestion.py
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from data_profiling import profile_file_streaming
+from file_ingestion import iter_dataframe_chunks, iter_json_array_records, read_dataframe
+
+RECORDS = [
+    {"id": 1, "name": "Zoë", "tags": ["a", "b"], "address": {"city": "Kraków"}},
+    {"id": 12345678901234, "name": "plain ascii", "score": -1.5e-3},
+    "bare string with \"escaped\" ] and , inside",
+    12345,
+    None,
+    {"id": 3, "nested": [[1, 2], {"deep": True}]},
+]
+
+
+def _upload(content: str, name: str) -> io.BytesIO:
+    upload = io.BytesIO(content.encode("utf-8"))
+    upload.name = name
+    return upload
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 2, 3, 7, 64, 1 << 20])
+def test_array_records_split_across_read_chunks(chunk_bytes):
+    document = "\ufeff [\n  " + ",\n  ".join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + "\n]\n"
+    f = io.BytesIO(document.encode("utf-8"))
+    assert list(iter_json_array_records(f, chunk_bytes=chunk_bytes)) == RECORDS
+
+
+def test_number_at_a_chunk_boundary_is_not_cut_short():
+    # With 4-byte reads the first buffer ends inside the number
+    assert list(iter_json_array_records(io.BytesIO(b"[123456, 7]"), chunk_bytes=4)) == [123456, 7]
+
+
+@pytest.mark.parametrize("document", [b"[1, 2", b"[1 2]", b"{\"a\": 1}", b"[1, {\"a\": ]"])
+def test_malformed_arrays_raise(document):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array_records(io.BytesIO(document), chunk_bytes=3))
+
+
+def test_empty_array_has_no_records():
+    assert list(iter_json_array_records(io.BytesIO(b" [ ] "), chunk_bytes=1)) == []
+
+
+NDJSON = "\n".join([
+    '{"id": 1, "name": "a"}',
+    '{"id": 2, "name": "b"}',
+    '',
+    '{"id": 3}',
+    '{"id": 4, "name": "d", "email": "d@example.com"}',
+    '{"id": 5, "name": "e"}',
+]) + "\n"
+
+
+def test_ndjson_chunks_project_missing_columns_as_nulls():
+    chunks = list(iter_dataframe_chunks(_upload(NDJSON, "rows.ndjson"), chunk_rows=2, columns=["id", "email"]))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(list(chunk.columns) == ["id", "email"] for chunk in chunks)
+    assert pd.concat(chunks)["email"].notna().tolist() == [False, False, False, True, False]
+
+
+def test_ndjson_streaming_profile_counts_rows_missing_a_column():
+    profiles = {profile["column"]: profile for profile in profile_file_streaming(_upload(NDJSON, "rows.jsonl"),
+                                                                                 chunk_rows=2)}
+    assert list(profiles) == ["id", "name", "email"]
+    assert all(profile["total_rows"] == 5 for profile in profiles.values())
+    assert profiles["name"]["null_count"] == 1
+    assert profiles["email"]["null_count"] == 4
+    whole = read_dataframe(_upload(NDJSON, "rows.ndjson"))
+    assert profiles["id"]["dtype"] == str(whole["id"].dtype)
+    assert profiles["name"]["dtype"] == str(whole["name"].dtype)
+
+
+def test_json_file_holding_lines_is_read_as_ndjson():
+    df = read_dataframe(_upload(NDJSON, "rows.json"))
+    assert df["id"].tolist() == [1, 2, 3, 4, 5]
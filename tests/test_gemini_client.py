@@ -0,0 +1,100 @@
+# tests/test_gemini_client.py
+import asyncio
+import time
+
+import pytest
+
+from gemini_client import AsyncGeminiClient, TokenBucket, backoff_delay
+
+
+class FakeModel:
+    """Stands in for a Gemini GenerativeModel: raises the queued errors first, then echoes the prompt."""
+
+    def __init__(self, errors=(), latency_s: float = 0.01):
+        self.errors = list(errors)
+        self.latency_s = latency_s
+        self.calls = []
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls.append(prompt)
+        await asyncio.sleep(self.latency_s)
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"response to {prompt}"
+
+
+def _client(model: FakeModel, backoff_attempts: list | None = None, **kwargs) -> AsyncGeminiClient:
+    client = AsyncGeminiClient(lambda: model, requests_per_minute=60_000, **kwargs)
+    backoff_attempts = [] if backoff_attempts is None else backoff_attempts
+
+    def no_delay(attempt: int) -> float:
+        backoff_attempts.append(attempt)  # Record the backoff instead of sleeping it
+        return 0.0
+
+    client._backoff_delay = no_delay
+    return client
+
+
+def test_token_bucket_paces_requests_beyond_its_capacity():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=6000, capacity=2)  # 100 tokens per second
+        start = time.monotonic()
+        for _ in range(2):
+            await bucket.acquire()
+        burst = time.monotonic() - start
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.01  # The initial capacity is available at once
+    assert total >= 0.045  # Then five more tokens take 10ms each
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_concurrent_identical_prompts_share_one_request():
+    model = FakeModel()
+    client = _client(model)
+
+    async def run():
+        return await asyncio.gather(client.generate("a"), client.generate("a"), client.generate("a"),
+                                    client.generate("a", coalesce_key="json"), client.generate("b"))
+
+    responses = asyncio.run(run())
+    assert responses == ["response to a"] * 4 + ["response to b"]
+    assert sorted(model.calls) == ["a", "a", "b"]
+    assert client.stats() == {"requests": 3, "retries": 0, "coalesced": 2}
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    attempts = []
+    model = FakeModel(errors=[ConnectionError("reset"), asyncio.TimeoutError()])
+    client = _client(model, attempts)
+    assert client.generate_sync("a") == "response to a"
+    assert attempts == [0, 1]
+    assert client.stats()["retries"] == 2
+
+
+def test_non_retryable_errors_and_exhausted_retries_are_raised():
+    model = FakeModel(errors=[PermissionError("API key not valid")])
+    client = _client(model)
+    with pytest.raises(PermissionError):
+        client.generate_sync("a")
+    assert len(model.calls) == 1
+
+    model = FakeModel(errors=[ConnectionError("reset")] * 3)
+    client = _client(model, max_retries=2)
+    with pytest.raises(ConnectionError):
+        client.generate_sync("a")
+    assert len(model.calls) == 3
+
+
+def test_backoff_delay_has_full_jitter_within_the_cap():
+    delays = [backoff_delay(3, base_delay_s=1.0, max_delay_s=5.0) for _ in range(200)]
+    assert all(0 <= delay <= 5.0 for delay in delays)
+    assert max(delays) > 2.5 and min(delays) < 2.5
+    assert all(backoff_delay(0, base_delay_s=1.0) <= 1.0 for _ in range(50))
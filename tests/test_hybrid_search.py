@@ -0,0 +1,74 @@
+# tests/test_hybrid_search.py
+import pytest
+
+from hybrid_search import BM25Index, looks_like_identifier, reciprocal_rank_fusion
+
+ENTRIES = [
+    {"id": "crm.users", "source": "crm", "table": "users", "columns": ["id", "user_email", "created_at"],
+     "description": "Registered users"},
+    {"id": "crm.contacts", "source": "crm", "table": "contacts", "columns": ["id", "email", "user_id"],
+     "description": "Contact addresses for a user"},
+    {"id": "shop.orders", "source": "shop", "table": "orders", "columns": ["id", "user_id", "total"],
+     "description": "Orders placed by users"},
+    {"id": "shop.products", "source": "shop", "table": "products", "columns": ["id", "name", "price"],
+     "description": "Product catalog"},
+]
+
+
+def _ids(results: list[dict]) -> list[str]:
+    return [result["id"] for result in results]
+
+
+def test_exact_identifier_outranks_separate_words():
+    results = BM25Index(ENTRIES).search("user_email", k=2)
+    assert _ids(results)[0] == "crm.users"
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_search_applies_filters_and_skips_unmatched_entries():
+    index = BM25Index(ENTRIES)
+    assert set(_ids(index.search("user", k=10))) == {"crm.users", "crm.contacts", "shop.orders"}
+    assert _ids(index.search("user", k=10, filters={"source": "shop"})) == ["shop.orders"]
+    assert index.search("warehouse", k=10) == []
+
+
+def test_array_round_trip_gives_identical_results():
+    index = BM25Index(ENTRIES)
+    arrays, directory = index.to_arrays()
+    loaded = BM25Index.from_arrays(arrays, directory, ENTRIES)
+    for query in ["user email", "orders total", "product price", "missing"]:
+        assert loaded.search(query, k=4) == index.search(query, k=4)
+    assert loaded.search("user", k=4, filters={"source": "crm"}) == index.search("user", k=4, filters={"source": "crm"})
+    assert loaded.doc_freqs(["user", "price", "missing"]) == index.doc_freqs(["user", "price", "missing"])
+    with pytest.raises(ValueError):
+        BM25Index.from_arrays(arrays, directory, ENTRIES[:2])
+
+
+def test_corpus_stats_replace_the_local_idf():
+    shard = BM25Index(ENTRIES[2:])
+    # In the full catalog 'user' is common, so its weight drops relative to the shard's own statistics
+    full = BM25Index(ENTRIES)
+    stats = (len(ENTRIES), full.doc_freqs(["user", "orders"]))
+    local_score = shard.search("user", k=1)[0]["score"]
+    global_score = shard.search("user", k=1, corpus_stats=stats)[0]["score"]
+    assert global_score < local_score
+
+
+def test_rrf_rewards_entries_ranked_by_both_retrievers():
+    a, b, c, d = ({"id": name, "table": name, "score": 1.0} for name in "abcd")
+    fused = reciprocal_rank_fusion([[a, b, c], [c, d, b]], k=3)
+    # b and c appear in both lists; c's ranks (3, 1) beat b's (2, 3); a and d appear once
+    assert _ids(fused) == ["c", "b", "a"]
+    assert fused[0]["score"] == pytest.approx(1 / 63 + 1 / 61)
+    assert a["score"] == 1.0  # Inputs are not modified
+
+
+def test_rrf_matches_entries_without_id_by_table():
+    fused = reciprocal_rank_fusion([[{"table": "orders"}], [{"table": "orders"}, {"table": "users"}]])
+    assert [result["table"] for result in fused] == ["orders", "users"]
+
+
+def test_identifier_queries_are_detected():
+    assert looks_like_identifier("user_email")
+    assert looks_like_identifier("registrationTimestamp, created_at")
+    assert not looks_like_identifier("customer email address")
@@ -0,0 +1,45 @@
+# tests/test_parallel_profiling.py
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel_profiling
+from data_profiling import profile_dataframe
+from parallel_profiling import ProfileJob, get_profile_pool
+
+
+@pytest.fixture
+def fresh_pool():
+    yield
+    if parallel_profiling._pool is not None:
+        parallel_profiling._discard_pool(parallel_profiling._pool)
+
+
+def _frame() -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    columns = {f"number_{i}": rng.integers(0, 20 * (i + 1), 500) for i in range(6)}
+    columns["text"] = rng.choice(["a", "b", None], 500)
+    columns["mixed"] = [1 if i % 3 else "x" for i in range(500)]  # Not storable in Arrow: profiled in-process
+    return pd.DataFrame(columns)
+
+
+def test_parallel_job_matches_inline_profiles(fresh_pool):
+    df = _frame()
+    job = ProfileJob(df, workers=2)
+    assert job.parallel
+    assert job.run() == profile_dataframe(df)
+
+
+def test_workers_start_with_the_pool_and_submits_leave_main_alone(fresh_pool, monkeypatch):
+    pool = get_profile_pool(2)
+    assert len(pool._processes) == 2  # Both started up front, while __main__ was hidden
+
+    main_module = sys.modules["__main__"]
+    hidden = []
+    monkeypatch.setattr(parallel_profiling, "_main_module_hidden", lambda: hidden.append(True))
+    ProfileJob(_frame(), workers=2).run()
+    assert not hidden
+    assert sys.modules["__main__"] is main_module
+    assert len(pool._processes) == 2
@@ -0,0 +1,79 @@
+# tests/test_sketches.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, SpaceSaving
+
+
+@pytest.mark.parametrize("distinct", [100, 5_000, 200_000])
+def test_hyperloglog_estimate_is_within_error_bound(distinct):
+    sketch = HyperLogLog(precision=12)
+    values = pd.Series(np.arange(distinct))
+    sketch.add(pd.concat([values, values.iloc[:distinct // 2]]))  # Repeats must not count twice
+    # Four standard errors: a deterministic input that fails this is a real bug, not bad luck
+    assert abs(sketch.estimate() - distinct) <= 4 * sketch.relative_error * distinct
+
+
+def test_hyperloglog_merge_equals_sketching_everything_at_once():
+    values = pd.Series([f"user-{i}" for i in range(20_000)])
+    whole, first, second = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.add(values)
+    first.add(values.iloc[:12_000])
+    second.add(values.iloc[8_000:])
+    assert first.merge(second) is first
+    assert np.array_equal(first.registers, whole.registers)
+    assert first.estimate() == whole.estimate()
+    with pytest.raises(ValueError):
+        whole.merge(HyperLogLog(precision=10))
+
+
+def test_hyperloglog_hashes_ints_and_floats_alike_and_skips_nulls():
+    ints, floats = HyperLogLog(), HyperLogLog()
+    ints.add(pd.Series([1, 2, 3]))
+    floats.add(pd.Series([1.0, 2.0, 3.0, np.nan]))
+    assert np.array_equal(ints.registers, floats.registers)
+    assert HyperLogLog().estimate() == 0
+
+
+def _skewed_values(rng, rows: int) -> pd.Series:
+    """A Zipf-like column: a few heavy values over a long tail of rare ones."""
+    return pd.Series(rng.zipf(1.5, rows) % 100_000)
+
+
+def test_space_saving_keeps_heavy_hitters_with_bounded_counts():
+    rng = np.random.default_rng(3)
+    values = _skewed_values(rng, 50_000)
+    sketch = SpaceSaving(capacity=64)
+    for start in range(0, len(values), 5_000):
+        sketch.add(values.iloc[start:start + 5_000])
+
+    exact = values.value_counts()
+    top = sketch.top(5)
+    assert [value for value, _, _ in top] == exact.index[:5].tolist()
+    for value, upper, lower in top:
+        assert lower <= exact[value] <= upper
+        assert upper - exact[value] <= sketch.max_error
+    assert sketch.total == len(values)
+    assert len(sketch.counts) <= 64
+
+
+def test_space_saving_merge_matches_a_single_sketch():
+    rng = np.random.default_rng(5)
+    first_half, second_half = _skewed_values(rng, 20_000), _skewed_values(rng, 20_000)
+    exact = pd.concat([first_half, second_half]).value_counts()
+
+    first, second = SpaceSaving(capacity=32), SpaceSaving(capacity=32)
+    first.add(first_half)
+    second.add(second_half)
+    merged = first.merge(second)
+    assert merged.total == 40_000
+    assert [value for value, _, _ in merged.top(3)] == exact.index[:3].tolist()
+    for value, upper, lower in merged.top(10):
+        assert lower <= exact.get(value, 0) <= upper
+
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    sketch.add(pd.Series(["a", "b", "a", None, "c", "a", "b"]))
+    assert sketch.top(3) == [("a", 3, 3), ("b", 2, 2), ("c", 1, 1)]
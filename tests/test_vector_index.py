@@ -0,0 +1,222 @@
+# tests/test_vector_index.py
+import json
+import os
+
+import numpy as np
+import pytest
+
+import vector_index
+from hybrid_search import BM25Index
+from vector_index import IndexMismatchError, MetadataIndex, metadata_to_text
+
+DIMENSION = 8
+
+
+def _entries(start: int, count: int) -> list[dict]:
+    return [{"table": f"table_{i}", "columns": ["id"], "source": "even" if i % 2 == 0 else "odd"}
+            for i in range(start, start + count)]
+
+
+def _grown_index(first: int = 600, second: int = 400) -> MetadataIndex:
+    """An index built by two add() calls, so its float vectors carry zero padding rows past the last entry."""
+    index = MetadataIndex(DIMENSION)
+    unit = np.eye(DIMENSION, dtype="float32")[0]
+    index.add(_entries(0, first), np.tile(unit, (first, 1)))
+    index.add(_entries(first, second), np.tile(unit, (second, 1)))
+    assert len(index._vectors) > index._next_id
+    return index
+
+
+def test_search_batch_ignores_padding_rows():
+    index = _grown_index()
+    # Every entry scores -1 against this query, below the 0 a padding row would score
+    query = -np.eye(DIMENSION, dtype="float32")[:1]
+    results = index.search_batch(query, k=5, row_block_size=256)
+    assert len(results[0]) == 5
+    assert all(result["score"] == pytest.approx(-1.0) for result in results[0])
+
+
+def test_search_batch_with_removed_entries_after_reload(tmp_path):
+    index = _grown_index()
+    index.save(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path))
+    loaded.remove([f"table_{i}" for i in range(0, 1000, 2)])
+    loaded.add(_entries(1000, 1), np.eye(DIMENSION, dtype="float32")[:1])
+    query = np.eye(DIMENSION, dtype="float32")[:1]
+    results = loaded.search_batch(query, k=10, row_block_size=256)[0]
+    assert len(results) == 10
+    assert all(int(result["table"].rsplit("_", 1)[1]) % 2 == 1 or result["table"] == "table_1000"
+               for result in results)
+
+
+def test_filtered_flat_search_ignores_padding_rows(monkeypatch):
+    # Force the bitmap path past the exact gather, into _exact_top_k
+    monkeypatch.setattr(vector_index, "FILTER_EXACT_MAX", 10)
+    index = _grown_index()
+    query = -np.eye(DIMENSION, dtype="float32")[0]
+    results = index.search(query, k=5, filters={"source": "even"})
+    assert len(results) == 5
+    assert all(result["source"] == "even" for result in results)
+    batch = index.search_batch(query.reshape(1, -1), k=5, row_block_size=256, filters={"source": "odd"})[0]
+    assert len(batch) == 5
+    assert all(result["source"] == "odd" for result in batch)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_loaded_index_serves_saved_bm25_index(tmp_path, mmap):
+    index = _grown_index()
+    index.remove(["table_3"])
+    index.save(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path), mmap=mmap)
+    rebuilt = BM25Index(list(loaded.entries()))
+    assert len(loaded.lexical_index()) == len(rebuilt)
+    for query, filters in [("table_5", None), ("table id", {"source": "odd"}), ("table_3", None)]:
+        assert loaded.lexical_index().search(query, 10, filters) == rebuilt.search(query, 10, filters)
+    loaded.add(_entries(1000, 1), np.eye(DIMENSION, dtype="float32")[:1])
+    assert loaded.lexical_index().search("table_1000", 1)[0]["table"] == "table_1000"
+
+
+def _catalog_index(**kwargs) -> MetadataIndex:
+    """Eight entries, each embedded as its own basis vector."""
+    index = MetadataIndex(DIMENSION, embedding_model="test-model", **kwargs)
+    index.add([{"table": f"table_{i}", "columns": ["id"], "description": f"entry {i}"} for i in range(DIMENSION)],
+              np.eye(DIMENSION, dtype="float32"))
+    return index
+
+
+def test_search_returns_closest_entry_with_cosine_score():
+    index = _catalog_index()
+    query = np.eye(DIMENSION, dtype="float32")[3] * 5 + np.eye(DIMENSION, dtype="float32")[4]
+    results = index.search(query, k=2)
+    assert [result["table"] for result in results] == ["table_3", "table_4"]
+    assert results[0]["score"] == pytest.approx(5 / np.sqrt(26), rel=1e-5)
+    assert results[0]["description"] == "entry 3"
+
+
+def test_add_replaces_entries_with_the_same_id_and_remove_deletes_them():
+    index = _catalog_index()
+    index.add([{"table": "table_3", "columns": ["id"], "description": "moved"}], np.eye(DIMENSION, dtype="float32")[5:6])
+    assert len(index) == DIMENSION
+    assert index.get("table_3")["description"] == "moved"
+    assert {r["table"] for r in index.search(np.eye(DIMENSION, dtype="float32")[5], k=2)} == {"table_5", "table_3"}
+    assert index.remove(["table_3", "missing"]) == 1
+    assert "table_3" not in index
+    assert all(r["table"] != "table_3" for r in index.search(np.eye(DIMENSION, dtype="float32")[5], k=DIMENSION))
+
+
+def test_hnsw_removal_hides_entries_from_search():
+    index = _catalog_index(index_type="hnsw")
+    index.remove(["table_2"])
+    assert all(r["table"] != "table_2" for r in index.search(np.eye(DIMENSION, dtype="float32")[2], k=DIMENSION))
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, mmap):
+    index = _catalog_index()
+    index.save(str(tmp_path))
+    assert MetadataIndex.exists(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path), embedding_model="test-model", dimension=DIMENSION, mmap=mmap)
+    query = np.eye(DIMENSION, dtype="float32")[6]
+    assert loaded.search(query, k=3) == index.search(query, k=3)
+    assert loaded.version == index.version
+    # A loaded (memory-mapped) index can still be modified
+    loaded.add([{"table": "table_new", "columns": []}], query.reshape(1, -1) + 0.1)
+    assert len(loaded) == DIMENSION + 1
+
+
+def test_load_rejects_index_built_by_another_backend(tmp_path):
+    _catalog_index().save(str(tmp_path))
+    with pytest.raises(IndexMismatchError):
+        MetadataIndex.load(str(tmp_path), embedding_model="other-model")
+    with pytest.raises(IndexMismatchError):
+        MetadataIndex.load(str(tmp_path), dimension=DIMENSION * 2)
+
+
+def test_build_embeds_each_entry_text():
+    texts = []
+    entries = [{"table": "orders", "columns": ["id", "total"], "description": "Customer orders"}]
+    index = MetadataIndex.build(entries, lambda text: texts.append(text) or [1.0, 0.0, 0.0])
+    assert texts == [metadata_to_text(entries[0])] == ["Table: orders. Columns: id, total. Description: Customer orders"]
+    assert index.dimension == 3 and len(index) == 1
+    with pytest.raises(ValueError):
+        MetadataIndex.build([], lambda text: [1.0])
+
+
+def _generations(path) -> list[str]:
+    return sorted(name for name in os.listdir(path) if name.startswith("data-"))
+
+
+def test_save_switches_generations_atomically(tmp_path, monkeypatch):
+    index = _catalog_index()
+    index.save(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path))
+    first_generation = _generations(tmp_path)
+
+    index.remove(["table_0"])
+    index.save(str(tmp_path))
+    assert len(_generations(tmp_path)) == 1 and _generations(tmp_path) != first_generation
+    # The earlier load keeps serving its (deleted but still mapped) generation
+    assert len(loaded.search(np.eye(DIMENSION, dtype="float32")[0], k=DIMENSION)) == DIMENSION
+    assert "table_0" not in MetadataIndex.load(str(tmp_path))
+
+    # A save that fails before metadata.json is replaced leaves the saved index untouched
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(MetadataIndex, "_save_metadata", fail)
+    index.remove(["table_1"])
+    with pytest.raises(OSError):
+        index.save(str(tmp_path))
+    assert "table_1" in MetadataIndex.load(str(tmp_path))
+    assert len(_generations(tmp_path)) == 1
+
+
+def test_load_retries_when_a_save_replaces_the_generation_being_read(tmp_path, monkeypatch):
+    index = _catalog_index()
+    index.save(str(tmp_path))
+    load_files = MetadataIndex._load_files.__func__
+    calls = []
+
+    def load_during_save(cls, data_path, metadata, mmap):
+        calls.append(data_path)
+        if len(calls) == 1:
+            index.remove(["table_2"])
+            index.save(str(tmp_path))  # Deletes the generation this load is about to read
+        return load_files(cls, data_path, metadata, mmap)
+
+    monkeypatch.setattr(MetadataIndex, "_load_files", classmethod(load_during_save))
+    loaded = MetadataIndex.load(str(tmp_path))
+    assert len(calls) == 2 and calls[0] != calls[1]
+    assert "table_2" not in loaded and len(loaded) == DIMENSION - 1
+
+
+def test_load_reads_indexes_saved_before_generations(tmp_path):
+    _catalog_index().save(str(tmp_path))
+    generation = _generations(tmp_path)[0]
+    for name in os.listdir(tmp_path / generation):
+        os.replace(tmp_path / generation / name, tmp_path / name)
+    os.rmdir(tmp_path / generation)
+    metadata_path = tmp_path / "metadata.json"
+    metadata = json.loads(metadata_path.read_text())
+    del metadata["generation"]
+    metadata_path.write_text(json.dumps(metadata))
+
+    index = MetadataIndex.load(str(tmp_path))
+    assert len(index) == DIMENSION
+    index.save(str(tmp_path))
+    # The old top-level files are replaced by a generation directory
+    assert sorted(os.listdir(tmp_path)) == sorted(["metadata.json", *_generations(tmp_path)])
+    assert len(MetadataIndex.load(str(tmp_path))) == DIMENSION
+
+
+def test_memory_footprint_separates_used_and_reserved_vector_bytes(tmp_path):
+    index = MetadataIndex(DIMENSION)
+    for start in range(0, 5):
+        index.add(_entries(start, 1), np.eye(DIMENSION, dtype="float32")[start:start + 1])
+    footprint = index.memory_footprint()
+    assert footprint["float_vectors_bytes"] == 5 * DIMENSION * 4
+    assert footprint["float_vectors_reserved_bytes"] == 8 * DIMENSION * 4  # Capacity doubled 1, 2, 4, 8
+
+    index.save(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path)).memory_footprint()
+    assert loaded["float_vectors_bytes"] == loaded["float_vectors_reserved_bytes"] == 5 * DIMENSION * 4
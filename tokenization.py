@@ -0,0 +1,19 @@
+# tokenization.py
+import re
+
+# Splits identifiers into words: "user_email" -> user, email; "registrationTimestamp" -> registration,
+# Timestamp; "HTTPStatusCode" -> HTTP, Status, Code; digits form their own tokens.
+WORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+# A whole identifier such as a table or column name (optionally schema-qualified).
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+
+def split_words(text: str) -> list[str]:
+    """Returns the lowercased words of text, splitting snake_case and camelCase identifiers."""
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+
+def identifiers(text: str) -> list[str]:
+    """Returns the lowercased whole identifiers in text that are compound (snake_case, camelCase or dotted)."""
+    return [match.lower() for match in IDENTIFIER_PATTERN.findall(text) if len(WORD_PATTERN.findall(match)) > 1]
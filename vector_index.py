@@ -0,0 +1,831 @@
+# vector_index.py
+import json
+import math
+import os
+import shutil
+import uuid
+from collections.abc import Mapping, Sequence
+
+import faiss
+import numpy as np
+
+from attribute_index import AttributeIndex
+from hybrid_search import BM25Index
+from metrics import INDEX_SEARCH_LATENCY, track_latency
+
+# --- Index Configuration ---
+# "flat" gives exact search and is the right choice for small catalogs.
+# "ivf" and "hnsw" trade a little recall for much faster search on large catalogs.
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# How vectors are stored inside the FAISS index:
+# "float32" keeps full vectors (4 bytes per dimension), "int8" uses a scalar quantizer
+# (1 byte per dimension) and "pq" uses product quantization (pq_m bytes per vector).
+STORAGE_TYPES = ("float32", "int8", "pq")
+
+# A saved index is metadata.json plus a generation directory (data-<id>) holding every other file.
+# Each save writes a new generation and then replaces metadata.json, which names it, so readers see
+# one consistent version. Indexes saved before generations keep their files next to metadata.json.
+METADATA_FILE_NAME = "metadata.json"
+GENERATION_DIR_PREFIX = "data-"
+LOAD_RETRIES = 3  # Reloads of metadata.json when a concurrent save removed the generation being read
+INDEX_FILE_NAME = "index.faiss"
+VECTORS_FILE_NAME = "vectors.npy"  # Full float32 vectors by internal id, used for exact re-ranking
+# Entries are saved as one JSON document per line plus NumPy tables locating them by internal id and
+# by entry id, and the attribute bitmaps as one packed array. All of them are memory-mapped on load.
+ENTRIES_FILE_NAME = "entries.jsonl"
+ENTRY_POSITIONS_FILE_NAME = "entry_positions.npy"  # (int_id, start, end) byte range per entry, by int id
+ENTRY_KEYS_FILE_NAME = "entry_keys.npy"            # (key, int_id) per entry, sorted by entry id
+ATTRIBUTES_FILE_NAME = "attributes.npy"
+# The BM25 index over the entries (documents in int id order), saved the same way: flat NumPy arrays
+BM25_FILE_NAMES = {"terms": "bm25_terms.npy", "docs": "bm25_docs.npy", "weights": "bm25_weights.npy",
+                   "attributes": "bm25_attributes.npy"}
+
+# Batch search scores this many stored vectors per matrix product, bounding the score matrix
+# to (queries x BATCH_ROW_BLOCK) floats and streaming memory-mapped vectors from disk.
+BATCH_ROW_BLOCK = 16_384
+
+# Filtered searches score the matching vectors exactly when at most this many entries match;
+# larger selections are searched by the ANN index restricted to them with a FAISS IDSelector.
+FILTER_EXACT_MAX = 20_000
+
+
+class IndexMismatchError(ValueError):
+    """Raised when a saved index was built by a different embedding backend or dimension."""
+
+
+def metadata_to_text(entry: dict) -> str:
+    """
+    Turns a metadata entry ({table, columns, description}) into the text that gets embedded.
+    The same format is used when building the index, so queries are compared against consistent text.
+    """
+    columns = ", ".join(entry.get("columns", []))
+    return f"Table: {entry['table']}. Columns: {columns}. Description: {entry.get('description', '')}"
+
+
+def _entry_id(entry: dict) -> str:
+    """Returns the stable identifier of a metadata entry (explicit 'id' or the table name)."""
+    return str(entry.get("id") or entry["table"])
+
+
+def _default_pq_m(dimension: int) -> int:
+    """Picks the number of PQ sub-quantizers: about one byte per 8 dimensions, dividing the dimension evenly."""
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def _as_matrix(vectors) -> np.ndarray:
+    """Converts vectors into a contiguous, L2-normalized float32 matrix (inner product == cosine)."""
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype="float32"))
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    matrix = matrix.copy()
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+def _replace_file(path: str, write_fn) -> None:
+    """
+    Writes a file through write_fn(temporary path) and renames it over path, so readers see
+    either the previous or the new content, never a partially written file.
+    """
+    temporary_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write_fn(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _write_array(file_path: str, array: np.ndarray) -> None:
+    with open(file_path, "wb") as f:  # np.save() would append '.npy' to a path
+        np.save(f, array)
+
+
+def _saved_generation(path: str) -> str | None:
+    """The generation directory named by the metadata.json at path, or None."""
+    try:
+        with open(os.path.join(path, METADATA_FILE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_old_generations(path: str, keep: set) -> None:
+    """
+    Deletes the generation directories (and pre-generation data files) at path that are not in keep.
+    Processes that have their files memory-mapped keep reading them; where the OS refuses to delete
+    mapped files, they are left for the next save to remove.
+    """
+    legacy_files = [INDEX_FILE_NAME, VECTORS_FILE_NAME, ENTRIES_FILE_NAME, ENTRY_POSITIONS_FILE_NAME,
+                    ENTRY_KEYS_FILE_NAME, ATTRIBUTES_FILE_NAME, *BM25_FILE_NAMES.values()]
+    for name in os.listdir(path):
+        if name.startswith(GENERATION_DIR_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        elif name in legacy_files:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def _faiss_index_bytes(index) -> int:
+    """
+    Size of a FAISS index computed from its parts instead of by serializing it: the codes
+    (ntotal x code size) and 64-bit ids, plus the IVF centroids, HNSW links and the PQ codebooks
+    or scalar quantizer ranges its type adds.
+    """
+    if index is None:
+        return 0
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        coder = faiss.downcast_index(ivf)
+        total = index.ntotal * (ivf.code_size + 8) + ivf.quantizer.ntotal * ivf.d * 4
+    else:
+        coder = faiss.downcast_index(index.index)  # The index wrapped by IndexIDMap2
+        total = index.ntotal * 8
+        if isinstance(coder, faiss.IndexHNSW):
+            total += coder.hnsw.neighbors.size() * 4 + coder.hnsw.levels.size() * 4 + coder.hnsw.offsets.size() * 8
+            coder = faiss.downcast_index(coder.storage)
+        total += index.ntotal * coder.code_size
+    pq = getattr(coder, "pq", None)
+    if pq is not None:
+        total += pq.M * pq.ksub * pq.dsub * 4
+    sq = getattr(coder, "sq", None)
+    if sq is not None:
+        total += sq.trained.size() * 4
+    return int(total)
+
+
+class _SavedEntries(Mapping):
+    """
+    Read-only int id -> entry mapping over entries written by MetadataIndex.save(). The files are
+    memory-mapped and an entry's JSON is parsed only when it is accessed, so loading an index
+    costs no deserialization and the pages are shared by every process that maps them.
+    """
+
+    def __init__(self, path: str):
+        self._positions = np.load(os.path.join(path, ENTRY_POSITIONS_FILE_NAME), mmap_mode="r")
+        self.keys_table = np.load(os.path.join(path, ENTRY_KEYS_FILE_NAME), mmap_mode="r")
+        data_path = os.path.join(path, ENTRIES_FILE_NAME)
+        # np.memmap cannot map an empty file
+        self._data = np.memmap(data_path, dtype="uint8", mode="r") if os.path.getsize(data_path) else b""
+
+    def int_ids(self) -> np.ndarray:
+        return self._positions["int_id"]
+
+    def __getitem__(self, int_id: int) -> dict:
+        int_ids = self._positions["int_id"]
+        row = int(np.searchsorted(int_ids, int_id))
+        if row == len(int_ids) or int_ids[row] != int_id:
+            raise KeyError(int_id)
+        _, start, end = self._positions[row].tolist()
+        return json.loads(bytes(self._data[start:end]))
+
+    def __iter__(self):
+        return iter(self._positions["int_id"].tolist())
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def values(self):
+        """Yields every entry in int id order, reading the mapped file sequentially."""
+        for _, start, end in self._positions.tolist():
+            yield json.loads(bytes(self._data[start:end]))
+
+    def rows(self) -> "_SavedEntryRows":
+        return _SavedEntryRows(self)
+
+
+class _SavedEntryRows(Sequence):
+    """The saved entries by row (int id order), which is the document order of the saved BM25 index."""
+
+    def __init__(self, saved_entries: _SavedEntries):
+        self._saved_entries = saved_entries
+
+    def __getitem__(self, row: int) -> dict:
+        _, start, end = self._saved_entries._positions[row].tolist()
+        return json.loads(bytes(self._saved_entries._data[start:end]))
+
+    def __len__(self) -> int:
+        return len(self._saved_entries)
+
+
+class _SavedIds(Mapping):
+    """Read-only entry id -> int id mapping: a binary search over the saved, memory-mapped sorted keys."""
+
+    def __init__(self, keys_table: np.ndarray):
+        self._keys_table = keys_table
+
+    def __getitem__(self, entry_id: str) -> int:
+        keys = self._keys_table["key"]
+        row = int(np.searchsorted(keys, entry_id))
+        if row == len(keys) or keys[row] != entry_id:
+            raise KeyError(entry_id)
+        return int(self._keys_table["int_id"][row])
+
+    def __iter__(self):
+        return iter(self._keys_table["key"].tolist())
+
+    def __len__(self) -> int:
+        return len(self._keys_table)
+
+
+class MetadataIndex:
+    """
+    A FAISS-backed vector index over database metadata entries.
+    Each entry ({table, columns, description}) is stored as one vector, and search returns
+    the same entry shape plus a cosine similarity 'score'.
+
+    With quantized storage ("int8" or "pq"), the full float32 vectors are still written to disk
+    next to the index and memory-mapped on load; when rerank_factor > 1, search fetches
+    k * rerank_factor candidates from the quantized index and re-scores them exactly.
+
+    A loaded index memory-maps its files (FAISS codes, vectors, entries, attribute bitmaps), so
+    processes serving the same saved index share one copy through the page cache. The first
+    add() or remove() copies the mapped parts into process memory.
+    """
+
+    def __init__(self, dimension: int, index_type: str = "flat", nlist: int | None = None,
+                 nprobe: int = 8, hnsw_m: int = 32, ef_search: int = 64,
+                 storage: str = "float32", pq_m: int | None = None, pq_nbits: int = 8,
+                 rerank_factor: int = 1,
+                 embedding_backend: str | None = None, embedding_model: str | None = None):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage type '{storage}'. Expected one of {STORAGE_TYPES}.")
+        if dimension <= 0:
+            raise ValueError("Index dimension must be a positive integer.")
+        pq_m = pq_m or _default_pq_m(dimension)
+        if storage == "pq" and dimension % pq_m != 0:
+            raise ValueError(f"pq_m ({pq_m}) must divide the dimension ({dimension}).")
+
+        self.dimension = dimension
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.storage = storage
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.rerank_factor = max(1, rerank_factor)
+        # Which embedding backend/model produced the vectors; checked when the index is loaded.
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+
+        self._index = None          # Created lazily: IVF and quantizers need training data
+        self._index_mapped = False  # FAISS index memory-mapped read-only by load()
+        self._vectors = np.zeros((0, dimension), dtype="float32")  # Row i = float vector of int id i
+        self._entries = {}          # int id -> metadata entry
+        self._ids = {}              # entry id (str) -> int id
+        self._tombstones = set()    # int ids deleted from indexes that cannot remove vectors (HNSW)
+        self._attributes = AttributeIndex()  # Bitmaps by int id for filtered search
+        self._lexical = None        # (version, BM25Index over the entries in int id order)
+        self._next_id = 0
+        # Changes on every add/remove, so caches keyed by version never serve stale results.
+        self.version = uuid.uuid4().hex[:12]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return str(entry_id) in self._ids
+
+    def entries(self):
+        """Yields every stored metadata entry (including its 'id')."""
+        return iter(self._entries.values())
+
+    def get(self, entry_id: str) -> dict | None:
+        """Returns the stored entry with the given id, or None."""
+        int_id = self._ids.get(str(entry_id))
+        return None if int_id is None else self._entries[int_id]
+
+    def lexical_index(self) -> BM25Index:
+        """
+        The BM25 index over the entries. A loaded index serves the one saved with it (memory-mapped);
+        otherwise it is built from the entries, once per version.
+        """
+        lexical = self._lexical
+        if lexical is None or lexical[0] != self.version:
+            lexical = self._lexical = (self.version, BM25Index([self._entries[i] for i in sorted(self._entries)]))
+        return lexical[1]
+
+    def filter_values(self, field: str) -> dict[str, int]:
+        """Returns the values of a filterable field (see FILTER_FIELDS) with their entry counts, most common first."""
+        return self._attributes.values(field)
+
+    # --- Construction ---
+    @property
+    def needs_training(self) -> bool:
+        """
+        True until the first add() of an index that is trained on its data (IVF lists, int8 ranges or
+        PQ codebooks): that add() should then carry the whole catalog, or a representative sample of it.
+        """
+        return self._index is None and (self.index_type == "ivf" or self.storage != "float32")
+
+    def _create_faiss_index(self, training_vectors: np.ndarray):
+        """
+        Creates the underlying FAISS index for the configured index and storage type,
+        training it on the given vectors if needed (IVF centroids, scalar ranges, PQ codebooks).
+        """
+        d, ip = self.dimension, faiss.METRIC_INNER_PRODUCT
+        sq_8bit = faiss.ScalarQuantizer.QT_8bit
+        if self.storage == "pq":
+            # A PQ codebook has 2^nbits centroids, which must not exceed the number of training points.
+            self.pq_nbits = max(1, min(self.pq_nbits, int(math.log2(max(2, len(training_vectors))))))
+
+        if self.index_type == "ivf":
+            # Rule of thumb: about sqrt(N) inverted lists, but never more lists than training points.
+            nlist = self.nlist or max(1, int(4 * math.sqrt(len(training_vectors))))
+            nlist = max(1, min(nlist, len(training_vectors)))
+            self.nlist = nlist
+            quantizer = faiss.IndexFlatIP(d)
+            if self.storage == "int8":
+                index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, sq_8bit, ip)
+            elif self.storage == "pq":
+                index = faiss.IndexIVFPQ(quantizer, d, nlist, self.pq_m, self.pq_nbits, ip)
+            else:
+                index = faiss.IndexIVFFlat(quantizer, d, nlist, ip)
+            index.nprobe = self.nprobe
+        else:
+            if self.index_type == "hnsw":
+                if self.storage == "int8":
+                    base = faiss.IndexHNSWSQ(d, sq_8bit, self.hnsw_m, ip)
+                elif self.storage == "pq":
+                    base = faiss.IndexHNSWPQ(d, self.pq_m, self.hnsw_m, self.pq_nbits, ip)
+                else:
+                    base = faiss.IndexHNSWFlat(d, self.hnsw_m, ip)
+                base.hnsw.efSearch = self.ef_search
+            elif self.storage == "int8":
+                base = faiss.IndexScalarQuantizer(d, sq_8bit, ip)
+            elif self.storage == "pq":
+                base = faiss.IndexPQ(d, self.pq_m, self.pq_nbits, ip)
+            else:
+                base = faiss.IndexFlatIP(d)
+            index = faiss.IndexIDMap2(base)
+
+        if not index.is_trained:
+            index.train(training_vectors)
+        return index
+
+    def _make_writable(self) -> None:
+        """
+        Copies the parts load() memory-mapped read-only into process memory before the index is
+        modified. (Attribute bitmaps are re-encoded into new arrays on update, and the float vectors
+        are copied by _store_vectors, so they need nothing here.)
+        """
+        if isinstance(self._entries, _SavedEntries):
+            self._entries = dict(zip(self._entries, self._entries.values()))
+            self._ids = {entry["id"]: int_id for int_id, entry in self._entries.items()}
+        if self._index_mapped:
+            # A mapped FAISS index aborts the process if it is resized, and clone_index() keeps the mapping
+            self._index = faiss.deserialize_index(faiss.serialize_index(self._index))
+            self._index_mapped = False
+
+    def _store_vectors(self, int_ids: np.ndarray, matrix: np.ndarray) -> None:
+        """Keeps the full float vectors (row = int id) for exact re-ranking and for saving to disk."""
+        needed = int(int_ids.max()) + 1
+        if needed > len(self._vectors) or not self._vectors.flags.writeable:
+            # Grow geometrically; this also copies a read-only memory-mapped array into memory.
+            capacity = max(needed, 2 * len(self._vectors)) if needed > len(self._vectors) else len(self._vectors)
+            grown = np.zeros((capacity, self.dimension), dtype="float32")
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+        self._vectors[int_ids] = matrix
+
+    def add(self, entries: list[dict], vectors) -> None:
+        """
+        Adds (or replaces) metadata entries with their embedding vectors.
+        Entries sharing an id with an existing entry replace it.
+        IVF and quantized indexes are trained on the first batch added, so that batch should be
+        representative of the catalog (ideally the whole initial catalog).
+        """
+        if len(entries) == 0:
+            return
+        matrix = _as_matrix(vectors)
+        if matrix.shape != (len(entries), self.dimension):
+            raise ValueError(
+                f"Expected {len(entries)} vectors of dimension {self.dimension}, got shape {matrix.shape}."
+            )
+
+        self.remove([_entry_id(entry) for entry in entries if _entry_id(entry) in self._ids])
+        self._make_writable()
+
+        if self._index is None:
+            self._index = self._create_faiss_index(matrix)
+
+        int_ids = np.arange(self._next_id, self._next_id + len(entries), dtype="int64")
+        self._next_id += len(entries)
+        self._index.add_with_ids(matrix, int_ids)
+        self._store_vectors(int_ids, matrix)
+
+        for int_id, entry in zip(int_ids.tolist(), entries):
+            stored_entry = dict(entry)
+            stored_entry["id"] = _entry_id(entry)
+            self._entries[int_id] = stored_entry
+            self._ids[stored_entry["id"]] = int_id
+        self._attributes.update(added=[(int_id, self._entries[int_id]) for int_id in int_ids.tolist()],
+                                size=self._next_id)
+        self.version = uuid.uuid4().hex[:12]
+
+    def remove(self, entry_ids: list[str]) -> int:
+        """Removes entries by id. Returns the number of entries that were removed."""
+        entry_ids = [str(entry_id) for entry_id in entry_ids if str(entry_id) in self._ids]
+        if not entry_ids:
+            return 0
+        self._make_writable()
+        int_ids = [self._ids.pop(entry_id) for entry_id in entry_ids]
+        self._attributes.update(removed=[(int_id, self._entries.pop(int_id)) for int_id in int_ids])
+        self.version = uuid.uuid4().hex[:12]
+        try:
+            self._index.remove_ids(np.asarray(int_ids, dtype="int64"))
+        except RuntimeError:
+            # HNSW graphs do not support removal; hide these vectors at search time instead.
+            self._tombstones.update(int_ids)
+        return len(int_ids)
+
+    @classmethod
+    def build(cls, entries: list[dict], embed_fn, index_type: str = "flat", **kwargs) -> "MetadataIndex":
+        """
+        Builds an index from metadata entries, embedding each one with embed_fn (e.g. get_embedding).
+        Pass embedding_backend/embedding_model to record which backend built the index.
+        """
+        vectors = [embed_fn(metadata_to_text(entry)) for entry in entries]
+        if not vectors:
+            raise ValueError("Cannot build a metadata index from an empty catalog.")
+        index = cls(dimension=len(vectors[0]), index_type=index_type, **kwargs)
+        index.add(entries, vectors)
+        return index
+
+    # --- Search ---
+    def _search_parameters(self, selector, fetch_k: int):
+        """FAISS search parameters that restrict the search to the ids accepted by selector."""
+        if self.index_type == "ivf":
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if self.index_type == "hnsw":
+            # Filtered-out nodes are still traversed; a beam of at least fetch_k keeps enough matches reachable.
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.ef_search, fetch_k))
+        return faiss.SearchParameters(sel=selector)
+
+    def _filtered_candidates(self, query: np.ndarray, k: int, filters: dict) -> list[tuple[float, int]]:
+        """
+        Returns (score, int id) candidates among the entries matching filters, best first.
+        The attribute bitmaps select the matching ids; small selections are scored exactly against
+        their float vectors, and so is every selection of a flat (brute-force) index. Larger
+        selections of IVF and HNSW indexes are searched by the ANN index with an IDSelectorBitmap,
+        so that only matching vectors are returned.
+        """
+        selected = self._attributes.select(filters, self._next_id)
+        selected_ids = np.flatnonzero(selected)
+        if len(selected_ids) == 0:
+            return []
+        if len(self._vectors) >= self._next_id:
+            if len(selected_ids) <= FILTER_EXACT_MAX:
+                scores = np.asarray(self._vectors[selected_ids]) @ query[0]
+                take = min(k, len(selected_ids))
+                top = np.argpartition(-scores, take - 1)[:take]
+                top = top[np.argsort(-scores[top], kind="stable")]
+                return [(float(scores[i]), int(selected_ids[i])) for i in top]
+            if self.index_type == "flat":
+                scores, int_ids = self._exact_top_k(query, k, selected)
+                return [(score, int_id) for score, int_id in zip(scores[0].tolist(), int_ids[0].tolist()) if int_id >= 0]
+
+        bitmap = np.packbits(selected, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))  # Size is in bytes
+        fetch_k = min(k * self.rerank_factor, len(selected_ids))
+        scores, int_ids = self._index.search(query, fetch_k, params=self._search_parameters(selector, fetch_k))
+        return [(score, int_id) for score, int_id in zip(scores[0].tolist(), int_ids[0].tolist()) if int_id >= 0]
+
+    def search(self, query_vector, k: int = 5, filters: dict | None = None) -> list[dict]:
+        """
+        Returns the top-k entries most similar to the query vector, best first.
+        Each result is the stored entry plus a 'score' (cosine similarity).
+        With rerank_factor > 1, candidates from the (quantized) index are re-scored exactly.
+        filters (field -> allowed value or values, for the fields in FILTER_FIELDS) restricts the
+        search to matching entries before ranking, so k matches are returned whenever k exist.
+        """
+        with track_latency(INDEX_SEARCH_LATENCY, "index_search", index_type=self.index_type):
+            if self._index is None or not self._entries or k <= 0:
+                return []
+            query = _as_matrix(query_vector)
+            if query.shape[1] != self.dimension:
+                raise ValueError(f"Query vector has dimension {query.shape[1]}, index expects {self.dimension}.")
+
+            if filters:
+                candidates = self._filtered_candidates(query, k, filters)
+            else:
+                # Over-fetch by the number of tombstones so deleted HNSW vectors cannot crowd out live ones.
+                fetch_k = min(k * self.rerank_factor + len(self._tombstones), self._index.ntotal)
+                scores, int_ids = self._index.search(query, fetch_k)
+                candidates = [(score, int_id) for score, int_id in zip(scores[0].tolist(), int_ids[0].tolist())
+                              if int_id >= 0 and int_id not in self._tombstones]
+
+            if self.rerank_factor > 1 and candidates:
+                candidate_ids = np.fromiter((int_id for _, int_id in candidates), dtype="int64", count=len(candidates))
+                exact_scores = self._vectors[candidate_ids] @ query[0]
+                order = np.argsort(-exact_scores, kind="stable")
+                candidates = [(float(exact_scores[i]), int(candidate_ids[i])) for i in order]
+
+            results = []
+            for score, int_id in candidates[:k]:
+                result = dict(self._entries[int_id])
+                result["score"] = float(score)
+                results.append(result)
+            return results
+
+    def _live_mask(self) -> np.ndarray:
+        """Boolean mask over int ids of the entries currently stored."""
+        live = np.zeros(self._next_id, dtype=bool)
+        if isinstance(self._entries, _SavedEntries):
+            live[self._entries.int_ids()] = True
+        else:
+            live[np.fromiter(self._entries, dtype="int64", count=len(self._entries))] = True
+        return live
+
+    def _exact_top_k(self, queries: np.ndarray, k: int, allowed: np.ndarray,
+                     row_block_size: int = BATCH_ROW_BLOCK) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k (scores, int ids) per query among the allowed int ids, best first, scoring one
+        block of row_block_size stored float vectors per matrix product. Missing slots have id -1.
+        """
+        k = min(k, len(self._entries))
+        best_scores = np.full((len(queries), k), -np.inf, dtype="float32")
+        best_ids = np.full((len(queries), k), -1, dtype="int64")
+        for start in range(0, self._next_id, row_block_size):
+            # _vectors grows geometrically, so rows past _next_id are zero padding, not entries
+            end = min(start + row_block_size, self._next_id)
+            block = np.asarray(self._vectors[start:end])
+            scores = queries @ block.T
+            excluded = ~allowed[start:end]
+            if excluded.any():
+                scores[:, excluded] = -np.inf
+            if len(block) > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(len(block)), scores.shape)
+            merged_scores = np.hstack([best_scores, np.take_along_axis(scores, top, axis=1)])
+            merged_ids = np.hstack([best_ids, top + start])
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        best_ids[np.take_along_axis(best_scores, order, axis=1) == -np.inf] = -1
+        return np.take_along_axis(best_scores, order, axis=1), best_ids
+
+    def search_batch(self, query_vectors, k: int = 5, row_block_size: int = BATCH_ROW_BLOCK,
+                     filters: dict | None = None) -> list[list[dict]]:
+        """
+        Returns the top-k entries for each of many query vectors, in query order. Scores come from
+        one matrix product per block of row_block_size stored float vectors, and each block's top-k
+        is merged into the running top-k with argpartition, so no queries x catalog score matrix is
+        ever materialized. Results are exact cosine similarities for every index type.
+        filters restricts the results to matching entries, as in search().
+        """
+        if len(query_vectors) == 0:
+            return []
+        with track_latency(INDEX_SEARCH_LATENCY, "index_search", index_type="batch"):
+            queries = _as_matrix(query_vectors)
+            if queries.shape[1] != self.dimension:
+                raise ValueError(f"Query vectors have dimension {queries.shape[1]}, index expects {self.dimension}.")
+            if self._index is None or not self._entries or k <= 0:
+                return [[] for _ in range(len(queries))]
+            if len(self._vectors) < self._next_id:
+                # Saved before float vectors were kept next to the index: search one query at a time.
+                return [self.search(query, k, filters) for query in queries]
+
+            live = self._live_mask()
+            if filters:
+                live &= self._attributes.select(filters, self._next_id)
+            best_scores, best_ids = self._exact_top_k(queries, k, live, row_block_size)
+
+        all_results = []
+        for scores, int_ids in zip(best_scores.tolist(), best_ids.tolist()):
+            results = []
+            for score, int_id in zip(scores, int_ids):
+                if int_id < 0:
+                    continue
+                result = dict(self._entries[int_id])
+                result["score"] = float(score)
+                results.append(result)
+            all_results.append(results)
+        return all_results
+
+    # --- Footprint & Quality ---
+    def memory_footprint(self) -> dict:
+        """
+        Reports how many bytes the index occupies: the FAISS structure, the float32 vectors kept
+        for re-ranking (the rows in use, and separately the capacity reserved for growth) and the
+        resulting FAISS bytes per live vector, and which parts are memory-mapped from disk (shared
+        between processes) rather than held in process memory.
+        """
+        index_bytes = _faiss_index_bytes(self._index)
+        used_rows = min(self._next_id, len(self._vectors))  # Rows of removed entries stay until a rebuild
+        vectors_bytes = used_rows * self.dimension * self._vectors.itemsize
+        return {
+            "index_type": self.index_type,
+            "storage": self.storage,
+            "vectors": len(self),
+            "index_bytes": index_bytes,
+            "float_vectors_bytes": vectors_bytes,
+            "float_vectors_reserved_bytes": int(self._vectors.nbytes),
+            "float_vectors_memory_mapped": isinstance(self._vectors, np.memmap),
+            "index_memory_mapped": self._index_mapped,
+            "entries_memory_mapped": isinstance(self._entries, _SavedEntries),
+            "attribute_bitmaps_bytes": self._attributes.nbytes(),
+            "index_bytes_per_vector": index_bytes / len(self) if len(self) else 0.0,
+        }
+
+    def to_exact(self) -> "MetadataIndex":
+        """Returns an exact (flat, float32) copy of this index built from the stored float vectors."""
+        exact = MetadataIndex(self.dimension, embedding_backend=self.embedding_backend,
+                              embedding_model=self.embedding_model)
+        int_ids = sorted(self._entries)
+        if int_ids:
+            exact.add([self._entries[i] for i in int_ids], self._vectors[np.asarray(int_ids, dtype="int64")])
+        return exact
+
+    # --- Persistence ---
+    def _save_entries(self, data_path: str) -> None:
+        """Writes the entries (one JSON document per line) and the tables locating them by int id and entry id."""
+        int_ids = sorted(self._entries)
+        positions = np.zeros(len(int_ids), dtype=[("int_id", "<i8"), ("start", "<i8"), ("end", "<i8")])
+        offset = 0
+        with open(os.path.join(data_path, ENTRIES_FILE_NAME), "wb") as f:
+            for row, int_id in enumerate(int_ids):
+                data = json.dumps(self._entries[int_id], ensure_ascii=False).encode("utf-8")
+                f.write(data + b"\n")
+                positions[row] = (int_id, offset, offset + len(data))
+                offset += len(data) + 1
+        _write_array(os.path.join(data_path, ENTRY_POSITIONS_FILE_NAME), positions)
+
+        key_width = max((len(key) for key in self._ids), default=1)
+        keys_table = np.array(sorted(self._ids.items()), dtype=[("key", f"<U{key_width}"), ("int_id", "<i8")])
+        _write_array(os.path.join(data_path, ENTRY_KEYS_FILE_NAME), keys_table)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the FAISS index, vectors, entries and attribute bitmaps into the directory at path.
+        The files are written to a new generation directory, then metadata.json (which names it) is
+        replaced atomically, so a concurrent load() reads either the previous or the new version as a
+        whole. Previous generations are deleted afterwards.
+        """
+        if self._index is None:
+            raise ValueError("Cannot save an empty metadata index.")
+        generation = f"{GENERATION_DIR_PREFIX}{uuid.uuid4().hex[:12]}"
+        data_path = os.path.join(path, generation)
+        os.makedirs(data_path)
+        try:
+            faiss.write_index(self._index, os.path.join(data_path, INDEX_FILE_NAME))
+            _write_array(os.path.join(data_path, VECTORS_FILE_NAME), np.asarray(self._vectors[:self._next_id]))
+            self._save_entries(data_path)
+            attribute_blob, attribute_directory = self._attributes.to_arrays()
+            _write_array(os.path.join(data_path, ATTRIBUTES_FILE_NAME), attribute_blob)
+            lexical_arrays, lexical_directory = self.lexical_index().to_arrays()
+            for name, file_name in BM25_FILE_NAMES.items():
+                _write_array(os.path.join(data_path, file_name), lexical_arrays[name])
+            self._save_metadata(path, generation, attribute_directory, lexical_directory)
+        except BaseException:
+            shutil.rmtree(data_path, ignore_errors=True)
+            raise
+        # Another process may have saved since; the generation its metadata.json names stays too.
+        _remove_old_generations(path, keep={generation, _saved_generation(path)})
+
+    def _save_metadata(self, path: str, generation: str, attribute_directory: dict, lexical_directory: dict) -> None:
+        """Atomically replaces metadata.json: the index configuration and the generation holding its files."""
+        metadata = {
+            "config": {
+                "dimension": self.dimension,
+                "index_type": self.index_type,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "hnsw_m": self.hnsw_m,
+                "ef_search": self.ef_search,
+                "storage": self.storage,
+                "pq_m": self.pq_m,
+                "pq_nbits": self.pq_nbits,
+                "rerank_factor": self.rerank_factor,
+                "embedding_backend": self.embedding_backend,
+                "embedding_model": self.embedding_model,
+            },
+            "next_id": self._next_id,
+            "version": self.version,
+            "tombstones": sorted(self._tombstones),
+            "attributes": attribute_directory,
+            "bm25": lexical_directory,
+            "generation": generation,
+        }
+        def write_metadata(file_path):
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+
+        _replace_file(os.path.join(path, METADATA_FILE_NAME), write_metadata)
+
+    @classmethod
+    def load(cls, path: str, embedding_model: str | None = None, dimension: int | None = None,
+             mmap: bool = True) -> "MetadataIndex":
+        """
+        Loads an index previously written with save().
+        With mmap (the default), the FAISS codes, float vectors, entries and attribute bitmaps are
+        memory-mapped rather than read into memory: loading only opens the files, and processes
+        serving the same index share its pages. mmap=False reads everything into process memory.
+        If embedding_model or dimension are given, raises IndexMismatchError when the index was
+        built with a different model or vector size, since its vectors would not be comparable.
+        """
+        for attempt in range(LOAD_RETRIES + 1):
+            with open(os.path.join(path, METADATA_FILE_NAME), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            cls._check_compatible(path, metadata["config"], embedding_model, dimension)
+            if "generation" not in metadata:
+                return cls._load_files(path, metadata, mmap)  # Saved before generation directories
+            data_path = os.path.join(path, metadata["generation"])
+            try:
+                return cls._load_files(data_path, metadata, mmap)
+            except (OSError, RuntimeError):  # FAISS reports a missing file as a RuntimeError
+                # A concurrent save() deleted this generation after metadata.json was read; read the new one
+                if attempt == LOAD_RETRIES or _saved_generation(path) == metadata["generation"]:
+                    raise
+
+    @staticmethod
+    def _check_compatible(path: str, config: dict, embedding_model: str | None, dimension: int | None) -> None:
+        if dimension is not None and config["dimension"] != dimension:
+            raise IndexMismatchError(
+                f"Index at '{path}' has dimension {config['dimension']}, but the embedding backend produces {dimension}. "
+                "Rebuild the index with the current backend."
+            )
+        if embedding_model is not None and config.get("embedding_model") != embedding_model:
+            raise IndexMismatchError(
+                f"Index at '{path}' was built with embedding model '{config.get('embedding_model')}', "
+                f"but the current backend uses '{embedding_model}'. Rebuild the index with the current backend."
+            )
+
+    @classmethod
+    def _load_files(cls, data_path: str, metadata: dict, mmap: bool) -> "MetadataIndex":
+        index = cls(**metadata["config"])
+        index_path = os.path.join(data_path, INDEX_FILE_NAME)
+        mmap_flags = getattr(faiss, "IO_FLAG_MMAP_IFC", None)  # Zero-copy mapping of FAISS codes (faiss >= 1.10)
+        if mmap and mmap_flags is not None:
+            index._index = faiss.read_index(index_path, mmap_flags | faiss.IO_FLAG_READ_ONLY)
+            index._index_mapped = True
+        else:
+            index._index = faiss.read_index(index_path)
+        if index.index_type == "ivf":
+            faiss.extract_index_ivf(index._index).nprobe = index.nprobe
+        elif index.index_type == "hnsw":
+            faiss.downcast_index(index._index.index).hnsw.efSearch = index.ef_search
+        vectors_path = os.path.join(data_path, VECTORS_FILE_NAME)
+        if os.path.exists(vectors_path):
+            index._vectors = np.load(vectors_path, mmap_mode="r" if mmap else None)
+        index._next_id = metadata["next_id"]
+        index.version = metadata.get("version", index.version)
+        index._tombstones = set(metadata["tombstones"])
+        if "entries" in metadata:
+            # Indexes saved before entries had their own files keep them inline
+            for int_id, entry in metadata["entries"]:
+                index._entries[int_id] = entry
+                index._ids[entry["id"]] = int_id
+        else:
+            saved_entries = _SavedEntries(data_path)
+            index._entries, index._ids = saved_entries, _SavedIds(saved_entries.keys_table)
+            if not mmap:
+                index._make_writable()
+            if "bm25" in metadata:
+                arrays = {name: np.load(os.path.join(data_path, file_name), mmap_mode="r" if mmap else None)
+                          for name, file_name in BM25_FILE_NAMES.items()}
+                documents = saved_entries.rows() if mmap else [index._entries[i] for i in sorted(index._entries)]
+                index._lexical = (index.version, BM25Index.from_arrays(arrays, metadata["bm25"], documents))
+        if "attributes" in metadata:
+            attribute_blob = np.load(os.path.join(data_path, ATTRIBUTES_FILE_NAME), mmap_mode="r" if mmap else None)
+            index._attributes = AttributeIndex.from_arrays(attribute_blob, metadata["attributes"])
+        else:
+            index._attributes.update(added=list(index._entries.items()), size=index._next_id)
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Returns True if a saved index is present at path (metadata.json is written last)."""
+        return os.path.exists(os.path.join(path, METADATA_FILE_NAME))
+
+
+def recall_at_k(candidate: MetadataIndex, exact: MetadataIndex, query_vectors, k: int = 10) -> float:
+    """
+    Measures recall@k of candidate against exact: the average fraction of the exact top-k entries
+    that candidate also returns in its top-k. Use MetadataIndex.to_exact() for the reference index.
+    """
+    query_vectors = np.asarray(query_vectors, dtype="float32")
+    if query_vectors.ndim == 1:
+        query_vectors = query_vectors.reshape(1, -1)
+    recalls = []
+    for query in query_vectors:
+        expected = {result["id"] for result in exact.search(query, k)}
+        if not expected:
+            continue
+        found = {result["id"] for result in candidate.search(query, k)}
+        recalls.append(len(expected & found) / len(expected))
+    return float(np.mean(recalls)) if recalls else 0.0